@@ -0,0 +1,130 @@
+"""Redis round trips and latency of batched ``CacheLayer`` reads and writes.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_cache_batch --batch 128 --rtt-ms 0.5
+
+Uses an in-memory Redis stand-in that counts round trips and sleeps ``--rtt-ms`` on each
+one, and a temporary directory as the disk tier. Compares per-key ``set``/``get`` loops with
+``set_many``/``get_many`` on batches of cached compression results: a cold write, a warm
+read from Redis (L0 disabled), and a read after Redis lost the keys so they come from disk.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import tempfile
+import time
+
+from shared.cache.cache import CacheLayer
+
+
+class InMemoryRedis:
+    """Just enough of the redis.asyncio client for ``CacheLayer``, counting round trips."""
+
+    def __init__(self, rtt_seconds: float) -> None:
+        self.data: dict[str, str] = {}
+        self.round_trips = 0
+        self._rtt = rtt_seconds
+
+    async def _round_trip(self) -> None:
+        self.round_trips += 1
+        await asyncio.sleep(self._rtt)
+
+    async def get(self, key: str) -> str | None:
+        await self._round_trip()
+        return self.data.get(key)
+
+    async def set(self, key: str, value: str, ex: int | None = None) -> None:
+        await self._round_trip()
+        self.data[key] = value
+
+    async def mget(self, keys: list[str]) -> list[str | None]:
+        await self._round_trip()
+        return [self.data.get(key) for key in keys]
+
+    def pipeline(self, transaction: bool = True) -> InMemoryPipeline:
+        return InMemoryPipeline(self)
+
+
+class InMemoryPipeline:
+    def __init__(self, redis: InMemoryRedis) -> None:
+        self._redis = redis
+        self._writes: list[tuple[str, str]] = []
+
+    async def __aenter__(self) -> InMemoryPipeline:
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        return None
+
+    def set(self, key: str, value: str, ex: int | None = None) -> InMemoryPipeline:
+        self._writes.append((key, value))
+        return self
+
+    async def execute(self) -> list[bool]:
+        await self._redis._round_trip()
+        self._redis.data.update(self._writes)
+        return [True] * len(self._writes)
+
+
+def make_batch(size: int) -> dict[str, dict]:
+    return {
+        f"scaledown:compress:bench:{i}": {
+            "compressed": "waterproof oak sofa, kiln-dried frame, 10 year warranty " * 4,
+            "ratio": 0.42,
+            "similarity": 0.95,
+            "used_fallback": False,
+        }
+        for i in range(size)
+    }
+
+
+async def run(batch: dict[str, dict], rounds: int, rtt: float) -> None:
+    keys = list(batch)
+    with tempfile.TemporaryDirectory() as path:
+        redis = InMemoryRedis(rtt)
+        # L0 off, so every read below reaches Redis.
+        layer = CacheLayer("redis://unused", path, l0_max_bytes=0, redis=redis)
+        await layer.connect()
+
+        async def looped_set() -> None:
+            for key, value in batch.items():
+                await layer.set(key, value)
+
+        async def looped_get() -> None:
+            for key in keys:
+                await layer.get(key)
+
+        steps = (
+            ("write", looped_set, lambda: layer.set_many(batch)),
+            ("read redis", looped_get, lambda: layer.get_many(keys)),
+            ("read disk", looped_get, lambda: layer.get_many(keys)),
+        )
+        for name, looped, batched in steps:
+            for mode, operation in (("per-key", looped), ("batched", batched)):
+                redis.round_trips = 0
+                started = time.perf_counter()
+                for _ in range(rounds):
+                    if name == "read disk":
+                        redis.data.clear()  # reads fall through to disk and write back
+                    await operation()
+                elapsed = (time.perf_counter() - started) / rounds
+                print(f"batch={len(batch)} {name:<10} {mode:<8} "
+                      f"round trips/batch={redis.round_trips / rounds:6.1f} "
+                      f"latency={elapsed * 1000:8.2f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch", type=int, default=128)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--rtt-ms", type=float, default=0.5)
+    args = parser.parse_args()
+
+    asyncio.run(run(make_batch(args.batch), args.rounds, args.rtt_ms / 1000))
+
+
+if __name__ == "__main__":
+    main()
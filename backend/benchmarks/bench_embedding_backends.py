@@ -0,0 +1,83 @@
+"""Compare latency and accuracy of the CPU model backends in ``shared.models.registry``.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_embedding_backends --batch-size 32 --batches 20
+
+Accuracy is reported against the fp32 ``torch`` backend: mean and minimum cosine between
+the two backends' embeddings of the same text, and how often both agree on the nearest
+neighbour of each text within the sample.
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+
+from shared.models.registry import ModelRegistry
+
+MODELS = ("sentence-transformers/all-MiniLM-L6-v2", "sentence-transformers/all-mpnet-base-v2")
+WORDS = (
+    "sofa oak walnut waterproof fabric cushion frame warranty dimensions leather recliner "
+    "modular sectional velvet storage ottoman lightweight compact assembly steel legs"
+).split()
+
+
+def sample_texts(count: int, seed: int = 0) -> list[str]:
+    rng = np.random.default_rng(seed)
+    return [" ".join(rng.choice(WORDS, size=rng.integers(8, 40))) for _ in range(count)]
+
+
+def run(model_name: str, backend: str, texts: list[str], batch_size: int):
+    registry = ModelRegistry(backend=backend)
+    started = time.perf_counter()
+    model = registry.get(model_name)
+    load_s = time.perf_counter() - started
+    model.encode(texts[:batch_size], normalize_embeddings=True)
+    latencies = []
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        batch = texts[start : start + batch_size]
+        t0 = time.perf_counter()
+        vectors.append(model.encode(batch, batch_size=batch_size, normalize_embeddings=True))
+        latencies.append((time.perf_counter() - t0) * 1000)
+    return load_s, np.array(latencies), np.concatenate(vectors)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--batches", type=int, default=20)
+    parser.add_argument("--model", choices=MODELS, action="append")
+    args = parser.parse_args()
+
+    texts = sample_texts(args.batch_size * args.batches)
+    for model_name in args.model or MODELS:
+        baseline = None
+        for backend in ("torch", "int8"):
+            load_s, latencies, vectors = run(model_name, backend, texts, args.batch_size)
+            p50, p95 = np.percentile(latencies, [50, 95])
+            line = (
+                f"{model_name} [{backend}] load={load_s:.1f}s p50={p50:.1f}ms p95={p95:.1f}ms "
+                f"texts/s={len(texts) / (latencies.sum() / 1000):.0f}"
+            )
+            if baseline is None:
+                baseline = vectors
+            else:
+                cosine = np.einsum("ij,ij->i", baseline, vectors)
+                sims_ref = baseline @ baseline.T
+                sims_new = vectors @ vectors.T
+                np.fill_diagonal(sims_ref, -np.inf)
+                np.fill_diagonal(sims_new, -np.inf)
+                agreement = np.mean(sims_ref.argmax(axis=1) == sims_new.argmax(axis=1))
+                line += (
+                    f" cosine_mean={cosine.mean():.4f} cosine_min={cosine.min():.4f}"
+                    f" nn_agreement={agreement:.3f}"
+                )
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
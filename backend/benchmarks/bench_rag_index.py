@@ -0,0 +1,150 @@
+"""Recall and latency of the RAG retrieval indexes on a synthetic catalogue.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_rag_index --docs 1000000 --queries 200
+
+Vectors are clustered unit vectors in the compressed-model dimension (384). The vector
+part reports recall@10 of ``IVFPQIndex`` against exact search for several ``nprobe``
+values; the hybrid part times ``HybridRetriever`` end to end (add, query with and without
+a metadata filter, snapshot, and restart from the memory-mapped snapshot). Use
+``--parts vector`` to skip the hybrid build, which re-trains the index.
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+import sys
+import tempfile
+import time
+import types
+from pathlib import Path
+
+import numpy as np
+
+# Import the rag app modules as a package without building the FastAPI app.
+_package = types.ModuleType("rag_app")
+_package.__path__ = [str(Path(__file__).parent.parent / "services" / "rag" / "app")]
+sys.modules.setdefault("rag_app", _package)
+IVFPQIndex = importlib.import_module("rag_app.index").IVFPQIndex
+HybridRetriever = importlib.import_module("rag_app.retriever").HybridRetriever
+
+WORDS = (
+    "sofa oak walnut waterproof fabric cushion frame warranty dimensions leather recliner "
+    "modular sectional velvet storage ottoman lightweight compact assembly steel legs"
+).split()
+CATEGORIES = ("sofa", "chair", "table", "bed", "lamp", "rug", "desk", "shelf")
+
+
+def sample_vectors(count: int, dim: int, seed: int = 0, chunk: int = 100_000) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(count // 500, 16), dim)).astype(np.float32)
+    vectors = np.empty((count, dim), dtype=np.float32)
+    for start in range(0, count, chunk):
+        size = min(chunk, count - start)
+        block = centers[rng.integers(0, len(centers), size)]
+        block += 0.6 * rng.normal(size=(size, dim)).astype(np.float32)
+        vectors[start : start + size] = block / np.linalg.norm(block, axis=1, keepdims=True)
+    return vectors
+
+
+def sample_queries(vectors: np.ndarray, count: int, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    queries = vectors[rng.choice(len(vectors), size=count, replace=False)]
+    queries = queries + 0.1 * rng.normal(size=queries.shape).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def percentiles(latencies: list[float]) -> str:
+    p50, p95 = np.percentile(np.array(latencies) * 1000, [50, 95])
+    return f"p50={p50:.2f}ms p95={p95:.2f}ms"
+
+
+def bench_vector(vectors: np.ndarray, queries: np.ndarray, args) -> None:
+    truth = [np.argpartition(-(vectors @ query), 10)[:10] for query in queries]
+    index = IVFPQIndex(vectors.shape[1], nlist=args.nlist, m=args.m)
+    started = time.perf_counter()
+    for start in range(0, len(vectors), 10_000):
+        block = vectors[start : start + 10_000]
+        index.add(np.arange(start, start + len(block)), block)
+    index.compact()
+    print(f"vector build: {time.perf_counter() - started:.1f}s for {len(vectors)} docs, "
+          f"{args.m} PQ bytes/vector (+{vectors.shape[1] + 4} with refine)")
+    for refine in (0, 4, 16):
+        index.refine = refine
+        for nprobe in (4, 16, 64):
+            index.nprobe = nprobe
+            latencies, recall = [], 0.0
+            for query, expected in zip(queries, truth):
+                started = time.perf_counter()
+                found, _ = index.search(query, 10)
+                latencies.append(time.perf_counter() - started)
+                recall += len(np.intersect1d(found, expected)) / 10
+            print(f"  refine={refine:<2} nprobe={nprobe:<2} "
+                  f"recall@10={recall / len(queries):.3f} {percentiles(latencies)}")
+
+
+def bench_hybrid(vectors: np.ndarray, queries: np.ndarray, args) -> None:
+    rng = np.random.default_rng(2)
+    with tempfile.TemporaryDirectory() as path:
+        retriever = HybridRetriever(
+            vectors.shape[1], nlist=args.nlist, m=args.m, nprobe=args.nprobe, path=path
+        )
+        started = time.perf_counter()
+        for start in range(0, len(vectors), 10_000):
+            block = vectors[start : start + 10_000]
+            retriever.add(
+                [f"doc-{start + i}" for i in range(len(block))],
+                [" ".join(rng.choice(WORDS, size=rng.integers(6, 30))) for _ in block],
+                block,
+                [
+                    {"category": CATEGORIES[(start + i) % len(CATEGORIES)],
+                     "price": float((start + i) % 1000)}
+                    for i in range(len(block))
+                ],
+            )
+        print(f"hybrid build: {time.perf_counter() - started:.1f}s")
+        texts = [" ".join(rng.choice(WORDS, size=3)) for _ in queries]
+        for label, filters in (("unfiltered", None),
+                               ("filtered", {"category": "sofa", "price": {"lt": 500}})):
+            latencies = []
+            for text, query in zip(texts, queries):
+                started = time.perf_counter()
+                retriever.search(text, query, 10, filters=filters)
+                latencies.append(time.perf_counter() - started)
+            print(f"  hybrid {label}: {percentiles(latencies)}")
+        started = time.perf_counter()
+        retriever.snapshot()
+        print(f"  snapshot: {time.perf_counter() - started:.1f}s")
+        restored = HybridRetriever(vectors.shape[1], m=args.m, nprobe=args.nprobe, path=path)
+        started = time.perf_counter()
+        restored.load_latest()
+        loaded = time.perf_counter() - started
+        started = time.perf_counter()
+        restored.search(texts[0], queries[0], 10)
+        print(f"  restart: load={loaded:.2f}s first query={time.perf_counter() - started:.3f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--nlist", type=int, default=1024)
+    parser.add_argument("--m", type=int, default=48)
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument("--parts", default="vector,hybrid")
+    args = parser.parse_args()
+
+    vectors = sample_vectors(args.docs, args.dim)
+    queries = sample_queries(vectors, args.queries)
+    parts = set(args.parts.split(","))
+    if "vector" in parts:
+        bench_vector(vectors, queries, args)
+    if "hybrid" in parts:
+        bench_hybrid(vectors, queries, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,334 @@
 from __future__ import annotations
 
+import fcntl
+import io
+import os
+import re
+import tempfile
+import threading
+import uuid
+import zipfile
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
 import numpy as np
-from sklearn.linear_model import Ridge
+
+_VERSION_FILE = re.compile(r"^alignment-v(\d+)\.npz$")
+_CHUNK_FILE = re.compile(r"^chunk-[0-9a-f]{32}-(\d+)\.npz$")
+
+
+@dataclass(frozen=True)
+class AlignmentWeights:
+    version: int
+    weights: np.ndarray
+    bias: np.ndarray
+    samples: int
+
+
+def read_chunk(body: bytes) -> tuple[np.ndarray, np.ndarray]:
+    """The ``compressed`` and ``original`` arrays of an ``.npz`` training chunk.
+
+    Raises ``ValueError`` for anything else: a bare ``.npy``, a corrupt archive, missing
+    arrays, or arrays that are not numeric or hold NaN or infinite values.
+    """
+    try:
+        chunk = np.load(io.BytesIO(body), allow_pickle=False)
+        if not isinstance(chunk, np.lib.npyio.NpzFile):
+            raise ValueError("expected an .npz archive")
+        with chunk:
+            arrays = chunk["compressed"], chunk["original"]
+    except (OSError, EOFError, KeyError, zipfile.BadZipFile) as exc:
+        raise ValueError(str(exc)) from exc
+    for array in arrays:
+        if not np.issubdtype(array.dtype, np.number):
+            raise ValueError(f"expected numeric arrays, got {array.dtype}")
+        if not np.isfinite(array).all():
+            raise ValueError("arrays must not contain NaN or infinite values")
+    return arrays
+
+
+class RidgeAccumulator:
+    """Sufficient statistics for ridge regression with an unpenalized intercept.
+
+    Chunks can be added in any order and size; ``solve`` gives the same coefficients as a
+    single ridge fit (``sklearn.linear_model.Ridge``) over all rows seen so far.
+    """
+
+    def __init__(self, in_dim: int, out_dim: int) -> None:
+        self.samples = 0
+        self.sum_x = np.zeros(in_dim)
+        self.sum_y = np.zeros(out_dim)
+        self.xtx = np.zeros((in_dim, in_dim))
+        self.xty = np.zeros((in_dim, out_dim))
+
+    @classmethod
+    def of(cls, x: np.ndarray, y: np.ndarray) -> RidgeAccumulator:
+        if np.ndim(x) != 2 or np.ndim(y) != 2:
+            raise ValueError("Expected two 2-D arrays with the same number of rows")
+        accumulator = cls(np.shape(x)[1], np.shape(y)[1])
+        accumulator.add(x, y)
+        return accumulator
+
+    @classmethod
+    def from_arrays(cls, data) -> RidgeAccumulator:
+        accumulator = cls(*data["xty"].shape)
+        accumulator.samples = int(data["samples"])
+        accumulator.sum_x = np.array(data["sum_x"])
+        accumulator.sum_y = np.array(data["sum_y"])
+        accumulator.xtx = np.array(data["xtx"])
+        accumulator.xty = np.array(data["xty"])
+        return accumulator
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        return {
+            "samples": np.asarray(self.samples),
+            "sum_x": self.sum_x,
+            "sum_y": self.sum_y,
+            "xtx": self.xtx,
+            "xty": self.xty,
+        }
+
+    def add(self, x: np.ndarray, y: np.ndarray) -> None:
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        if x.ndim != 2 or y.ndim != 2 or len(x) != len(y):
+            raise ValueError("Expected two 2-D arrays with the same number of rows")
+        self._check_dims(x.shape[1], y.shape[1])
+        with np.errstate(over="ignore", invalid="ignore"):
+            xtx = x.T @ x
+            xty = x.T @ y
+        # One NaN or overflow would poison the statistics for good, so check before adding.
+        if not (np.isfinite(xtx).all() and np.isfinite(xty).all()):
+            raise ValueError("Training data must be finite")
+        self.samples += len(x)
+        self.sum_x += x.sum(axis=0)
+        self.sum_y += y.sum(axis=0)
+        self.xtx += xtx
+        self.xty += xty
+
+    def merge(self, other: RidgeAccumulator) -> None:
+        self._check_dims(*other.xty.shape)
+        self.samples += other.samples
+        self.sum_x += other.sum_x
+        self.sum_y += other.sum_y
+        self.xtx += other.xtx
+        self.xty += other.xty
+
+    def solve(self, alpha: float) -> tuple[np.ndarray, np.ndarray]:
+        if not self.samples:
+            raise RuntimeError("No training data accumulated")
+        mean_x = self.sum_x / self.samples
+        mean_y = self.sum_y / self.samples
+        sxx = self.xtx - self.samples * np.outer(mean_x, mean_x)
+        sxy = self.xty - self.samples * np.outer(mean_x, mean_y)
+        weights = np.linalg.solve(sxx + alpha * np.eye(len(sxx)), sxy)
+        bias = mean_y - mean_x @ weights
+        return weights, bias
+
+    def _check_dims(self, in_dim: int, out_dim: int) -> None:
+        if in_dim != self.xtx.shape[0] or out_dim != self.xty.shape[1]:
+            raise ValueError(
+                f"Expected {self.xtx.shape[0]} -> {self.xty.shape[1]} dims, "
+                f"got {in_dim} -> {out_dim}"
+            )
 
 
 class AlignmentModel:
-    def __init__(self) -> None:
-        self._model = Ridge(alpha=1.0)
-        self._fitted = False
+    """Linear map from compressed-model embeddings into the original model's space.
+
+    Training streams chunks into ``RidgeAccumulator`` statistics; ``commit`` solves, writes a
+    new versioned snapshot (weights plus the accumulated statistics, so training can resume
+    after a restart) and swaps it in with a single reference assignment. ``transform``
+    is one matmul against whichever version is current.
+
+    With a ``path`` on a volume shared by every replica, each chunk's statistics are written
+    there as ``chunk-*.npz`` rather than kept in memory, so any replica can accept chunks and
+    ``commit`` merges all of them into the latest snapshot under an exclusive file lock.
+    Other replicas pick the new version up through ``refresh``. Without a path, chunks are
+    accumulated in process.
+    """
+
+    def __init__(self, alpha: float = 1.0, path: str | None = None) -> None:
+        self._alpha = alpha
+        self._dir = Path(path) if path else None
+        self._current: AlignmentWeights | None = None
+        self._accumulator: RidgeAccumulator | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> int | None:
+        current = self._current
+        return current.version if current else None
+
+    @property
+    def pending_samples(self) -> int:
+        if self._dir is not None:
+            return sum(samples for _, samples in self._pending_chunks())
+        return self._accumulator.samples if self._accumulator else 0
+
+    def partial_fit(self, compressed: np.ndarray, original: np.ndarray) -> int:
+        """Add one chunk and return the number of samples waiting for ``commit``."""
+        chunk = RidgeAccumulator.of(compressed, original)
+        current = self._current
+        if current is not None and current.weights.shape != chunk.xty.shape:
+            raise ValueError(
+                "Expected {} -> {} dims, got {} -> {}".format(
+                    *current.weights.shape, *chunk.xty.shape
+                )
+            )
+        with self._lock:
+            if self._dir is not None:
+                name = f"chunk-{uuid.uuid4().hex}-{chunk.samples}.npz"
+                self._write(name, chunk.arrays())
+                return self.pending_samples
+            if self._accumulator is None:
+                self._accumulator = chunk
+            else:
+                self._accumulator.merge(chunk)
+            return self._accumulator.samples
+
+    def fit(self, compressed: np.ndarray, original: np.ndarray) -> AlignmentWeights:
+        """Train on exactly this data, discarding earlier statistics and pending chunks."""
+        return self._commit(RidgeAccumulator.of(compressed, original), resume=False)
+
+    def commit(self) -> AlignmentWeights:
+        return self._commit(None, resume=True)
 
-    def fit(self, compressed: np.ndarray, original: np.ndarray) -> None:
-        self._model.fit(compressed, original)
-        self._fitted = True
+    def load_latest(self) -> AlignmentWeights | None:
+        version = self._latest_version_on_disk()
+        if not version:
+            return None
+        with np.load(self._dir / f"alignment-v{version}.npz") as data:
+            snapshot = AlignmentWeights(
+                version=version,
+                weights=data["weights"],
+                bias=data["bias"],
+                samples=int(data["samples"]),
+            )
+            accumulator = RidgeAccumulator.from_arrays(data)
+        with self._lock:
+            self._accumulator = accumulator
+            self._current = snapshot
+        return snapshot
+
+    def refresh(self) -> AlignmentWeights | None:
+        """Load the latest snapshot if another replica committed a newer one."""
+        if self._latest_version_on_disk() > (self.version or 0):
+            return self.load_latest()
+        return None
 
     def transform(self, compressed: np.ndarray) -> np.ndarray:
-        if not self._fitted:
+        current = self._current
+        if current is None:
             raise RuntimeError("Alignment model not trained")
-        return self._model.predict(compressed)
+        return compressed @ current.weights + current.bias
+
+    def _commit(self, accumulator: RidgeAccumulator | None, resume: bool) -> AlignmentWeights:
+        """Solve and publish ``accumulator``, or with ``resume`` the current statistics plus
+        every pending chunk."""
+        with self._lock, self._commit_lock():
+            merged: list[str] = []
+            if self._dir is None:
+                if resume:
+                    accumulator = self._accumulator
+            else:
+                base, merged = self._shared_statistics()
+                if resume:
+                    accumulator = base
+                    for name in merged:
+                        with np.load(self._dir / name) as data:
+                            chunk = RidgeAccumulator.from_arrays(data)
+                        if accumulator is None:
+                            accumulator = chunk
+                        else:
+                            accumulator.merge(chunk)
+            if accumulator is None:
+                raise RuntimeError("No training data accumulated")
+            weights, bias = accumulator.solve(self._alpha)
+            version = max(self._latest_version_on_disk(), self.version or 0) + 1
+            snapshot = AlignmentWeights(
+                version=version,
+                weights=weights.astype(np.float32),
+                bias=bias.astype(np.float32),
+                samples=accumulator.samples,
+            )
+            if self._dir is not None:
+                self._write(
+                    f"alignment-v{version}.npz",
+                    {
+                        "weights": snapshot.weights,
+                        "bias": snapshot.bias,
+                        "merged": np.array(merged, dtype=str),
+                        **accumulator.arrays(),
+                    },
+                )
+                # Chunks go after the snapshot naming them exists; see _shared_statistics.
+                for name in merged:
+                    (self._dir / name).unlink(missing_ok=True)
+            self._accumulator = accumulator
+            self._current = snapshot
+            return snapshot
+
+    def _shared_statistics(self) -> tuple[RidgeAccumulator | None, list[str]]:
+        """Statistics of the latest snapshot on disk, and the chunk files not yet in it.
+
+        A commit that stopped between writing its snapshot and deleting its chunks leaves
+        them behind; the snapshot lists them under ``merged`` so they are not counted twice.
+        """
+        latest = self._latest_version_on_disk()
+        base, already = None, set()
+        if latest:
+            with np.load(self._dir / f"alignment-v{latest}.npz") as data:
+                base = RidgeAccumulator.from_arrays(data)
+                if "merged" in data:
+                    already = set(data["merged"].tolist())
+        for name in already:
+            (self._dir / name).unlink(missing_ok=True)
+        pending = [name for name, _ in self._pending_chunks() if name not in already]
+        return base, pending
+
+    @contextmanager
+    def _commit_lock(self) -> Iterator[None]:
+        """Serializes commits across replicas sharing the directory."""
+        if self._dir is None:
+            yield
+            return
+        self._dir.mkdir(parents=True, exist_ok=True)
+        with open(self._dir / "commit.lock", "w") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _pending_chunks(self) -> list[tuple[str, int]]:
+        if self._dir is None or not self._dir.exists():
+            return []
+        return sorted(
+            (entry.name, int(match.group(1)))
+            for entry in self._dir.iterdir()
+            if (match := _CHUNK_FILE.match(entry.name))
+        )
+
+    def _latest_version_on_disk(self) -> int:
+        if self._dir is None or not self._dir.exists():
+            return 0
+        versions = [
+            int(match.group(1))
+            for match in (_VERSION_FILE.match(entry.name) for entry in self._dir.iterdir())
+            if match
+        ]
+        return max(versions, default=0)
+
+    def _write(self, name: str, arrays: dict[str, np.ndarray]) -> None:
+        self._dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self._dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                np.savez(handle, **arrays)
+            os.replace(tmp_path, self._dir / name)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+from concurrent.futures import Executor
+
+import numpy as np
+
+EncodeFn = Callable[[list[str]], np.ndarray]
+
+
+class DynamicBatcher:
+    """Collects texts from concurrent callers and encodes them together.
+
+    A batch is dispatched once ``max_batch_size`` texts are queued or ``max_wait_ms`` has
+    passed since the first one arrived. Encoding runs on ``executor`` so the event loop
+    keeps accepting requests while the model works.
+    """
+
+    def __init__(
+        self, encode: EncodeFn, executor: Executor, max_batch_size: int, max_wait_ms: float
+    ) -> None:
+        self._encode = encode
+        self._executor = executor
+        self._max_batch_size = max_batch_size
+        self._max_wait = max_wait_ms / 1000.0
+        self._queue: asyncio.Queue[tuple[str, asyncio.Future]] = asyncio.Queue()
+        self._task: asyncio.Task | None = None
+
+    async def encode(self, texts: list[str]) -> np.ndarray:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in texts]
+        for text, future in zip(texts, futures):
+            self._queue.put_nowait((text, future))
+        return np.stack(await asyncio.gather(*futures))
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self._max_wait
+            while len(batch) < self._max_batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except TimeoutError:
+                    break
+
+            live = [(text, future) for text, future in batch if not future.done()]
+            if not live:
+                continue
+            try:
+                vectors = await loop.run_in_executor(
+                    self._executor, self._encode, [text for text, _ in live]
+                )
+            except Exception as exc:
+                for _, future in live:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            for (_, future), vector in zip(live, vectors):
+                if not future.done():
+                    future.set_result(vector)
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+
+import numpy as np
+
+from shared.cache.cache import CacheLayer
+from shared.metrics.metrics import CACHE_HITS, CACHE_MISSES
+
+ComputeFn = Callable[[list[str]], Awaitable[np.ndarray]]
+
+
+def encode_vector(vector: np.ndarray) -> dict:
+    data = np.ascontiguousarray(vector, dtype=np.float32)
+    return {"dtype": "float32", "data": base64.b64encode(data.tobytes()).decode("ascii")}
+
+
+def decode_vector(payload: dict) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(payload["data"]), dtype=payload["dtype"])
+
+
+class EmbeddingCache:
+    """Two-level embedding cache: a bounded in-process LRU in front of ``CacheLayer``.
+
+    Vectors are stored in the shared tier as base64 float32 rather than JSON float lists.
+    Keys combine the model name, the normalization flag and a hash of the text. If the layer
+    never connected (Redis down at startup), only the in-process LRU is used.
+    """
+
+    def __init__(
+        self, service: str, l1_size: int, layer: CacheLayer | None, ttl_seconds: int
+    ) -> None:
+        self._service = service
+        self._l1_size = l1_size
+        self._l1: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._layer = layer
+        self._ttl = ttl_seconds
+
+    @staticmethod
+    def key(model: str, normalize: bool, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"emb:{model}:{int(normalize)}:{digest}"
+
+    async def encode(
+        self, model: str, normalize: bool, texts: list[str], compute: ComputeFn
+    ) -> np.ndarray:
+        keys = [self.key(model, normalize, text) for text in texts]
+        found = await self._lookup(dict(zip(keys, texts)))
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        if missing:
+            vectors = await compute(list(missing.values()))
+            computed = dict(zip(missing, vectors))
+            found.update(computed)
+            self._remember(computed)
+            await self._store(computed)
+        return np.stack([found[key] for key in keys])
+
+    async def _lookup(self, unique: dict[str, str]) -> dict[str, np.ndarray]:
+        found: dict[str, np.ndarray] = {}
+        for key in unique:
+            vector = self._l1.get(key)
+            if vector is not None:
+                self._l1.move_to_end(key)
+                found[key] = vector
+        CACHE_HITS.labels(self._service, "embedding_l1").inc(len(found))
+        CACHE_MISSES.labels(self._service, "embedding_l1").inc(len(unique) - len(found))
+
+        l2_keys = [key for key in unique if key not in found]
+        if not l2_keys or not self._shared:
+            return found
+        try:
+            payloads = await self._layer.get_many(l2_keys)
+        except Exception:
+            payloads = [None] * len(l2_keys)
+        from_l2 = {
+            key: decode_vector(payload)
+            for key, payload in zip(l2_keys, payloads)
+            if payload is not None
+        }
+        CACHE_HITS.labels(self._service, "embedding_l2").inc(len(from_l2))
+        CACHE_MISSES.labels(self._service, "embedding_l2").inc(len(l2_keys) - len(from_l2))
+        self._remember(from_l2)
+        found.update(from_l2)
+        return found
+
+    def _remember(self, vectors: dict[str, np.ndarray]) -> None:
+        for key, vector in vectors.items():
+            # Copy so a cached row does not pin the whole batch array it was sliced from.
+            vector = np.array(vector, dtype=np.float32)
+            vector.flags.writeable = False
+            self._l1[key] = vector
+            self._l1.move_to_end(key)
+        while len(self._l1) > self._l1_size:
+            self._l1.popitem(last=False)
+
+    @property
+    def _shared(self) -> bool:
+        return self._layer is not None and self._layer.connected
+
+    async def _store(self, vectors: dict[str, np.ndarray]) -> None:
+        if not self._shared:
+            return
+        try:
+            await self._layer.set_many(
+                {key: encode_vector(vector) for key, vector in vectors.items()},
+                ttl_seconds=self._ttl,
+            )
+        except Exception:
+            pass
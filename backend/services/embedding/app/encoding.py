@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import base64
+from typing import Literal
+
+import numpy as np
+from starlette.responses import Response
+
+Output = Literal["original", "compressed", "aligned"]
+Encoding = Literal["json", "base64_float32", "base64_float16"]
+
+OUTPUTS: tuple[Output, ...] = ("original", "compressed", "aligned")
+OCTET_STREAM = "application/octet-stream"
+
+
+def wants_octet_stream(accept: str | None) -> bool:
+    return bool(accept) and OCTET_STREAM in accept
+
+
+def render_json(vectors: dict[str, np.ndarray], encoding: Encoding) -> dict:
+    if encoding == "json":
+        return {f"embedding_{name}": array.tolist() for name, array in vectors.items()}
+    dtype = np.float16 if encoding == "base64_float16" else np.float32
+    rendered = {}
+    for name, array in vectors.items():
+        data = np.ascontiguousarray(array, dtype=dtype)
+        rendered[f"embedding_{name}"] = {
+            "dtype": data.dtype.name,
+            "shape": list(data.shape),
+            "data": base64.b64encode(data.tobytes()).decode("ascii"),
+        }
+    return rendered
+
+
+def render_octet_stream(vectors: dict[str, np.ndarray]) -> Response:
+    """Raw little-endian float32 buffers, concatenated in the order of ``vectors``.
+
+    ``X-Embedding-Layout`` lists each block as ``name=ROWSxDIM`` (or ``name=DIM`` for a
+    single vector) so clients can split the body with ``np.frombuffer``.
+    """
+    blocks = [np.ascontiguousarray(array, dtype="<f4") for array in vectors.values()]
+    layout = ",".join(
+        f"{name}={'x'.join(str(dim) for dim in block.shape)}"
+        for name, block in zip(vectors, blocks)
+    )
+    return Response(
+        content=b"".join(block.tobytes() for block in blocks),
+        media_type=OCTET_STREAM,
+        headers={"X-Embedding-Layout": layout},
+    )
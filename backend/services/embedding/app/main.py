@@ -1,28 +1,99 @@
 from __future__ import annotations
 
+import asyncio
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
-from fastapi import FastAPI
-from pydantic import BaseModel
-from sentence_transformers import SentenceTransformer
+from fastapi import FastAPI, HTTPException, Request
+from pydantic import BaseModel, Field
 
 from shared.app_factory import create_app
+from shared.cache.cache import CacheLayer
 from shared.config.settings import get_settings
 from shared.logging.logger import configure_logging
+from shared.models.registry import get_registry
 
-from .alignment import AlignmentModel
+from .alignment import AlignmentModel, read_chunk
+from .batcher import DynamicBatcher
+from .cache import EmbeddingCache
+from .encoding import (
+    OUTPUTS,
+    Encoding,
+    Output,
+    render_json,
+    render_octet_stream,
+    wants_octet_stream,
+)
 
 settings = get_settings()
 settings.service_name = "embedding-service"
 configure_logging(settings.log_level)
 
-app: FastAPI = create_app(settings)
-model_original = SentenceTransformer("sentence-transformers/all-mpnet-base-v2")
-model_compressed = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-aligner = AlignmentModel()
+ORIGINAL_MODEL = "sentence-transformers/all-mpnet-base-v2"
+COMPRESSED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+registry = get_registry(settings.models.backend)
+app: FastAPI = create_app(
+    settings,
+    readiness=lambda: {
+        # Warmed models gate readiness; otherwise they load on first use.
+        **registry.status(
+            [ORIGINAL_MODEL, COMPRESSED_MODEL] if settings.models.warm_up else [],
+            optional=[ORIGINAL_MODEL, COMPRESSED_MODEL],
+        ),
+        "shared_cache": cache_layer.connected,
+    },
+)
+aligner = AlignmentModel(
+    alpha=settings.embedding.alignment_alpha, path=settings.embedding.alignment_path
+)
+# EmbeddingCache keeps decoded vectors in its own L1, so the layer's L0 would only duplicate it.
+cache_layer = CacheLayer(
+    settings.redis.url,
+    settings.redis.l2_disk_cache_path,
+    l0_max_bytes=0,
+    service=settings.service_name,
+    writeback_ttl_seconds=settings.embedding.cache_ttl_seconds,
+)
+embedding_cache = EmbeddingCache(
+    settings.service_name,
+    l1_size=settings.embedding.cache_l1_size,
+    layer=cache_layer,
+    ttl_seconds=settings.embedding.cache_ttl_seconds,
+)
+
+
+def _batcher(model_name: str) -> DynamicBatcher:
+    max_batch_size = settings.embedding.max_batch_size
+
+    def encode(texts: list[str]) -> np.ndarray:
+        model = registry.get(model_name)
+        return model.encode(texts, batch_size=max_batch_size, normalize_embeddings=True)
+
+    # One worker per model: each model runs one batch at a time, both models in parallel.
+    return DynamicBatcher(
+        encode,
+        ThreadPoolExecutor(max_workers=1),
+        max_batch_size=max_batch_size,
+        max_wait_ms=settings.embedding.max_wait_ms,
+    )
+
+
+original_batcher = _batcher(ORIGINAL_MODEL)
+compressed_batcher = _batcher(COMPRESSED_MODEL)
+_background: list[asyncio.Task] = []
 
 
 class EmbedRequest(BaseModel):
     text: str
+    outputs: list[Output] = Field(default_factory=lambda: list(OUTPUTS))
+    encoding: Encoding = Field(default="json")
+
+
+class EmbedBatchRequest(BaseModel):
+    texts: list[str]
+    outputs: list[Output] = Field(default_factory=lambda: list(OUTPUTS))
+    encoding: Encoding = Field(default="json")
 
 
 class AlignmentTrainRequest(BaseModel):
@@ -30,24 +101,117 @@ class AlignmentTrainRequest(BaseModel):
     original_embeddings: list[list[float]]
 
 
+async def _embed(texts: list[str], outputs: list[Output]) -> dict[str, np.ndarray]:
+    wanted = [name for name in OUTPUTS if name in outputs]
+    jobs = {}
+    if "original" in wanted:
+        jobs["original"] = embedding_cache.encode(
+            ORIGINAL_MODEL, True, texts, original_batcher.encode
+        )
+    if "compressed" in wanted or "aligned" in wanted:
+        jobs["compressed"] = embedding_cache.encode(
+            COMPRESSED_MODEL, True, texts, compressed_batcher.encode
+        )
+    computed = dict(zip(jobs, await asyncio.gather(*jobs.values())))
+    if "aligned" in wanted:
+        try:
+            computed["aligned"] = aligner.transform(computed["compressed"])
+        except RuntimeError:
+            computed["aligned"] = np.zeros((len(texts), 768), dtype=np.float32)
+    return {name: computed[name] for name in wanted}
+
+
+def _render(vectors: dict[str, np.ndarray], encoding: Encoding, request: Request):
+    if wants_octet_stream(request.headers.get("accept")):
+        return render_octet_stream(vectors)
+    return render_json(vectors, encoding)
+
+
+async def _refresh_alignment_loop() -> None:
+    # Chunks and commits can land on any replica; the others pick up new versions here.
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(settings.embedding.alignment_poll_seconds)
+        try:
+            await loop.run_in_executor(None, aligner.refresh)
+        except Exception:
+            # A snapshot being replaced or a flaky volume: keep serving the current version.
+            pass
+
+
+@app.on_event("startup")
+async def startup() -> None:
+    # Without Redis the layer stays disconnected and embeddings are cached in L1 only.
+    await cache_layer.connect()
+    await asyncio.get_running_loop().run_in_executor(None, aligner.load_latest)
+    _background.append(asyncio.create_task(_refresh_alignment_loop()))
+    if settings.models.warm_up:
+        # Load in the background so /health can report progress while weights load.
+        registry.start_warm_up([ORIGINAL_MODEL, COMPRESSED_MODEL])
+
+
+@app.on_event("shutdown")
+async def shutdown() -> None:
+    for task in _background:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+    await original_batcher.close()
+    await compressed_batcher.close()
+
+
 @app.post("/embed")
-async def embed(payload: EmbedRequest) -> dict:
-    emb_orig = model_original.encode([payload.text], normalize_embeddings=True)[0]
-    emb_comp = model_compressed.encode([payload.text], normalize_embeddings=True)[0]
-    try:
-        emb_aligned = aligner.transform(np.array([emb_comp]))[0]
-    except RuntimeError:
-        emb_aligned = np.zeros(768)
-    return {
-        "embedding_original": emb_orig.tolist(),
-        "embedding_compressed": emb_comp.tolist(),
-        "embedding_aligned": emb_aligned.tolist(),
-    }
+async def embed(payload: EmbedRequest, request: Request):
+    vectors = await _embed([payload.text], payload.outputs)
+    return _render({name: array[0] for name, array in vectors.items()}, payload.encoding, request)
+
+
+@app.post("/embed/batch")
+async def embed_batch(payload: EmbedBatchRequest, request: Request):
+    if not payload.texts:
+        empty = {name: np.zeros((0, 0), dtype=np.float32) for name in payload.outputs}
+        return _render(empty, payload.encoding, request)
+    vectors = await _embed(payload.texts, payload.outputs)
+    return _render(vectors, payload.encoding, request)
 
 
 @app.post("/alignment/train")
 async def train_alignment(payload: AlignmentTrainRequest) -> dict:
     comp = np.array(payload.compressed_embeddings)
     orig = np.array(payload.original_embeddings)
-    aligner.fit(comp, orig)
-    return {"status": "trained", "samples": len(payload.compressed_embeddings)}
+    loop = asyncio.get_running_loop()
+    try:
+        snapshot = await loop.run_in_executor(None, aligner.fit, comp, orig)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    return {"status": "trained", "samples": snapshot.samples, "version": snapshot.version}
+
+
+@app.post("/alignment/chunks")
+async def add_alignment_chunk(request: Request) -> dict:
+    """Accumulate one training chunk sent as an ``.npz`` body.
+
+    The archive must hold ``compressed`` (n x 384) and ``original`` (n x 768) arrays.
+    """
+    body = await request.body()
+    try:
+        comp, orig = read_chunk(body)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid chunk: {exc}") from exc
+    loop = asyncio.get_running_loop()
+    try:
+        pending = await loop.run_in_executor(None, aligner.partial_fit, comp, orig)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    return {"status": "accumulated", "samples": pending}
+
+
+@app.post("/alignment/commit")
+async def commit_alignment() -> dict:
+    loop = asyncio.get_running_loop()
+    try:
+        snapshot = await loop.run_in_executor(None, aligner.commit)
+    except (RuntimeError, ValueError) as exc:
+        # Nothing to commit, or pending chunks whose dimensions disagree.
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+    return {"status": "trained", "samples": snapshot.samples, "version": snapshot.version}
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter
+
+import numpy as np
+
+from .storage import GrowableArray
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN.findall(text.lower())
+
+
+class BM25Index:
+    """Okapi BM25 over an array-based inverted index.
+
+    Postings are kept in CSR form (``offsets`` per term id into parallel document-number and
+    term-frequency arrays). New documents go into unsorted tail arrays that ``compact``
+    merges in. As in Lucene, document frequencies and the collection size include deleted
+    documents until ``remap`` drops them; deleted documents are excluded through ``mask``.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self._vocab: dict[str, int] = {}
+        self._df = GrowableArray(np.int64)
+        self._doc_len = GrowableArray(np.float32)
+        self._total_len = 0.0
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._post_docs = np.zeros(0, dtype=np.int64)
+        self._post_tf = np.zeros(0, dtype=np.float32)
+        self._tail_terms = GrowableArray(np.int64)
+        self._tail_docs = GrowableArray(np.int64)
+        self._tail_tf = GrowableArray(np.float32)
+
+    def __len__(self) -> int:
+        return len(self._doc_len)
+
+    def add(self, docno: int, text: str) -> None:
+        if docno != len(self._doc_len):
+            raise ValueError(f"Expected document number {len(self._doc_len)}, got {docno}")
+        counts = Counter(tokenize(text))
+        self._doc_len.append(sum(counts.values()))
+        self._total_len += sum(counts.values())
+        if not counts:
+            return
+        terms = np.fromiter((self._term_id(term) for term in counts), np.int64, len(counts))
+        self._df.view[terms] += 1
+        self._tail_terms.append(terms)
+        self._tail_docs.append(np.full(len(terms), docno))
+        self._tail_tf.append(np.fromiter(counts.values(), np.float32, len(counts)))
+        if len(self._tail_docs) > max(65536, len(self._post_docs) // 10):
+            self.compact()
+
+    def search(
+        self, query: str, k: int, mask: np.ndarray | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Top-``k`` document numbers and raw BM25 scores; documents without a hit are omitted."""
+        docs_total = len(self._doc_len)
+        scores = np.zeros(docs_total, dtype=np.float32)
+        avg_len = self._total_len / docs_total if docs_total else 0.0
+        tail_terms = self._tail_terms.view
+        for term in set(tokenize(query)):
+            term_id = self._vocab.get(term)
+            if term_id is None:
+                continue
+            in_tail = np.flatnonzero(tail_terms == term_id)
+            docs = np.concatenate(
+                [self._post_docs[self._postings(term_id)], self._tail_docs.view[in_tail]]
+            )
+            tf = np.concatenate(
+                [self._post_tf[self._postings(term_id)], self._tail_tf.view[in_tail]]
+            )
+            df = self._df.view[term_id]
+            idf = math.log(1.0 + (docs_total - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * self._doc_len.view[docs] / avg_len)
+            # Each document appears at most once per term, so plain fancy-index += is safe.
+            scores[docs] += idf * tf * (self.k1 + 1.0) / (tf + norm)
+        if mask is not None:
+            scores[~mask[:docs_total]] = 0.0
+        hits = np.flatnonzero(scores > 0)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return hits, scores[hits]
+
+    def compact(self) -> None:
+        terms = np.concatenate(
+            [np.repeat(np.arange(len(self._offsets) - 1), np.diff(self._offsets)),
+             self._tail_terms.view]
+        )
+        docs = np.concatenate([self._post_docs, self._tail_docs.view])
+        tf = np.concatenate([self._post_tf, self._tail_tf.view])
+        self._set_postings(terms, docs, tf)
+
+    def remap(self, mapping: np.ndarray) -> None:
+        """Renumber documents through ``mapping`` (old -> new, -1 drops the document)."""
+        self.compact()
+        terms = np.repeat(np.arange(len(self._offsets) - 1), np.diff(self._offsets))
+        docs = mapping[self._post_docs]
+        keep = docs >= 0
+        self._set_postings(terms[keep], docs[keep], self._post_tf[keep])
+        self._df = GrowableArray.from_array(np.bincount(terms[keep], minlength=len(self._vocab)))
+        self._doc_len = GrowableArray.from_array(self._doc_len.view[mapping >= 0])
+        self._total_len = float(self._doc_len.view.sum())
+
+    def state(self) -> tuple[list[str], dict[str, np.ndarray]]:
+        self.compact()
+        return list(self._vocab), {
+            "df": self._df.view,
+            "doc_len": self._doc_len.view,
+            "offsets": self._offsets,
+            "post_docs": self._post_docs,
+            "post_tf": self._post_tf,
+        }
+
+    def load_state(self, vocab: list[str], arrays: dict[str, np.ndarray]) -> None:
+        self._vocab = {term: term_id for term_id, term in enumerate(vocab)}
+        self._df = GrowableArray.from_array(np.array(arrays["df"]))
+        self._doc_len = GrowableArray.from_array(arrays["doc_len"])
+        self._total_len = float(np.sum(arrays["doc_len"], dtype=np.float64))
+        self._offsets = arrays["offsets"]
+        self._post_docs = arrays["post_docs"]
+        self._post_tf = arrays["post_tf"]
+
+    def _postings(self, term_id: int) -> slice:
+        if term_id + 1 >= len(self._offsets):
+            return slice(0, 0)
+        return slice(self._offsets[term_id], self._offsets[term_id + 1])
+
+    def _set_postings(self, terms: np.ndarray, docs: np.ndarray, tf: np.ndarray) -> None:
+        order = np.lexsort((docs, terms))
+        self._offsets = np.zeros(len(self._vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(self._vocab)), out=self._offsets[1:])
+        self._post_docs = docs[order]
+        self._post_tf = tf[order]
+        self._tail_terms = GrowableArray(np.int64)
+        self._tail_docs = GrowableArray(np.int64)
+        self._tail_tf = GrowableArray(np.float32)
+
+    def _term_id(self, term: str) -> int:
+        term_id = self._vocab.get(term)
+        if term_id is None:
+            term_id = self._vocab[term] = len(self._vocab)
+            self._df.append(0)
+        return term_id
@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+import httpx
+import numpy as np
+
+from shared.config.settings import Settings
+
+
+class EmbeddingClient:
+    """Fetches compressed-model embeddings from the embedding service as raw float32."""
+
+    def __init__(self, settings: Settings) -> None:
+        self._client = httpx.AsyncClient(
+            base_url=settings.rag.embedding_service_url,
+            timeout=settings.rag.timeout_seconds,
+        )
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+    async def embed(self, texts: list[str]) -> np.ndarray:
+        response = await self._client.post(
+            "/embed/batch",
+            json={"texts": texts, "outputs": ["compressed"]},
+            headers={"Accept": "application/octet-stream"},
+        )
+        response.raise_for_status()
+        return np.frombuffer(response.content, dtype="<f4").reshape(len(texts), -1)
@@ -1,8 +1,11 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from typing import Literal
 
-from shared.security.text_safety import detect_prompt_injection, redact_pii
+import numpy as np
+
+from shared.security.text_safety import scan_text
 
 
 @dataclass
@@ -11,15 +14,133 @@ class RagConfig:
     low_validation_threshold: float = 0.85
 
 
-def hybrid_score(vector_similarity: float, bm25_score: float, metadata_match: float) -> float:
-    return 0.5 * vector_similarity + 0.3 * bm25_score + 0.2 * metadata_match
+FusionMode = Literal["weighted", "rrf"]
 
+# Weights for (vector similarity, BM25, metadata match).
+DEFAULT_WEIGHTS = (0.5, 0.3, 0.2)
 
-def should_fetch_original(query: str, validation_score: float) -> bool:
+
+def hybrid_score(
+    vector_similarity: float | np.ndarray,
+    bm25_score: float | np.ndarray,
+    metadata_match: float | np.ndarray,
+) -> float | np.ndarray:
+    """Weighted blend of the three retrieval signals; works elementwise on arrays."""
+    vector_weight, bm25_weight, metadata_weight = DEFAULT_WEIGHTS
+    return (
+        vector_weight * vector_similarity
+        + bm25_weight * bm25_score
+        + metadata_weight * metadata_match
+    )
+
+
+class HybridScorer:
+    """Fuses per-candidate signal arrays into a top-k ranking.
+
+    ``weighted`` min-max normalizes each signal over the candidate set (a constant signal
+    contributes nothing) and takes the weighted sum; ``rrf`` is reciprocal-rank fusion,
+    ``sum(w / (rrf_k + rank))``. Signal and score buffers are reused across calls and only
+    grow, and per-call weights are copied into a fixed scratch vector rather than building
+    new arrays. Not thread-safe: use one per worker.
+    """
+
+    def __init__(
+        self,
+        weights: tuple[float, float, float] = DEFAULT_WEIGHTS,
+        mode: FusionMode = "weighted",
+        rrf_k: float = 60.0,
+        capacity: int = 1024,
+    ) -> None:
+        self.mode = mode
+        self.rrf_k = rrf_k
+        self._default_weights = np.asarray(weights, dtype=np.float32)
+        self._weights = np.empty(len(weights), dtype=np.float32)
+        self._signals = np.empty((len(weights), capacity), dtype=np.float32)
+        self._scores = np.empty(capacity, dtype=np.float32)
+        self._sorted = np.empty(capacity, dtype=np.float32)
+
+    def top_k(
+        self,
+        vector_similarity: np.ndarray,
+        bm25_score: np.ndarray,
+        metadata_match: np.ndarray,
+        k: int,
+        weights: tuple[float, float, float] | None = None,
+        mode: FusionMode | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Candidate indices of the best ``k`` and their fused scores, best first."""
+        size = len(vector_similarity)
+        self._reserve(size)
+        np.copyto(self._weights, self._default_weights if weights is None else weights)
+        signals = self._signals[:, :size]
+        scores = self._scores[:size]
+        for row, values in enumerate((vector_similarity, bm25_score, metadata_match)):
+            np.copyto(signals[row], values)
+        if (mode or self.mode) == "rrf":
+            self._reciprocal_ranks(signals)
+        else:
+            self._min_max(signals)
+        np.matmul(self._weights, signals, out=scores)
+
+        k = min(k, size)
+        if k <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+        best = np.argpartition(scores, size - k)[size - k :]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return best, scores[best]
+
+    def _min_max(self, signals: np.ndarray) -> None:
+        low = signals.min(axis=1, keepdims=True)
+        span = signals.max(axis=1, keepdims=True) - low
+        np.subtract(signals, low, out=signals)
+        np.divide(signals, span, out=signals, where=span > 0)
+        signals[(span == 0)[:, 0]] = 0.0
+
+    def _reciprocal_ranks(self, signals: np.ndarray) -> None:
+        # Competition ranks (ties share the best rank), so candidates missing from a
+        # signal, e.g. BM25 score 0, get equal and lowest credit instead of arbitrary ranks.
+        size = signals.shape[1]
+        ascending = self._sorted[:size]
+        for row in signals:
+            np.copyto(ascending, row)
+            ascending.sort()
+            greater = size - np.searchsorted(ascending, row, side="right")
+            np.divide(1.0, greater + (1.0 + self.rrf_k), out=row)
+
+    def _reserve(self, size: int) -> None:
+        if size <= self._scores.shape[0]:
+            return
+        capacity = max(size, 2 * self._scores.shape[0])
+        self._signals = np.empty((self._signals.shape[0], capacity), dtype=np.float32)
+        self._scores = np.empty(capacity, dtype=np.float32)
+        self._sorted = np.empty(capacity, dtype=np.float32)
+
+
+def _needs_detail(query: str) -> bool:
     lowered = query.lower()
     technical = any(term in lowered for term in ["dimensions", "spec", "material", "warranty"])
     comparison = "compare" in lowered or "vs" in lowered
-    return technical or comparison or validation_score < 0.85
+    return technical or comparison
+
+
+def should_fetch_original(query: str, validation_score: float) -> bool:
+    return _needs_detail(query) or validation_score < 0.85
+
+
+def expand_mask(
+    query: str, validation_scores: np.ndarray, config: RagConfig | None = None
+) -> np.ndarray:
+    """Per-source decision to swap compressed text for the original.
+
+    A source is expanded when its compression validation score is below
+    ``low_validation_threshold``, or below the stricter ``min_similarity`` for technical
+    and comparison queries, where details lost in compression matter most. Sources with
+    no recorded score (NaN) are always expanded.
+    """
+    config = config or RagConfig()
+    threshold = config.min_similarity if _needs_detail(query) else config.low_validation_threshold
+    scores = np.asarray(validation_scores, dtype=np.float64)
+    return np.isnan(scores) | (scores < threshold)
 
 
 def rewrite_query(query: str) -> str:
@@ -27,6 +148,5 @@ def rewrite_query(query: str) -> str:
 
 
 def sanitize_query(query: str) -> tuple[str, bool]:
-    redacted, redacted_any = redact_pii(query)
-    injection = detect_prompt_injection(redacted)
-    return redacted, injection or redacted_any
+    result = scan_text(query)
+    return result.text, result.injection or result.pii
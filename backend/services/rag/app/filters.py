@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+
+from .storage import GrowableArray
+
+_RANGE_OPS = {"gt": np.greater, "gte": np.greater_equal, "lt": np.less, "lte": np.less_equal}
+
+
+@dataclass(slots=True)
+class _Categorical:
+    """A dictionary-encoded column: ``vocab`` maps keys to codes, ``keys`` codes to keys.
+
+    Keys are the stored values themselves, so ``True`` and ``"true"`` stay distinct.
+    """
+
+    vocab: dict[str | bool, int]
+    keys: list[str | bool]
+    codes: GrowableArray
+
+    def encode(self, key: str | bool) -> int:
+        code = self.vocab.get(key)
+        if code is None:
+            code = self.vocab[key] = len(self.keys)
+            self.keys.append(key)
+        return code
+
+
+class MetadataStore:
+    """Columnar document metadata evaluated as boolean masks over document numbers.
+
+    String and boolean values become dictionary-encoded categorical columns (-1 = missing);
+    numbers become float64 columns (NaN = missing). A filter maps field names to a value
+    (equality), a list of values (any of) or a dict of ``gt``/``gte``/``lt``/``lte`` bounds.
+    """
+
+    def __init__(self) -> None:
+        self._size = 0
+        self._categorical: dict[str, _Categorical] = {}
+        self._numeric: dict[str, GrowableArray] = {}
+
+    def __len__(self) -> int:
+        return self._size
+
+    def check(self, documents: list[dict[str, Any]]) -> None:
+        """Raise ``ValueError`` if appending ``documents`` in order would be rejected."""
+        numeric = set(self._numeric)
+        categorical = set(self._categorical)
+        for metadata in documents:
+            for field, value in metadata.items():
+                if value is None:
+                    continue
+                if isinstance(value, bool | str):
+                    if field in numeric:
+                        raise ValueError(f"Metadata field {field!r} is numeric")
+                    categorical.add(field)
+                elif isinstance(value, int | float):
+                    if field in categorical:
+                        raise ValueError(f"Metadata field {field!r} is categorical")
+                    numeric.add(field)
+                else:
+                    raise ValueError(f"Unsupported metadata value for {field!r}: {value!r}")
+
+    def append(self, metadata: dict[str, Any]) -> None:
+        self.check([metadata])
+        for field, value in metadata.items():
+            if isinstance(value, bool | str):
+                self._category_column(field)
+            elif value is not None:
+                self._numeric_column(field)
+        for field, column in self._categorical.items():
+            value = metadata.get(field)
+            column.codes.append(-1 if value is None else column.encode(_key(value)))
+        for field, column in self._numeric.items():
+            value = metadata.get(field)
+            column.append(np.nan if value is None else float(value))
+        self._size += 1
+
+    def row(self, docno: int) -> dict[str, Any]:
+        values: dict[str, Any] = {}
+        for field, column in self._categorical.items():
+            code = column.codes.view[docno]
+            if code >= 0:
+                values[field] = column.keys[code]
+        for field, column in self._numeric.items():
+            value = column.view[docno]
+            if not np.isnan(value):
+                values[field] = int(value) if value.is_integer() else float(value)
+        return values
+
+    def mask(self, filters: dict[str, Any], rows: np.ndarray | None = None) -> np.ndarray:
+        """Rows (all documents by default) matching every clause of ``filters``."""
+        size = self._size if rows is None else len(rows)
+        result = np.ones(size, dtype=bool)
+        for field, condition in filters.items():
+            result &= self._match(field, condition, rows, size)
+        return result
+
+    def match_fraction(self, preferences: dict[str, Any], rows: np.ndarray) -> np.ndarray:
+        """Share of preference clauses each row satisfies, in ``[0, 1]``."""
+        if not preferences:
+            return np.zeros(len(rows), dtype=np.float32)
+        matched = np.zeros(len(rows), dtype=np.float32)
+        for field, condition in preferences.items():
+            matched += self._match(field, condition, rows, len(rows))
+        return matched / len(preferences)
+
+    def remap(self, keep: np.ndarray) -> None:
+        for column in self._categorical.values():
+            column.codes = GrowableArray.from_array(column.codes.view[keep])
+        for field, column in self._numeric.items():
+            self._numeric[field] = GrowableArray.from_array(column.view[keep])
+        self._size = int(np.count_nonzero(keep))
+
+    def state(self) -> tuple[dict[str, Any], dict[str, np.ndarray]]:
+        schema = {
+            "size": self._size,
+            "categorical": {
+                field: list(column.keys) for field, column in self._categorical.items()
+            },
+            "numeric": list(self._numeric),
+        }
+        arrays = {f"cat.{field}": column.codes.view for field, column in self._categorical.items()}
+        arrays.update({f"num.{field}": column.view for field, column in self._numeric.items()})
+        return schema, arrays
+
+    def load_state(self, schema: dict[str, Any], arrays: dict[str, np.ndarray]) -> None:
+        self._size = schema["size"]
+        self._categorical = {
+            field: _Categorical(
+                {key: code for code, key in enumerate(keys)},
+                list(keys),
+                GrowableArray.from_array(arrays[f"cat.{field}"]),
+            )
+            for field, keys in schema["categorical"].items()
+        }
+        self._numeric = {
+            field: GrowableArray.from_array(arrays[f"num.{field}"]) for field in schema["numeric"]
+        }
+
+    def _match(self, field: str, condition: Any, rows: np.ndarray | None, size: int):
+        if field in self._categorical:
+            column = self._categorical[field]
+            values = column.codes.view if rows is None else column.codes.view[rows]
+            wanted = condition if isinstance(condition, list) else [condition]
+            targets = [column.vocab[key] for key in map(_key, wanted) if key in column.vocab]
+            return np.isin(values, targets)
+        if field in self._numeric:
+            column = self._numeric[field].view
+            values = column if rows is None else column[rows]
+            if isinstance(condition, dict):
+                result = np.ones(size, dtype=bool)
+                for op, bound in condition.items():
+                    if op not in _RANGE_OPS:
+                        raise ValueError(f"Unsupported range operator {op!r} for {field!r}")
+                    result &= _RANGE_OPS[op](values, _number(field, bound))
+                return result
+            wanted = condition if isinstance(condition, list) else [condition]
+            return np.isin(values, [_number(field, value) for value in wanted])
+        return np.zeros(size, dtype=bool)
+
+    def _category_column(self, field: str) -> None:
+        if field not in self._categorical:
+            codes = GrowableArray(np.int32)
+            codes.append(np.full(self._size, -1))
+            self._categorical[field] = _Categorical({}, [], codes)
+
+    def _numeric_column(self, field: str) -> None:
+        if field not in self._numeric:
+            column = GrowableArray(np.float64)
+            column.append(np.full(self._size, np.nan))
+            self._numeric[field] = column
+
+
+def _key(value: Any) -> str | bool:
+    return value if isinstance(value, bool) else str(value)
+
+
+def _number(field: str, value: Any) -> float:
+    """``value`` as a float for comparing with numeric ``field``; numeric strings are
+    accepted, anything else raises ``ValueError``."""
+    if not isinstance(value, bool):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            pass
+    raise ValueError(f"Expected a number for {field!r}, got {value!r}")
@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import numpy as np
+
+from .storage import GrowableArray
+
+PQ_CENTROIDS = 256
+
+
+def nearest_centroid(data: np.ndarray, centroids: np.ndarray, chunk: int = 4096) -> np.ndarray:
+    norms = np.einsum("ij,ij->i", centroids, centroids)
+    assignment = np.empty(len(data), dtype=np.int32)
+    for start in range(0, len(data), chunk):
+        block = data[start : start + chunk]
+        assignment[start : start + chunk] = np.argmin(norms - 2.0 * block @ centroids.T, axis=1)
+    return assignment
+
+
+def kmeans(data: np.ndarray, k: int, iterations: int = 20, seed: int = 0) -> np.ndarray:
+    """Lloyd's k-means; empty clusters are re-seeded from random points."""
+    rng = np.random.default_rng(seed)
+    data = np.ascontiguousarray(data, dtype=np.float32)
+    centroids = data[rng.choice(len(data), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = nearest_centroid(data, centroids)
+        order = np.argsort(assignment, kind="stable")
+        counts = np.bincount(assignment, minlength=k)
+        filled = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[filled]
+        sums = np.add.reduceat(data[order], starts, axis=0)
+        centroids[filled] = sums / counts[filled, None]
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            centroids[empty] = data[rng.choice(len(data), size=len(empty), replace=False)]
+    return centroids
+
+
+def quantize_int8(vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-vector int8 quantization; ``codes * scale`` approximates ``vectors``."""
+    scale = np.abs(vectors).max(axis=1) / 127.0
+    scale[scale == 0] = 1.0
+    codes = np.rint(vectors / scale[:, None]).astype(np.int8)
+    return codes, scale.astype(np.float32)
+
+
+class IVFPQIndex:
+    """Inverted-file index with product-quantized residuals (IVF-PQ) over unit vectors.
+
+    Until ``train_size`` vectors have been added the index keeps them as-is and searches
+    exhaustively, which is also the right choice for small catalogues. The add that crosses
+    the threshold trains the coarse quantizer and the PQ codebooks on everything seen so far
+    and encodes it; from then on each vector costs ``m`` bytes. PQ distances alone rank
+    neighbours coarsely, so with ``refine`` > 0 the index also keeps an int8 copy of every
+    vector (``dim`` bytes plus a scale) and re-scores the best ``k * refine`` PQ candidates
+    with it; ``refine=0`` trades that recall for memory.
+
+    Encoded entries are kept sorted by inverted list, so a probed list is one contiguous
+    slice; entries added since the last ``compact`` sit in an unsorted tail that every
+    search scans. Entries carry the caller's document numbers, and deletes are expressed
+    through the ``mask`` passed to ``search`` until ``remap`` drops them physically.
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        nlist: int = 1024,
+        m: int = 48,
+        nprobe: int = 16,
+        train_size: int | None = None,
+        refine: int = 16,
+        seed: int = 0,
+    ) -> None:
+        if dim % m:
+            raise ValueError(f"dim={dim} is not divisible by m={m}")
+        self.dim = dim
+        self.nlist = nlist
+        self.m = m
+        self.nprobe = nprobe
+        self.train_size = train_size or max(39 * nlist, 4 * PQ_CENTROIDS)
+        self.refine = refine
+        self._seed = seed
+        self._centroids: np.ndarray | None = None
+        self._codebooks: np.ndarray | None = None
+        self._docnos = GrowableArray(np.int64)
+        self._raw = GrowableArray(np.float32, (dim,))
+        self._lists = GrowableArray(np.int32)
+        self._codes = GrowableArray(np.uint8, (m,))
+        self._fine = GrowableArray(np.int8, (dim,))
+        self._fine_scale = GrowableArray(np.float32)
+        self._offsets = np.zeros(nlist + 1, dtype=np.int64)
+        self._sorted = 0
+        self._positions: np.ndarray | None = None
+
+    @property
+    def trained(self) -> bool:
+        return self._centroids is not None
+
+    def __len__(self) -> int:
+        return len(self._docnos)
+
+    def add(self, docnos: np.ndarray, vectors: np.ndarray) -> None:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        self._docnos.append(docnos)
+        self._positions = None
+        if not self.trained:
+            self._raw.append(vectors)
+            if len(self._raw) >= self.train_size:
+                self._train()
+            return
+        lists, codes = self._encode(vectors)
+        self._lists.append(lists)
+        self._codes.append(codes)
+        if self.refine:
+            fine, scale = quantize_int8(vectors)
+            self._fine.append(fine)
+            self._fine_scale.append(scale)
+        if len(self) - self._sorted > max(1024, self._sorted // 20):
+            self.compact()
+
+    def search(
+        self, query: np.ndarray, k: int, mask: np.ndarray | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Top-``k`` document numbers and cosine similarities for one unit-norm query."""
+        query = np.asarray(query, dtype=np.float32)
+        if not self.trained:
+            rows = np.arange(len(self))
+            if mask is not None:
+                rows = rows[mask[self._docnos.view]]
+            return self._docnos_for(*self._top_k(rows, self._raw.view[rows] @ query, k))
+
+        distances = np.einsum("ij,ij->i", self._centroids, self._centroids)
+        distances -= 2.0 * self._centroids @ query
+        nprobe = min(self.nprobe, self.nlist)
+        probe = np.argpartition(distances, nprobe - 1)[:nprobe]
+        slot_of = np.full(self.nlist, -1, dtype=np.int64)
+        slot_of[probe] = np.arange(nprobe)
+
+        rows = np.concatenate(
+            [np.arange(self._offsets[lst], self._offsets[lst + 1]) for lst in probe]
+            + [self._sorted + np.flatnonzero(slot_of[self._lists.view[self._sorted :]] >= 0)]
+        )
+        if mask is not None:
+            rows = rows[mask[self._docnos.view[rows]]]
+        # Asymmetric distance: one (m x 256) lookup table per probed list.
+        residuals = (query - self._centroids[probe]).reshape(nprobe, self.m, -1)
+        tables = (
+            np.einsum("pmd,pmd->pm", residuals, residuals)[:, :, None]
+            - 2.0 * np.einsum("pmd,mkd->pmk", residuals, self._codebooks)
+            + np.einsum("mkd,mkd->mk", self._codebooks, self._codebooks)[None]
+        )
+        slots = slot_of[self._lists.view[rows]]
+        flat = (slots[:, None] * self.m + np.arange(self.m)) * PQ_CENTROIDS
+        squared = tables.reshape(-1)[flat + self._codes.view[rows]].sum(axis=1)
+        if not self.refine:
+            return self._docnos_for(*self._top_k(rows, 1.0 - squared / 2.0, k))
+        rows, _ = self._top_k(rows, -squared, k * self.refine)
+        return self._docnos_for(*self._top_k(rows, self._fine_scores(rows, query), k))
+
+    def score(self, query: np.ndarray, docnos: np.ndarray) -> np.ndarray:
+        """Approximate cosine similarity of ``query`` to specific documents (0 if absent)."""
+        if self._positions is None:
+            positions = np.full(int(self._docnos.view.max(initial=-1)) + 1, -1, dtype=np.int64)
+            positions[self._docnos.view] = np.arange(len(self))
+            self._positions = positions
+        docnos = np.asarray(docnos, dtype=np.int64)
+        rows = np.full(len(docnos), -1, dtype=np.int64)
+        known = docnos < len(self._positions)
+        rows[known] = self._positions[docnos[known]]
+        found = rows >= 0
+        query = np.asarray(query, dtype=np.float32)
+        scores = np.zeros(len(docnos), dtype=np.float32)
+        if self.trained and self.refine:
+            scores[found] = self._fine_scores(rows[found], query)
+        else:
+            scores[found] = self.reconstruct(rows[found]) @ query
+        return scores
+
+    def reconstruct(self, rows: np.ndarray) -> np.ndarray:
+        if not self.trained:
+            return self._raw.view[rows]
+        parts = self._codebooks[np.arange(self.m), self._codes.view[rows]]
+        return self._centroids[self._lists.view[rows]] + parts.reshape(len(rows), self.dim)
+
+    def compact(self) -> None:
+        """Merge the unsorted tail into the per-list sorted layout."""
+        self._positions = None
+        if not self.trained:
+            return
+        order = np.argsort(self._lists.view, kind="stable")
+        self._docnos = GrowableArray.from_array(self._docnos.view[order])
+        self._lists = GrowableArray.from_array(self._lists.view[order])
+        self._codes = GrowableArray.from_array(self._codes.view[order])
+        if self.refine:
+            self._fine = GrowableArray.from_array(self._fine.view[order])
+            self._fine_scale = GrowableArray.from_array(self._fine_scale.view[order])
+        self._offsets = np.zeros(self.nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self._lists.view, minlength=self.nlist), out=self._offsets[1:])
+        self._sorted = len(self)
+
+    def remap(self, mapping: np.ndarray) -> None:
+        """Renumber documents through ``mapping`` (old -> new, -1 drops the entry)."""
+        docnos = mapping[self._docnos.view]
+        keep = docnos >= 0
+        self._docnos = GrowableArray.from_array(docnos[keep])
+        if self.trained:
+            self._lists = GrowableArray.from_array(self._lists.view[keep])
+            self._codes = GrowableArray.from_array(self._codes.view[keep])
+            if self.refine:
+                self._fine = GrowableArray.from_array(self._fine.view[keep])
+                self._fine_scale = GrowableArray.from_array(self._fine_scale.view[keep])
+        else:
+            self._raw = GrowableArray.from_array(self._raw.view[keep])
+        self.compact()
+
+    def state(self) -> dict[str, np.ndarray]:
+        self.compact()
+        if not self.trained:
+            return {"docnos": self._docnos.view, "raw": self._raw.view}
+        state = {
+            "docnos": self._docnos.view,
+            "lists": self._lists.view,
+            "codes": self._codes.view,
+            "centroids": self._centroids,
+            "codebooks": self._codebooks,
+        }
+        if self.refine:
+            state.update(fine=self._fine.view, fine_scale=self._fine_scale.view)
+        return state
+
+    def load_state(self, state: dict[str, np.ndarray]) -> None:
+        self._docnos = GrowableArray.from_array(state["docnos"])
+        self._positions = None
+        if "raw" in state:
+            self._raw = GrowableArray.from_array(state["raw"])
+            return
+        self._centroids = np.asarray(state["centroids"])
+        self._codebooks = np.asarray(state["codebooks"])
+        self._lists = GrowableArray.from_array(state["lists"])
+        self._codes = GrowableArray.from_array(state["codes"])
+        if self.refine:
+            self._fine = GrowableArray.from_array(state["fine"])
+            self._fine_scale = GrowableArray.from_array(state["fine_scale"])
+        self._offsets = np.zeros(self.nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self._lists.view, minlength=self.nlist), out=self._offsets[1:])
+        self._sorted = len(self)
+
+    def _train(self) -> None:
+        vectors = self._raw.view
+        rng = np.random.default_rng(self._seed)
+        size = min(len(vectors), self.train_size)
+        sample = vectors[np.sort(rng.choice(len(vectors), size=size, replace=False))]
+        self._centroids = kmeans(sample, self.nlist, seed=self._seed)
+        residuals = sample - self._centroids[nearest_centroid(sample, self._centroids)]
+        sub = self.dim // self.m
+        self._codebooks = np.stack(
+            [
+                kmeans(residuals[:, j * sub : (j + 1) * sub], PQ_CENTROIDS, seed=self._seed + j)
+                for j in range(self.m)
+            ]
+        )
+        lists, codes = self._encode(vectors)
+        self._lists = GrowableArray.from_array(lists)
+        self._codes = GrowableArray.from_array(codes)
+        if self.refine:
+            fine, scale = quantize_int8(vectors)
+            self._fine = GrowableArray.from_array(fine)
+            self._fine_scale = GrowableArray.from_array(scale)
+        self._raw = GrowableArray(np.float32, (self.dim,), capacity=0)
+        self.compact()
+
+    def _encode(self, vectors: np.ndarray, chunk: int = 1024) -> tuple[np.ndarray, np.ndarray]:
+        lists = nearest_centroid(vectors, self._centroids)
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        norms = np.einsum("mkd,mkd->mk", self._codebooks, self._codebooks)
+        for start in range(0, len(vectors), chunk):
+            block = vectors[start : start + chunk] - self._centroids[lists[start : start + chunk]]
+            block = block.reshape(len(block), self.m, -1)
+            distances = norms[None] - 2.0 * np.einsum("nmd,mkd->nmk", block, self._codebooks)
+            codes[start : start + chunk] = np.argmin(distances, axis=2)
+        return lists, codes
+
+    def _fine_scores(self, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        return (self._fine.view[rows] @ query) * self._fine_scale.view[rows]
+
+    def _docnos_for(self, rows: np.ndarray, scores: np.ndarray):
+        return self._docnos.view[rows], scores
+
+    @staticmethod
+    def _top_k(rows: np.ndarray, scores: np.ndarray, k: int):
+        if len(rows) > k:
+            best = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[best], scores[best]
+        order = np.argsort(-scores, kind="stable")
+        return rows[order], scores[order]
@@ -1,30 +1,267 @@
 from __future__ import annotations
 
-from fastapi import FastAPI
+import asyncio
+import re
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+
+import httpx
+import numpy as np
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 
 from shared.app_factory import create_app
 from shared.config.settings import get_settings
 from shared.logging.logger import configure_logging
 
-from .engine import rewrite_query, sanitize_query
-from .models import RagAnswer, RagQueryRequest
+from .embeddings import EmbeddingClient
+from .engine import RagConfig, expand_mask, rewrite_query, sanitize_query
+from .models import (
+    DeleteDocumentsRequest,
+    IndexDocumentsRequest,
+    InvalidateCacheRequest,
+    RagAnswer,
+    RagQueryRequest,
+)
+from .originals import OriginalFetcher, PostgresOriginalStore
+from .retriever import HybridRetriever
+from .semantic_cache import SemanticCache
+from .sse import sse_event, sse_response
 
 settings = get_settings()
 settings.service_name = "rag-service"
 configure_logging(settings.log_level)
 
-app: FastAPI = create_app(settings)
+retriever = HybridRetriever(
+    settings.rag.vector_dim,
+    nlist=settings.rag.nlist,
+    m=settings.rag.pq_subquantizers,
+    nprobe=settings.rag.nprobe,
+    candidates=settings.rag.candidates,
+    fusion=settings.rag.fusion_mode,
+    rrf_k=settings.rag.rrf_k,
+    path=settings.rag.index_path,
+)
+embedder = EmbeddingClient(settings)
+original_store = PostgresOriginalStore(settings.postgres.dsn)
+originals = OriginalFetcher(
+    original_store, settings.service_name, cache_size=settings.rag.original_cache_size
+)
+answer_cache = SemanticCache(
+    settings.service_name,
+    dim=settings.rag.vector_dim,
+    threshold=RagConfig().min_similarity,
+    ttl_seconds=settings.rag.answer_cache_ttl_seconds,
+    max_entries=settings.rag.answer_cache_max_entries,
+)
+app: FastAPI = create_app(
+    settings,
+    readiness=lambda: {
+        "documents": len(retriever),
+        "index_version": retriever.version,
+        "answer_cache": answer_cache.stats(),
+    },
+)
 
 
-@app.post("/query", response_model=RagAnswer)
-async def rag_query(req: RagQueryRequest) -> RagAnswer:
+async def _embed(texts: list[str]) -> np.ndarray:
+    try:
+        return await embedder.embed(texts)
+    except httpx.HTTPError as exc:
+        raise HTTPException(status_code=503, detail=f"Embedding service error: {exc}") from exc
+
+
+@app.on_event("startup")
+async def startup() -> None:
+    # Snapshots are memory-mapped, so this is fast even for large indexes.
+    await asyncio.get_running_loop().run_in_executor(None, retriever.load_latest)
+    await original_store.connect()
+
+
+@app.on_event("shutdown")
+async def shutdown() -> None:
+    await embedder.close()
+    await original_store.close()
+
+
+@dataclass
+class _Retrieval:
+    rewritten: str
+    scope: str
+    cache_key: str
+    query_vector: np.ndarray
+    sources: list[dict]
+
+
+async def _answer_or_retrieve(req: RagQueryRequest) -> RagAnswer | _Retrieval:
+    """Return a finished answer (blocked or cached), or the retrieval to generate from."""
     safe_query, flagged = sanitize_query(req.query)
     if flagged:
         return RagAnswer(answer="Request blocked by safety filters.", sources=[])
     rewritten = rewrite_query(safe_query)
-    # Placeholder for retrieval and generation pipeline
-    return RagAnswer(
-        answer=f"RAG response for: {rewritten}",
-        sources=[],
-        tokens_used=len(rewritten.split()),
+    # Everything except the query text and caller identity can change the answer.
+    scope = req.model_dump_json(exclude={"query", "user_id"})
+    cache_key = answer_cache.key(rewritten, scope)
+    cached = answer_cache.get_exact(cache_key)
+    if cached is not None:
+        return cached
+    query_vector = (await _embed([rewritten]))[0]
+    cached = answer_cache.get_similar(query_vector, scope)
+    if cached is not None:
+        return cached
+    weights = req.weights
+    loop = asyncio.get_running_loop()
+    try:
+        sources = await loop.run_in_executor(
+            None,
+            lambda: retriever.search(
+                rewritten,
+                query_vector,
+                req.top_k or settings.rag.top_k,
+                filters=req.filters,
+                preferences=req.preferences,
+                weights=(weights.vector, weights.bm25, weights.metadata) if weights else None,
+                fusion=req.fusion,
+            ),
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    # One bulk read for every low-validation source; the rest keep their compressed text.
+    scores = [source["metadata"].get("validation_score", np.nan) for source in sources]
+    expanded = [
+        source for source, expand in zip(sources, expand_mask(rewritten, scores)) if expand
+    ]
+    fetched = await originals.get_many(_product_id(source) for source in expanded)
+    for source in expanded:
+        original = fetched.get(_product_id(source))
+        if original is not None:
+            source["original"] = original
+    return _Retrieval(rewritten, scope, cache_key, query_vector, sources)
+
+
+async def _generate(retrieval: _Retrieval) -> AsyncIterator[str]:
+    # Placeholder for the generation step; yields pieces that concatenate to the answer.
+    for token in re.findall(r"\S+\s*", f"RAG response for: {retrieval.rewritten}"):
+        yield token
+
+
+def _finish(req: RagQueryRequest, retrieval: _Retrieval, text: str) -> RagAnswer:
+    answer = RagAnswer(
+        answer=text,
+        sources=retrieval.sources if req.include_sources else [],
+        tokens_used=len(retrieval.rewritten.split()),
+    )
+    answer_cache.put(
+        retrieval.cache_key,
+        retrieval.scope,
+        retrieval.query_vector,
+        answer,
+        _product_ids(retrieval.sources),
+    )
+    return answer
+
+
+@app.post("/query", response_model=RagAnswer)
+async def rag_query(req: RagQueryRequest) -> RagAnswer:
+    result = await _answer_or_retrieve(req)
+    if isinstance(result, RagAnswer):
+        return result
+    return _finish(req, result, "".join([token async for token in _generate(result)]))
+
+
+@app.post("/query/stream")
+async def rag_query_stream(req: RagQueryRequest) -> StreamingResponse:
+    """Server-Sent Events: ``sources`` once retrieval is done, ``token`` frames as the answer
+    is produced, then ``done`` with ``tokens_used``.
+
+    Sanitizing, embedding and retrieval run before the response starts, so their failures
+    are still ordinary HTTP errors.
+    """
+    result = await _answer_or_retrieve(req)
+    return sse_response(_stream_answer(req, result))
+
+
+async def _stream_answer(
+    req: RagQueryRequest, result: RagAnswer | _Retrieval
+) -> AsyncIterator[bytes]:
+    if isinstance(result, RagAnswer):
+        yield sse_event("sources", result.sources)
+        yield sse_event("token", {"text": result.answer})
+        yield sse_event("done", {"tokens_used": result.tokens_used})
+        return
+    yield sse_event("sources", result.sources if req.include_sources else [])
+    pieces = []
+    async for token in _generate(result):
+        pieces.append(token)
+        yield sse_event("token", {"text": token})
+    answer = _finish(req, result, "".join(pieces))
+    yield sse_event("done", {"tokens_used": answer.tokens_used})
+
+
+def _product_id(source: dict) -> str:
+    return str(source["metadata"].get("product_id", source["doc_id"]))
+
+
+def _product_ids(sources: list[dict]) -> list[str]:
+    """Keys an answer is invalidated by: each source's doc_id and its product_id, if any."""
+    ids = []
+    for source in sources:
+        ids.append(source["doc_id"])
+        ids.append(_product_id(source))
+    return ids
+
+
+@app.post("/documents")
+async def index_documents(payload: IndexDocumentsRequest) -> dict:
+    documents = payload.documents
+    missing = [i for i, doc in enumerate(documents) if doc.embedding is None]
+    embeddings = np.zeros((len(documents), settings.rag.vector_dim), dtype=np.float32)
+    if missing:
+        embeddings[missing] = await _embed([documents[i].text for i in missing])
+    for i, doc in enumerate(documents):
+        if doc.embedding is not None:
+            if len(doc.embedding) != settings.rag.vector_dim:
+                raise HTTPException(
+                    status_code=422,
+                    detail=f"{doc.doc_id}: expected {settings.rag.vector_dim} dimensions",
+                )
+            embeddings[i] = doc.embedding
+    loop = asyncio.get_running_loop()
+    try:
+        total = await loop.run_in_executor(
+            None,
+            retriever.add,
+            [doc.doc_id for doc in documents],
+            [doc.text for doc in documents],
+            embeddings,
+            [doc.metadata for doc in documents],
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    answer_cache.invalidate(
+        _product_ids([{"doc_id": doc.doc_id, "metadata": doc.metadata} for doc in documents])
     )
+    return {"status": "indexed", "indexed": len(documents), "documents": total}
+
+
+@app.post("/documents/delete")
+async def delete_documents(payload: DeleteDocumentsRequest) -> dict:
+    loop = asyncio.get_running_loop()
+    deleted = await loop.run_in_executor(None, retriever.delete, payload.doc_ids)
+    answer_cache.invalidate(payload.doc_ids)
+    return {"status": "deleted", "deleted": deleted, "documents": len(retriever)}
+
+
+@app.post("/cache/invalidate")
+async def invalidate_cache(payload: InvalidateCacheRequest) -> dict:
+    return {"status": "invalidated", "entries": answer_cache.invalidate(payload.product_ids)}
+
+
+@app.post("/index/snapshot")
+async def snapshot_index() -> dict:
+    loop = asyncio.get_running_loop()
+    try:
+        version = await loop.run_in_executor(None, retriever.snapshot)
+    except RuntimeError as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+    return {"status": "saved", "version": version, "documents": len(retriever)}
@@ -1,15 +1,47 @@
 from __future__ import annotations
 
+from typing import Any, Literal
+
 from pydantic import BaseModel, Field
 
 
+class FusionWeights(BaseModel):
+    vector: float = Field(default=0.5, ge=0)
+    bm25: float = Field(default=0.3, ge=0)
+    metadata: float = Field(default=0.2, ge=0)
+
+
 class RagQueryRequest(BaseModel):
     query: str
     user_id: str | None = None
     include_sources: bool = Field(default=True)
+    top_k: int | None = Field(default=None, ge=1, le=100)
+    filters: dict[str, Any] = Field(default_factory=dict)
+    preferences: dict[str, Any] = Field(default_factory=dict)
+    fusion: Literal["weighted", "rrf"] | None = None
+    weights: FusionWeights | None = None
 
 
 class RagAnswer(BaseModel):
     answer: str
     sources: list[dict] = Field(default_factory=list)
     tokens_used: int = 0
+
+
+class IndexDocument(BaseModel):
+    doc_id: str
+    text: str
+    metadata: dict[str, Any] = Field(default_factory=dict)
+    embedding: list[float] | None = None
+
+
+class IndexDocumentsRequest(BaseModel):
+    documents: list[IndexDocument]
+
+
+class DeleteDocumentsRequest(BaseModel):
+    doc_ids: list[str]
+
+
+class InvalidateCacheRequest(BaseModel):
+    product_ids: list[str]
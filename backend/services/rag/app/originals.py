@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import asyncio
+import uuid
+from collections import OrderedDict
+from collections.abc import Iterable
+from typing import Any, Protocol
+
+from shared.metrics.metrics import CACHE_HITS, CACHE_MISSES
+
+
+class OriginalStore(Protocol):
+    async def fetch_many(self, ids: list[str]) -> dict[str, str]: ...
+
+
+class PostgresOriginalStore:
+    """Reads ``products.description_original`` for many products in one query."""
+
+    def __init__(self, dsn: str, min_size: int = 0, max_size: int = 5) -> None:
+        # asyncpg takes a plain libpq URL, not the SQLAlchemy dialect form.
+        self._dsn = dsn.replace("postgresql+asyncpg://", "postgresql://", 1)
+        self._min_size = min_size
+        self._max_size = max_size
+        self._pool: Any = None
+
+    async def connect(self) -> None:
+        # With min_size=0 no connection is opened here, so the service starts without
+        # Postgres and expansions fall back to compressed text until it is reachable.
+        import asyncpg
+
+        self._pool = await asyncpg.create_pool(
+            self._dsn, min_size=self._min_size, max_size=self._max_size
+        )
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+
+    async def fetch_many(self, ids: list[str]) -> dict[str, str]:
+        if self._pool is None:
+            raise RuntimeError("Postgres pool not connected")
+        # Non-UUID IDs cannot be products; map canonical UUID text back to the caller's form.
+        requested = {str(key): value for value in ids if (key := _as_uuid(value)) is not None}
+        if not requested:
+            return {}
+        rows = await self._pool.fetch(
+            "SELECT id::text AS id, description_original FROM products WHERE id = ANY($1::uuid[])",
+            list(requested),
+        )
+        return {
+            requested[row["id"]]: bytes(row["description_original"]).decode(
+                "utf-8", errors="replace"
+            )
+            for row in rows
+        }
+
+
+def _as_uuid(value: str) -> uuid.UUID | None:
+    try:
+        return uuid.UUID(value)
+    except ValueError:
+        return None
+
+
+class OriginalFetcher:
+    """Bulk, deduplicated access to uncompressed originals with a small LRU in front.
+
+    ``prefetch`` starts one bulk read for every ID that is neither cached nor already being
+    fetched and returns immediately, so the read overlaps whatever the caller does next;
+    ``get_many`` then waits only for the IDs it needs. IDs the store does not know, or that
+    fail to load because the store errored, are simply absent from the result.
+    """
+
+    def __init__(self, store: OriginalStore, service: str, cache_size: int = 1024) -> None:
+        self._store = store
+        self._service = service
+        self._cache_size = cache_size
+        self._cache: OrderedDict[str, str] = OrderedDict()
+        self._inflight: dict[str, asyncio.Task[dict[str, str]]] = {}
+
+    def prefetch(self, ids: Iterable[str]) -> None:
+        missing = [key for key in dict.fromkeys(ids) if key not in self._cache]
+        missing = [key for key in missing if key not in self._inflight]
+        if not missing:
+            return
+        task = asyncio.create_task(self._load(missing))
+        for key in missing:
+            self._inflight[key] = task
+
+    async def get_many(self, ids: Iterable[str]) -> dict[str, str]:
+        ids = list(dict.fromkeys(ids))
+        wanted = set(ids)
+        self.prefetch(ids)
+        found: dict[str, str] = {}
+        pending: set[asyncio.Task[dict[str, str]]] = set()
+        for key in ids:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                found[key] = self._cache[key]
+            else:
+                pending.add(self._inflight[key])
+        CACHE_HITS.labels(self._service, "rag_original").inc(len(found))
+        CACHE_MISSES.labels(self._service, "rag_original").inc(len(ids) - len(found))
+        for loaded in await asyncio.gather(*pending):
+            found.update({key: text for key, text in loaded.items() if key in wanted})
+        return found
+
+    async def _load(self, ids: list[str]) -> dict[str, str]:
+        try:
+            loaded = await self._store.fetch_many(ids)
+        except Exception:
+            # Callers fall back to the compressed text for anything not returned.
+            loaded = {}
+        finally:
+            for key in ids:
+                self._inflight.pop(key, None)
+        for key, text in loaded.items():
+            self._cache[key] = text
+            self._cache.move_to_end(key)
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return loaded
@@ -0,0 +1,299 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from .bm25 import BM25Index
+from .engine import FusionMode, HybridScorer
+from .filters import MetadataStore
+from .index import IVFPQIndex
+from .storage import GrowableArray, StringColumn
+
+_SNAPSHOT_DIR = re.compile(r"^index-v(\d+)$")
+
+
+class HybridRetriever:
+    """Vector (IVF-PQ), BM25 and metadata retrieval over one document collection.
+
+    Documents get dense internal numbers shared by the three indexes; re-adding a
+    ``doc_id`` replaces it and deletes are tombstones in ``alive`` until ``compact``
+    renumbers everything. ``snapshot`` writes ``index-v{N}/`` as plain ``.npy`` files that
+    ``load_latest`` memory-maps, so a restart does not rebuild or re-read the index.
+
+    Searches share a read lock and run concurrently, each thread with its own scorer;
+    ingest, deletes, compaction and snapshots take the write lock.
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        nlist: int = 1024,
+        m: int = 48,
+        nprobe: int = 16,
+        train_size: int | None = None,
+        candidates: int = 100,
+        fusion: FusionMode = "weighted",
+        rrf_k: float = 60.0,
+        path: str | None = None,
+    ) -> None:
+        self._params = {"dim": dim, "nlist": nlist, "m": m, "train_size": train_size}
+        self._nprobe = nprobe
+        self._candidates = candidates
+        self._dir = Path(path) if path else None
+        self._lock = _ReadWriteLock()
+        self._fusion = fusion
+        self._rrf_k = rrf_k
+        self._local = threading.local()
+        self._reset()
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    @property
+    def version(self) -> int | None:
+        return self._version
+
+    def add(
+        self,
+        doc_ids: list[str],
+        texts: list[str],
+        embeddings: np.ndarray,
+        metadata: list[dict[str, Any]],
+    ) -> int:
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if not len(doc_ids) == len(texts) == len(embeddings) == len(metadata):
+            raise ValueError("doc_ids, texts, embeddings and metadata differ in length")
+        if embeddings.ndim != 2 or embeddings.shape[1] != self._params["dim"]:
+            raise ValueError(f"Expected embeddings of dim {self._params['dim']}")
+        with self._lock.write():
+            self._metadata.check(metadata)
+            self._delete_locked(doc_ids)
+            start = len(self._alive)
+            for offset, (doc_id, text, meta) in enumerate(zip(doc_ids, texts, metadata)):
+                self._metadata.append(meta)
+                self._bm25.add(start + offset, text)
+                self._doc_ids.append(doc_id)
+                self._texts.append(text)
+                self._row_of[doc_id] = start + offset
+            self._alive.append(np.ones(len(doc_ids), dtype=bool))
+            self._vectors.add(np.arange(start, start + len(doc_ids)), embeddings)
+            return len(self._row_of)
+
+    def delete(self, doc_ids: list[str]) -> int:
+        with self._lock.write():
+            return self._delete_locked(doc_ids)
+
+    def search(
+        self,
+        query: str,
+        query_vector: np.ndarray,
+        k: int,
+        filters: dict[str, Any] | None = None,
+        preferences: dict[str, Any] | None = None,
+        weights: tuple[float, float, float] | None = None,
+        fusion: FusionMode | None = None,
+    ) -> list[dict[str, Any]]:
+        with self._lock.read():
+            mask = self._alive.view
+            if filters:
+                mask = mask & self._metadata.mask(filters)
+            vector_docs, _ = self._vectors.search(query_vector, self._candidates, mask)
+            bm25_docs, bm25_raw = self._bm25.search(query, self._candidates, mask)
+            docnos = np.union1d(vector_docs, bm25_docs)
+            if not len(docnos):
+                return []
+            vector = self._vectors.score(query_vector, docnos)
+            bm25 = np.zeros(len(docnos), dtype=np.float32)
+            bm25[np.searchsorted(docnos, bm25_docs)] = bm25_raw
+            meta = self._metadata.match_fraction(preferences or {}, docnos)
+            best, scores = self._scorer().top_k(vector, bm25, meta, k, weights, fusion)
+            return [
+                {
+                    "doc_id": self._doc_ids.get(int(docnos[i])),
+                    "text": self._texts.get(int(docnos[i])),
+                    "metadata": self._metadata.row(int(docnos[i])),
+                    "score": float(score),
+                    "vector_score": float(vector[i]),
+                    "bm25_score": float(bm25[i]),
+                    "metadata_match": float(meta[i]),
+                }
+                for i, score in zip(best, scores)
+            ]
+
+    def compact(self) -> None:
+        with self._lock.write():
+            self._compact_locked()
+
+    def snapshot(self) -> int:
+        """Write a new ``index-v{N}`` directory and return its version."""
+        if self._dir is None:
+            raise RuntimeError("No index path configured")
+        with self._lock.write():
+            if np.count_nonzero(~self._alive.view) > 0.2 * len(self._alive):
+                self._compact_locked()
+            vocab, bm25 = self._bm25.state()
+            schema, metadata = self._metadata.state()
+            arrays = {f"vectors.{name}": value for name, value in self._vectors.state().items()}
+            arrays.update({f"bm25.{name}": value for name, value in bm25.items()})
+            arrays.update({f"meta.{name}": value for name, value in metadata.items()})
+            arrays["alive"] = self._alive.view
+            arrays["doc_ids.blob"], arrays["doc_ids.offsets"] = self._doc_ids.state()
+            arrays["texts.blob"], arrays["texts.offsets"] = self._texts.state()
+            manifest = {"params": self._params, "vocab": vocab, "metadata": schema}
+            version = max(self._latest_version_on_disk(), self._version or 0) + 1
+            self._persist(version, manifest, arrays)
+            self._version = version
+        self._prune(keep=version - 1)
+        return version
+
+    def load_latest(self) -> int | None:
+        version = self._latest_version_on_disk()
+        if not version:
+            return None
+        directory = self._dir / f"index-v{version}"
+        manifest = json.loads((directory / "manifest.json").read_text())
+        arrays = {
+            entry.name[: -len(".npy")]: np.load(entry, mmap_mode="r")
+            for entry in directory.iterdir()
+            if entry.suffix == ".npy"
+        }
+        with self._lock.write():
+            self._params = manifest["params"]
+            self._reset()
+            self._vectors.load_state(_section(arrays, "vectors"))
+            self._bm25.load_state(manifest["vocab"], _section(arrays, "bm25"))
+            self._metadata.load_state(manifest["metadata"], _section(arrays, "meta"))
+            self._alive = GrowableArray.from_array(np.array(arrays["alive"]))
+            self._doc_ids = StringColumn.from_state(
+                arrays["doc_ids.blob"], arrays["doc_ids.offsets"]
+            )
+            self._texts = StringColumn.from_state(arrays["texts.blob"], arrays["texts.offsets"])
+            alive = self._alive.view
+            self._row_of = {
+                doc_id: docno for docno, doc_id in enumerate(self._doc_ids) if alive[docno]
+            }
+            self._version = version
+        return version
+
+    def _scorer(self) -> HybridScorer:
+        # HybridScorer reuses its buffers between calls, so concurrent searches need one each.
+        scorer = getattr(self._local, "scorer", None)
+        if scorer is None:
+            scorer = HybridScorer(
+                mode=self._fusion, rrf_k=self._rrf_k, capacity=2 * self._candidates
+            )
+            self._local.scorer = scorer
+        return scorer
+
+    def _reset(self) -> None:
+        self._vectors = IVFPQIndex(nprobe=self._nprobe, **self._params)
+        self._bm25 = BM25Index()
+        self._metadata = MetadataStore()
+        self._alive = GrowableArray(bool)
+        self._doc_ids = StringColumn()
+        self._texts = StringColumn()
+        self._row_of: dict[str, int] = {}
+        self._version: int | None = None
+
+    def _delete_locked(self, doc_ids: list[str]) -> int:
+        docnos = [self._row_of.pop(doc_id) for doc_id in doc_ids if doc_id in self._row_of]
+        self._alive.view[docnos] = False
+        return len(docnos)
+
+    def _compact_locked(self) -> None:
+        keep = self._alive.view.copy()
+        mapping = np.full(len(keep), -1, dtype=np.int64)
+        mapping[keep] = np.arange(np.count_nonzero(keep))
+        self._vectors.remap(mapping)
+        self._bm25.remap(mapping)
+        self._metadata.remap(keep)
+        survivors = np.flatnonzero(keep)
+        self._doc_ids = self._doc_ids.take(survivors)
+        self._texts = self._texts.take(survivors)
+        self._alive = GrowableArray.from_array(np.ones(len(survivors), dtype=bool))
+        self._row_of = {doc_id: docno for docno, doc_id in enumerate(self._doc_ids)}
+
+    def _latest_version_on_disk(self) -> int:
+        if self._dir is None or not self._dir.exists():
+            return 0
+        versions = [
+            int(match.group(1))
+            for match in (_SNAPSHOT_DIR.match(entry.name) for entry in self._dir.iterdir())
+            if match
+        ]
+        return max(versions, default=0)
+
+    def _persist(self, version: int, manifest: dict, arrays: dict[str, np.ndarray]) -> None:
+        self._dir.mkdir(parents=True, exist_ok=True)
+        tmp_dir = Path(tempfile.mkdtemp(dir=self._dir, suffix=".tmp"))
+        try:
+            for name, array in arrays.items():
+                np.save(tmp_dir / f"{name}.npy", np.ascontiguousarray(array))
+            (tmp_dir / "manifest.json").write_text(json.dumps(manifest))
+            os.replace(tmp_dir, self._dir / f"index-v{version}")
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+    def _prune(self, keep: int) -> None:
+        """Remove snapshots older than version ``keep`` (already-mapped files stay valid)."""
+        for entry in self._dir.iterdir():
+            match = _SNAPSHOT_DIR.match(entry.name)
+            if match and int(match.group(1)) < keep:
+                shutil.rmtree(entry, ignore_errors=True)
+
+
+class _ReadWriteLock:
+    """Many readers or one writer. Waiting writers block new readers so a steady stream of
+    searches cannot starve ingest."""
+
+    def __init__(self) -> None:
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        with self._condition:
+            self._condition.wait_for(lambda: not self._writing and not self._writers_waiting)
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        with self._condition:
+            self._writers_waiting += 1
+            self._condition.wait_for(lambda: not self._writing and not self._readers)
+            self._writers_waiting -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
+
+def _section(arrays: dict[str, np.ndarray], prefix: str) -> dict[str, np.ndarray]:
+    return {
+        name[len(prefix) + 1 :]: value
+        for name, value in arrays.items()
+        if name.startswith(prefix + ".")
+    }
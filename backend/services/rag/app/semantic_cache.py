@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import hashlib
+import time
+from collections.abc import Callable, Iterable
+from typing import Any
+
+import numpy as np
+
+from shared.metrics.metrics import CACHE_HITS, CACHE_MISSES
+
+
+class SemanticCache:
+    """Answer cache keyed on the rewritten query.
+
+    ``get_exact`` is a hash lookup on the normalized query text, done before the query is
+    embedded. ``get_similar`` compares the query embedding with every live entry in one
+    matrix-vector product and returns the best match at or above ``threshold``. Both
+    lookups only match entries stored under the same ``scope`` (the request options that
+    change the answer, such as filters or top_k).
+
+    Entries sit in fixed slots of a preallocated embedding matrix and expire after
+    ``ttl_seconds``. When the cache is full the oldest slot is overwritten. Each entry
+    records the product IDs of its sources so ``invalidate`` can drop the answers a
+    catalogue change affects. Single-threaded: call it from the event loop only.
+    """
+
+    def __init__(
+        self,
+        service: str,
+        dim: int,
+        threshold: float,
+        ttl_seconds: float,
+        max_entries: int = 10000,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._service = service
+        self._threshold = threshold
+        self._ttl = ttl_seconds
+        self._clock = clock
+        self._vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        self._expires = np.zeros(max_entries, dtype=np.float64)
+        self._stored_at = np.zeros(max_entries, dtype=np.float64)
+        self._scopes = np.zeros(max_entries, dtype=np.int64)
+        self._values: list[Any] = [None] * max_entries
+        self._keys: list[str | None] = [None] * max_entries
+        self._products: list[tuple[str, ...]] = [()] * max_entries
+        self._slot_of: dict[str, int] = {}
+        self._by_product: dict[str, set[int]] = {}
+        self._hits = {"exact": 0, "semantic": 0}
+        self._misses = 0
+
+    @staticmethod
+    def key(query: str, scope: str) -> str:
+        normalized = " ".join(query.lower().split())
+        return hashlib.sha256(f"{scope}\x00{normalized}".encode()).hexdigest()
+
+    def get_exact(self, key: str) -> Any | None:
+        slot = self._slot_of.get(key)
+        if slot is not None and self._expires[slot] <= self._clock():
+            self._evict(slot)
+            slot = None
+        if slot is None:
+            CACHE_MISSES.labels(self._service, "rag_answer_exact").inc()
+            return None
+        CACHE_HITS.labels(self._service, "rag_answer_exact").inc()
+        self._hits["exact"] += 1
+        return self._values[slot]
+
+    def get_similar(self, vector: np.ndarray, scope: str) -> Any | None:
+        live = (self._expires > self._clock()) & (self._scopes == self._scope_id(scope))
+        slot = None
+        if live.any():
+            similarity = self._vectors @ self._normalize(vector)
+            similarity[~live] = -np.inf
+            best = int(np.argmax(similarity))
+            if similarity[best] >= self._threshold:
+                slot = best
+        if slot is None:
+            CACHE_MISSES.labels(self._service, "rag_answer_semantic").inc()
+            self._misses += 1
+            return None
+        CACHE_HITS.labels(self._service, "rag_answer_semantic").inc()
+        self._hits["semantic"] += 1
+        return self._values[slot]
+
+    def put(
+        self,
+        key: str,
+        scope: str,
+        vector: np.ndarray,
+        value: Any,
+        product_ids: Iterable[str] = (),
+    ) -> None:
+        now = self._clock()
+        slot = self._slot_of.get(key)
+        if slot is None:
+            free = np.flatnonzero(self._expires <= now)
+            slot = int(free[0]) if len(free) else int(np.argmin(self._stored_at))
+        self._evict(slot)
+        products = tuple(dict.fromkeys(product_ids))
+        self._vectors[slot] = self._normalize(vector)
+        self._expires[slot] = now + self._ttl
+        self._stored_at[slot] = now
+        self._scopes[slot] = self._scope_id(scope)
+        self._values[slot] = value
+        self._keys[slot] = key
+        self._products[slot] = products
+        self._slot_of[key] = slot
+        for product_id in products:
+            self._by_product.setdefault(product_id, set()).add(slot)
+
+    def invalidate(self, product_ids: Iterable[str]) -> int:
+        slots = set()
+        for product_id in product_ids:
+            slots |= self._by_product.get(product_id, set())
+        for slot in slots:
+            self._evict(slot)
+        return len(slots)
+
+    def clear(self) -> None:
+        for slot in list(self._slot_of.values()):
+            self._evict(slot)
+
+    def stats(self) -> dict[str, Any]:
+        hits = self._hits["exact"] + self._hits["semantic"]
+        lookups = hits + self._misses
+        return {
+            "entries": len(self._slot_of),
+            "exact_hits": self._hits["exact"],
+            "semantic_hits": self._hits["semantic"],
+            "misses": self._misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+    def _evict(self, slot: int) -> None:
+        key = self._keys[slot]
+        if key is not None:
+            del self._slot_of[key]
+        for product_id in self._products[slot]:
+            slots = self._by_product.get(product_id)
+            if slots is not None:
+                slots.discard(slot)
+                if not slots:
+                    del self._by_product[product_id]
+        self._expires[slot] = 0.0
+        self._values[slot] = None
+        self._keys[slot] = None
+        self._products[slot] = ()
+
+    @staticmethod
+    def _normalize(vector: np.ndarray) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    @staticmethod
+    def _scope_id(scope: str) -> int:
+        digest = hashlib.sha256(scope.encode("utf-8")).digest()
+        return int.from_bytes(digest[:8], "little", signed=True)
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import numpy as np
+
+
+class GrowableArray:
+    """Append-only column backed by an over-allocated NumPy array.
+
+    ``view`` is the filled prefix. An array adopted with ``from_array`` (for example a
+    read-only memmap from a snapshot) is used as-is until the first append, which copies
+    it into a larger in-memory buffer.
+    """
+
+    def __init__(self, dtype, row_shape: tuple[int, ...] = (), capacity: int = 1024) -> None:
+        self._data = np.empty((capacity, *row_shape), dtype=dtype)
+        self._size = 0
+
+    @classmethod
+    def from_array(cls, array: np.ndarray) -> GrowableArray:
+        column = cls.__new__(cls)
+        column._data = array
+        column._size = len(array)
+        return column
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def view(self) -> np.ndarray:
+        return self._data[: self._size]
+
+    def append(self, values) -> None:
+        values = np.asarray(values, dtype=self._data.dtype)
+        if values.ndim == self._data.ndim - 1:
+            values = values[None]
+        needed = self._size + len(values)
+        if needed > len(self._data):
+            grown = np.empty(
+                (max(needed, 2 * len(self._data), 1024), *self._data.shape[1:]),
+                dtype=self._data.dtype,
+            )
+            grown[: self._size] = self._data[: self._size]
+            self._data = grown
+        self._data[self._size : needed] = values
+        self._size = needed
+
+
+class StringColumn:
+    """Strings stored as one UTF-8 blob plus offsets, so snapshots can be memory-mapped.
+
+    Strings appended since the last ``state`` call live in a Python list; ``get`` decodes a
+    single entry on demand, so a mapped column costs nothing until it is read.
+    """
+
+    def __init__(self) -> None:
+        self._blob = np.zeros(0, dtype=np.uint8)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._tail: list[str] = []
+
+    @classmethod
+    def from_state(cls, blob: np.ndarray, offsets: np.ndarray) -> StringColumn:
+        column = cls()
+        column._blob = blob
+        column._offsets = offsets
+        return column
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1 + len(self._tail)
+
+    def get(self, index: int) -> str:
+        base = len(self._offsets) - 1
+        if index >= base:
+            return self._tail[index - base]
+        start, end = self._offsets[index], self._offsets[index + 1]
+        return self._blob[start:end].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        data = self._blob.tobytes()
+        offsets = self._offsets.tolist()
+        for start, end in zip(offsets, offsets[1:]):
+            yield data[start:end].decode("utf-8")
+        yield from self._tail
+
+    def append(self, value: str) -> None:
+        self._tail.append(value)
+
+    def take(self, indices: np.ndarray) -> StringColumn:
+        return StringColumn.from_state(*_pack(self.get(int(index)) for index in indices))
+
+    def state(self) -> tuple[np.ndarray, np.ndarray]:
+        if self._tail:
+            encoded = [value.encode("utf-8") for value in self._tail]
+            lengths = np.fromiter((len(value) for value in encoded), np.int64, len(encoded))
+            self._blob = np.concatenate(
+                [self._blob, np.frombuffer(b"".join(encoded), dtype=np.uint8)]
+            )
+            self._offsets = np.concatenate(
+                [self._offsets, self._offsets[-1] + np.cumsum(lengths)]
+            )
+            self._tail = []
+        return self._blob, self._offsets
+
+
+def _pack(values) -> tuple[np.ndarray, np.ndarray]:
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8).copy(), offsets
@@ -1,29 +1,149 @@
 from __future__ import annotations
 
-import random
-from dataclasses import dataclass
+from collections.abc import Iterable
 
+import numpy as np
 
-@dataclass
-class Arm:
-    successes: int = 1
-    failures: int = 1
+from .store import BanditStore, Counts
+
+GLOBAL_SEGMENT = ""
 
 
 class ThompsonBandit:
-    def __init__(self, arms: list[str]) -> None:
-        self._arms = {arm: Arm() for arm in arms}
+    """Beta-Bernoulli Thompson sampling over NumPy arrays of arm counts.
+
+    Counts are a ``(segments, arms, 2)`` table of successes and failures. Segment ``""`` pools
+    all feedback; feedback tagged with a segment (a product category, say) also counts towards
+    that segment's row. ``select`` draws one Beta sample per arm of the requested row in a
+    single vectorized call; a segment without feedback yet samples from the prior.
+
+    Each worker holds the shared counts from its last ``sync`` plus the local deltas recorded
+    since. ``sync`` merges those deltas into a ``BanditStore`` and reloads the totals, so all
+    workers and replicas converge on the same posterior. Arms the store knows but this bandit
+    was not configured with are ignored. Single-threaded: call it from the event loop only.
+    """
+
+    def __init__(
+        self,
+        arms: Iterable[str],
+        prior: tuple[float, float] = (1.0, 1.0),
+        seed: int | None = None,
+    ) -> None:
+        self._prior = np.asarray(prior, dtype=np.float64)
+        self._rng = np.random.default_rng(seed)
+        self._arms: list[str] = []
+        self._arm_index: dict[str, int] = {}
+        self._segments = [GLOBAL_SEGMENT]
+        self._segment_index = {GLOBAL_SEGMENT: 0}
+        self._shared = np.zeros((1, 0, 2), dtype=np.int64)
+        self._pending = np.zeros((1, 0, 2), dtype=np.int64)
+        self.add_arms(arms)
+
+    @property
+    def arms(self) -> list[str]:
+        return list(self._arms)
+
+    @property
+    def segments(self) -> list[str]:
+        return list(self._segments)
+
+    def add_arms(self, arms: Iterable[str]) -> None:
+        new = [arm for arm in dict.fromkeys(arms) if arm not in self._arm_index]
+        if not new:
+            return
+        for arm in new:
+            self._arm_index[arm] = len(self._arms)
+            self._arms.append(arm)
+        self._grow(arms=len(new))
+
+    def __contains__(self, arm: str) -> bool:
+        return arm in self._arm_index
+
+    def counts(self, segment: str | None = None) -> np.ndarray:
+        """Successes and failures per arm, ``(arms, 2)``, including unsynced local feedback."""
+        row = self._segment_index.get(segment or GLOBAL_SEGMENT)
+        if row is None:
+            return np.zeros((len(self._arms), 2), dtype=np.int64)
+        return self._shared[row] + self._pending[row]
 
-    def select(self) -> str:
-        samples = {
-            name: random.betavariate(arm.successes, arm.failures)
-            for name, arm in self._arms.items()
+    def sample(self, segment: str | None = None) -> np.ndarray:
+        counts = self.counts(segment)
+        return self._rng.beta(self._prior[0] + counts[:, 0], self._prior[1] + counts[:, 1])
+
+    def select(self, segment: str | None = None) -> str:
+        return self._arms[int(np.argmax(self.sample(segment)))]
+
+    def update(self, arm_name: str, reward: bool, segment: str | None = None) -> bool:
+        """Record one reward; returns False, changing nothing, if the arm is unknown."""
+        arm = self._arm_index.get(arm_name)
+        if arm is None:
+            return False
+        column = 0 if reward else 1
+        self._pending[0, arm, column] += 1
+        if segment:
+            row = self._segment_row(segment)
+            self._pending[row, arm, column] += 1
+        return True
+
+    def update_many(self, deltas: Counts) -> None:
+        """Record many rewards at once: ``(segment, arm) -> (successes, failures)``.
+
+        Like ``update``, deltas for a segment also count towards the pooled row. Unknown
+        arms are skipped.
+        """
+        rows, arms, values = self._locate(deltas)
+        np.add.at(self._pending, (rows, arms), values)
+        segmented = rows != 0
+        np.add.at(self._pending, (0, arms[segmented]), values[segmented])
+
+    async def sync(self, store: BanditStore) -> None:
+        """Merge local deltas into ``store`` and adopt the merged totals.
+
+        Feedback recorded while the merge is in flight stays local until the next sync. If
+        the merge fails the deltas are kept for the next attempt and the error propagates.
+        """
+        rows, arms = np.nonzero(self._pending.any(axis=2))
+        values = self._pending[rows, arms]
+        deltas: Counts = {
+            (self._segments[row], self._arms[arm]): (successes, failures)
+            for row, arm, (successes, failures) in zip(
+                rows.tolist(), arms.tolist(), values.tolist()
+            )
         }
-        return max(samples, key=samples.get)
-
-    def update(self, arm_name: str, reward: bool) -> None:
-        arm = self._arms[arm_name]
-        if reward:
-            arm.successes += 1
-        else:
-            arm.failures += 1
+        # Until the totals arrive, the drained deltas count as shared so sampling sees them.
+        self._shared[rows, arms] += values
+        self._pending[rows, arms] = 0
+        try:
+            totals = await store.merge(deltas)
+        except Exception:
+            rows, arms, values = self._locate(deltas)
+            np.subtract.at(self._shared, (rows, arms), values)
+            np.add.at(self._pending, (rows, arms), values)
+            raise
+        rows, arms, values = self._locate(totals)
+        self._shared[:] = 0
+        self._shared[rows, arms] = values
+
+    def _locate(self, counts: Counts) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        known = [
+            (self._segment_row(segment), self._arm_index[arm], value)
+            for (segment, arm), value in counts.items()
+            if arm in self._arm_index
+        ]
+        rows = np.fromiter((row for row, _, _ in known), dtype=np.intp, count=len(known))
+        arms = np.fromiter((arm for _, arm, _ in known), dtype=np.intp, count=len(known))
+        values = np.array([value for _, _, value in known], dtype=np.int64).reshape(-1, 2)
+        return rows, arms, values
+
+    def _segment_row(self, segment: str) -> int:
+        row = self._segment_index.get(segment)
+        if row is None:
+            row = self._segment_index[segment] = len(self._segments)
+            self._segments.append(segment)
+            self._grow(segments=1)
+        return row
+
+    def _grow(self, segments: int = 0, arms: int = 0) -> None:
+        padding = ((0, segments), (0, arms), (0, 0))
+        self._shared = np.pad(self._shared, padding)
+        self._pending = np.pad(self._pending, padding)
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import math
+import time
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from shared.metrics.metrics import FEEDBACK_DROPPED, FEEDBACK_EVENTS, FEEDBACK_LAG
+from shared.queue.queue import QueueClient
+
+from .engine import GLOBAL_SEGMENT, ThompsonBandit
+
+logger = logging.getLogger(__name__)
+
+_REWARDS = {"true": True, "1": True, "false": False, "0": False}
+
+
+class FeedbackAggregator:
+    """Buffers rewards as per-(segment, arm) delta counters and applies them in batches.
+
+    Ingesting an event is a dict update, so the HTTP endpoints and the queue consumer can
+    take feedback at high rates; ``flush`` hands everything buffered to the bandit in one
+    ``update_many``, either from the periodic loop started by ``start`` or directly.
+    Feedback for arms the bandit does not know, or queue messages without an arm and a
+    well-formed reward and timestamp, is dropped and counted.
+
+    Event timestamps are Unix times set by the producer (the receive time when absent); each
+    flush records how old the oldest event it applies is. Single-threaded: call it from the
+    event loop only.
+    """
+
+    def __init__(
+        self,
+        bandit: ThompsonBandit,
+        service: str,
+        flush_interval_seconds: float = 1.0,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._bandit = bandit
+        self._service = service
+        self._flush_interval = flush_interval_seconds
+        self._clock = clock
+        self._deltas: dict[tuple[str, str], list[int]] = {}
+        self._oldest: float | None = None
+        self._task: asyncio.Task | None = None
+
+    def add(
+        self,
+        arm: str,
+        reward: bool,
+        segment: str | None = None,
+        timestamp: float | None = None,
+        source: str = "http",
+    ) -> bool:
+        accepted = self._add(arm, reward, segment, timestamp)
+        if accepted:
+            FEEDBACK_EVENTS.labels(self._service, source).inc()
+        else:
+            FEEDBACK_DROPPED.labels(self._service, "unknown_arm").inc()
+        return accepted
+
+    def add_many(self, events: Iterable[Any], source: str = "http") -> int:
+        """Buffer events with ``arm``, ``reward``, ``segment`` and ``timestamp`` attributes."""
+        accepted = dropped = 0
+        for event in events:
+            if self._add(event.arm, event.reward, event.segment, event.timestamp):
+                accepted += 1
+            else:
+                dropped += 1
+        FEEDBACK_EVENTS.labels(self._service, source).inc(accepted)
+        FEEDBACK_DROPPED.labels(self._service, "unknown_arm").inc(dropped)
+        return accepted
+
+    def pending(self) -> int:
+        return sum(successes + failures for successes, failures in self._deltas.values())
+
+    def flush(self) -> int:
+        if not self._deltas:
+            return 0
+        deltas, self._deltas = self._deltas, {}
+        oldest, self._oldest = self._oldest, None
+        self._bandit.update_many({key: (counts[0], counts[1]) for key, counts in deltas.items()})
+        if oldest is not None:
+            FEEDBACK_LAG.labels(self._service).observe(max(0.0, self._clock() - oldest))
+        return sum(successes + failures for successes, failures in deltas.values())
+
+    async def consume(self, queue: QueueClient, topic: str) -> None:
+        """Buffer feedback messages from ``topic`` until the consumer ends or is cancelled."""
+        async for message in queue.consume(topic):
+            # One bad message must not end the consumer task.
+            try:
+                arm, reward, segment, timestamp = _parse_message(message.value)
+                self.add(arm, reward, segment, timestamp, source="queue")
+            except ValueError:
+                FEEDBACK_DROPPED.labels(self._service, "invalid").inc()
+            except Exception:
+                logger.exception("Failed to apply feedback message from %s", topic)
+                FEEDBACK_DROPPED.labels(self._service, "invalid").inc()
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+        self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            self.flush()
+
+    def _add(
+        self, arm: str, reward: bool, segment: str | None, timestamp: float | None
+    ) -> bool:
+        if arm not in self._bandit:
+            return False
+        key = (segment or GLOBAL_SEGMENT, arm)
+        counts = self._deltas.get(key)
+        if counts is None:
+            counts = self._deltas[key] = [0, 0]
+        counts[0 if reward else 1] += 1
+        produced = self._clock() if timestamp is None else timestamp
+        if self._oldest is None or produced < self._oldest:
+            self._oldest = produced
+        return True
+
+
+def _parse_message(value: Any) -> tuple[str, bool, str | None, float | None]:
+    """``(arm, reward, segment, timestamp)`` of a queue message, or ``ValueError``.
+
+    Rewards are booleans, 0/1 or their string forms; anything else is rejected rather than
+    read by truthiness, where the string ``"false"`` would count as a success.
+    """
+    if not isinstance(value, dict) or "arm" not in value or "reward" not in value:
+        raise ValueError("Feedback needs an arm and a reward")
+    reward = value["reward"]
+    if isinstance(reward, str):
+        reward = _REWARDS.get(reward.strip().lower(), reward)
+    elif not isinstance(reward, bool) and reward in (0, 1):
+        reward = bool(reward)
+    if not isinstance(reward, bool):
+        raise ValueError(f"Invalid reward {value['reward']!r}")
+    segment = value.get("segment")
+    if segment is not None and not isinstance(segment, str):
+        raise ValueError(f"Invalid segment {segment!r}")
+    timestamp = value.get("timestamp")
+    if timestamp is not None:
+        if isinstance(timestamp, bool) or not isinstance(timestamp, int | float | str):
+            raise ValueError(f"Invalid timestamp {timestamp!r}")
+        timestamp = float(timestamp)
+        if not math.isfinite(timestamp):
+            raise ValueError(f"Invalid timestamp {value['timestamp']!r}")
+    return str(value["arm"]), reward, segment, timestamp
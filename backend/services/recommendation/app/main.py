@@ -1,34 +1,101 @@
 from __future__ import annotations
 
+import asyncio
+import contextlib
+import logging
+
 from fastapi import FastAPI
-from pydantic import BaseModel
 
 from shared.app_factory import create_app
 from shared.config.settings import get_settings
 from shared.logging.logger import configure_logging
+from shared.metrics.metrics import BANDIT_SYNC_FAILURES
+from shared.queue.queue import QueueClient
 
 from .engine import ThompsonBandit
+from .feedback import FeedbackAggregator
+from .models import Feedback, FeedbackBatch
+from .store import BanditStore, InMemoryBanditStore, RedisBanditStore
+
+logger = logging.getLogger(__name__)
 
 settings = get_settings()
 settings.service_name = "recommendation-service"
 configure_logging(settings.log_level)
 
-app: FastAPI = create_app(settings)
-bandit = ThompsonBandit(["compression_v1", "compression_v2"])
+bandit = ThompsonBandit(settings.recommendation.arms)
+if settings.recommendation.bandit_store == "redis":
+    store: BanditStore = RedisBanditStore(settings.redis.url, settings.recommendation.bandit_key)
+else:
+    store = InMemoryBanditStore()
+aggregator = FeedbackAggregator(
+    bandit,
+    settings.service_name,
+    flush_interval_seconds=settings.recommendation.feedback_flush_interval_seconds,
+)
+queue = QueueClient(settings.kafka.brokers, settings.kafka.topic_prefix)
+app: FastAPI = create_app(
+    settings, readiness=lambda: {"arms": len(bandit.arms), "segments": len(bandit.segments)}
+)
+_background: list[asyncio.Task] = []
+
+
+async def _sync() -> None:
+    try:
+        await bandit.sync(store)
+    except Exception:
+        # Deltas stay local and are merged on the next interval.
+        BANDIT_SYNC_FAILURES.labels(settings.service_name).inc()
+
 
+async def _sync_loop() -> None:
+    while True:
+        await asyncio.sleep(settings.recommendation.sync_interval_seconds)
+        await _sync()
 
-class Feedback(BaseModel):
-    arm: str
-    reward: bool
+
+@app.on_event("startup")
+async def startup() -> None:
+    global store
+    if isinstance(store, RedisBanditStore):
+        try:
+            await store.connect()
+        except Exception:
+            # Counts stay per process until a restart finds Redis again.
+            logger.warning("Redis unreachable; bandit counts kept in memory", exc_info=True)
+            store = InMemoryBanditStore()
+    await _sync()
+    aggregator.start()
+    _background.append(asyncio.create_task(_sync_loop()))
+    _background.append(
+        asyncio.create_task(aggregator.consume(queue, settings.recommendation.feedback_topic))
+    )
+
+
+@app.on_event("shutdown")
+async def shutdown() -> None:
+    for task in _background:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+    await aggregator.close()
+    await _sync()
 
 
 @app.get("/recommend")
-async def recommend() -> dict:
-    selected = bandit.select()
+async def recommend(segment: str | None = None) -> dict:
+    selected = bandit.select(segment)
     return {"variant": selected}
 
 
 @app.post("/feedback")
 async def feedback(payload: Feedback) -> dict:
-    bandit.update(payload.arm, payload.reward)
-    return {"status": "ok"}
+    accepted = aggregator.add(payload.arm, payload.reward, payload.segment, payload.timestamp)
+    return {"status": "ok" if accepted else "unknown_arm"}
+
+
+@app.post("/feedback/batch")
+async def feedback_batch(payload: FeedbackBatch) -> dict:
+    """Buffer many events in one request; they reach the bandit on the next flush."""
+    accepted = aggregator.add_many(payload.events)
+    return {"status": "ok", "accepted": accepted, "dropped": len(payload.events) - accepted}
@@ -0,0 +1,14 @@
+from __future__ import annotations
+
+from pydantic import BaseModel, Field
+
+
+class Feedback(BaseModel):
+    arm: str
+    reward: bool
+    segment: str | None = None
+    timestamp: float | None = Field(default=None, description="Unix time of the impression")
+
+
+class FeedbackBatch(BaseModel):
+    events: list[Feedback] = Field(max_length=10000)
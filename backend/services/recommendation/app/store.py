@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+from typing import Any, Protocol
+
+# (segment, arm) -> (successes, failures)
+Counts = dict[tuple[str, str], tuple[int, int]]
+
+_SEPARATOR = "\x1f"
+
+
+class BanditStore(Protocol):
+    async def merge(self, deltas: Counts) -> Counts:
+        """Add ``deltas`` to the shared counts and return every count after the merge."""
+        ...
+
+
+class InMemoryBanditStore:
+    """Process-local store for tests and single-worker deployments."""
+
+    def __init__(self) -> None:
+        self._counts: Counts = {}
+
+    async def merge(self, deltas: Counts) -> Counts:
+        for key, (successes, failures) in deltas.items():
+            current = self._counts.get(key, (0, 0))
+            self._counts[key] = (current[0] + successes, current[1] + failures)
+        return dict(self._counts)
+
+
+class RedisBanditStore:
+    """Counts shared by every worker and replica, in two Redis hashes keyed by segment and arm.
+
+    A merge is one MULTI/EXEC round trip: an HINCRBY per changed (segment, arm) followed by
+    reading both hashes back, so the totals returned always include the deltas just added.
+    """
+
+    def __init__(self, redis_url: str, key: str) -> None:
+        self._redis_url = redis_url
+        self._successes_key = f"{key}:successes"
+        self._failures_key = f"{key}:failures"
+        self._redis: Any = None
+
+    async def connect(self) -> None:
+        """Connect and ping Redis; raises if it is unreachable."""
+        from redis import asyncio as redis
+
+        client = redis.from_url(
+            self._redis_url, encoding="utf-8", decode_responses=True, socket_connect_timeout=2.0
+        )
+        try:
+            await client.ping()
+        except Exception:
+            await client.aclose()
+            raise
+        self._redis = client
+
+    async def merge(self, deltas: Counts) -> Counts:
+        if self._redis is None:
+            raise RuntimeError("Bandit store not connected")
+        async with self._redis.pipeline(transaction=True) as pipe:
+            for (segment, arm), (successes, failures) in deltas.items():
+                field = f"{segment}{_SEPARATOR}{arm}"
+                if successes:
+                    pipe.hincrby(self._successes_key, field, successes)
+                if failures:
+                    pipe.hincrby(self._failures_key, field, failures)
+            pipe.hgetall(self._successes_key)
+            pipe.hgetall(self._failures_key)
+            *_, successes_by_field, failures_by_field = await pipe.execute()
+        counts: Counts = {}
+        for field in successes_by_field.keys() | failures_by_field.keys():
+            segment, _, arm = field.partition(_SEPARATOR)
+            counts[segment, arm] = (
+                int(successes_by_field.get(field, 0)),
+                int(failures_by_field.get(field, 0)),
+            )
+        return counts
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import asyncio
+
+from shared.metrics.metrics import COALESCED_BATCH_FILL, COALESCED_BATCH_ITEMS
+
+from .scaledown import ScaleDownClient
+
+_Waiter = tuple[list[tuple[str, str]], asyncio.Future]
+
+
+class BatchCoalescer:
+    """Merges small concurrent compress requests into shared upstream batches.
+
+    Items wait at most ``linger_ms`` or until the adaptive batch size is reached, then go
+    out as one ``compress_batch`` call. Requests already at the target size skip the queue.
+    Shadow and non-shadow requests are coalesced separately. ``compress_batch`` returns
+    results in item order with the caller's ids, so duplicate ids across requests are safe.
+    """
+
+    def __init__(
+        self,
+        client: ScaleDownClient,
+        service: str,
+        linger_ms: float,
+        max_batch_size: int,
+        rate_limit_rps: float,
+    ) -> None:
+        self._client = client
+        self._service = service
+        self._linger = linger_ms / 1000.0
+        self._max_batch_size = max_batch_size
+        self._rate_limit_rps = rate_limit_rps
+        self._waiters: dict[bool, list[_Waiter]] = {False: [], True: []}
+        self._sizes: dict[bool, int] = {False: 0, True: 0}
+        self._timers: dict[bool, asyncio.TimerHandle | None] = {False: None, True: None}
+        self._tasks: set[asyncio.Task] = set()
+
+    async def submit(self, items: list[tuple[str, str]], shadow_mode: bool) -> list[dict]:
+        if not items:
+            return []
+        target = self._target_size(self._sizes[shadow_mode] + len(items))
+        if len(items) >= target:
+            return await self._client.compress_batch(
+                items, len(items), self._rate_limit_rps, shadow_mode
+            )
+
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+        self._waiters[shadow_mode].append((items, future))
+        self._sizes[shadow_mode] += len(items)
+        if self._sizes[shadow_mode] >= target:
+            self._flush(shadow_mode)
+        elif self._timers[shadow_mode] is None:
+            self._timers[shadow_mode] = loop.call_later(self._linger, self._flush, shadow_mode)
+        return await future
+
+    async def close(self) -> None:
+        for shadow_mode in (False, True):
+            self._flush(shadow_mode)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _target_size(self, queue_depth: int) -> int:
+        adaptive = self._client.get_batch_size(queue_depth, self._rate_limit_rps)
+        return max(1, min(self._max_batch_size, adaptive))
+
+    def _flush(self, shadow_mode: bool) -> None:
+        timer = self._timers[shadow_mode]
+        if timer is not None:
+            timer.cancel()
+            self._timers[shadow_mode] = None
+        waiters = self._waiters[shadow_mode]
+        if not waiters:
+            return
+        target = self._target_size(self._sizes[shadow_mode])
+        self._waiters[shadow_mode] = []
+        self._sizes[shadow_mode] = 0
+        task = asyncio.create_task(self._dispatch(waiters, shadow_mode, target))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, waiters: list[_Waiter], shadow_mode: bool, target: int) -> None:
+        merged = [item for items, _ in waiters for item in items]
+        COALESCED_BATCH_ITEMS.labels(self._service).observe(len(merged))
+        COALESCED_BATCH_FILL.labels(self._service).observe(min(1.0, len(merged) / target))
+        try:
+            results = await self._client.compress_batch(
+                merged, len(merged), self._rate_limit_rps, shadow_mode
+            )
+        except Exception as exc:
+            for _, future in waiters:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        offset = 0
+        for items, future in waiters:
+            own = results[offset : offset + len(items)]
+            offset += len(items)
+            if not future.done():
+                future.set_result(own)
+
@@ -1,29 +1,101 @@
 from __future__ import annotations
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 
 from shared.app_factory import create_app
+from shared.cache.cache import CacheLayer
 from shared.config.settings import get_settings
 from shared.logging.logger import configure_logging
+from shared.models.registry import get_registry
+from shared.ratelimit.ratelimit import RedisTokenBucketLimiter, TokenBucketLimiter
 
+from .coalescer import BatchCoalescer
 from .models import CompressBatchRequest, CompressBatchResponse
-from .scaledown import ScaleDownClient
+from .scaledown import FallbackCompressor, ScaleDownClient
+from .streaming import NDJSONStreamingResponse, iter_ndjson, stream_compress
 
 settings = get_settings()
 settings.service_name = "scaledown-client"
 configure_logging(settings.log_level)
 
-app: FastAPI = create_app(settings)
-client = ScaleDownClient(settings)
+registry = get_registry(settings.models.backend)
+cache = CacheLayer(
+    settings.redis.url,
+    settings.redis.l2_disk_cache_path,
+    l0_max_bytes=settings.redis.l0_max_bytes,
+    l0_ttl_seconds=settings.redis.l0_ttl_seconds,
+    stale_seconds=settings.redis.l0_stale_seconds,
+    service=settings.service_name,
+    writeback_ttl_seconds=settings.scaledown.cache_ttl_seconds,
+)
+app: FastAPI = create_app(
+    settings,
+    readiness=lambda: {
+        # The fallback model is optional: upstream and the lexical fallback work without it.
+        **registry.status([], optional=[FallbackCompressor.MODEL_NAME]),
+        "cache": cache.stats(),
+    },
+)
+if settings.scaledown.rate_limit_backend == "redis":
+    limiter = RedisTokenBucketLimiter(
+        settings.redis.url,
+        key="ratelimit:scaledown",
+        requests_per_second=settings.scaledown.rate_limit_rps,
+        tokens_per_second=settings.scaledown.rate_limit_tokens_per_second,
+        burst_seconds=settings.scaledown.rate_limit_burst_seconds,
+    )
+else:
+    limiter = TokenBucketLimiter(
+        settings.scaledown.rate_limit_rps,
+        settings.scaledown.rate_limit_tokens_per_second,
+        burst_seconds=settings.scaledown.rate_limit_burst_seconds,
+    )
+client = ScaleDownClient(settings, cache=cache, limiter=limiter, registry=registry)
+coalescer = BatchCoalescer(
+    client,
+    service=settings.service_name,
+    linger_ms=settings.scaledown.coalesce_linger_ms,
+    max_batch_size=settings.scaledown.coalesce_max_batch_size,
+    rate_limit_rps=settings.scaledown.rate_limit_rps,
+)
+
+
+@app.on_event("startup")
+async def startup() -> None:
+    await cache.connect()
+    if isinstance(limiter, RedisTokenBucketLimiter):
+        await limiter.connect()
+    if settings.models.warm_up:
+        registry.start_warm_up([FallbackCompressor.MODEL_NAME])
+
 
+@app.on_event("shutdown")
+async def shutdown() -> None:
+    await coalescer.close()
+    await client.close()
 
-@app.post("/compress", response_model=CompressBatchResponse)
+
+@app.post("/compress", response_model=CompressBatchResponse, response_model_exclude_none=True)
 async def compress(req: CompressBatchRequest) -> CompressBatchResponse:
     items = [(item.id, item.text) for item in req.items]
-    results = await client.compress_batch(
-        items=items,
-        queue_depth=len(items),
-        rate_limit_rps=50.0,
-        shadow_mode=req.shadow_mode,
-    )
+    results = await coalescer.submit(items, shadow_mode=req.shadow_mode)
+    if not req.include_original:
+        for result in results:
+            result["original"] = None
     return CompressBatchResponse(results=results)
+
+
+@app.post("/compress/stream")
+async def compress_stream(
+    request: Request, shadow_mode: bool = False, include_original: bool = True
+) -> NDJSONStreamingResponse:
+    rate_limit_rps = settings.scaledown.rate_limit_rps
+    body = stream_compress(
+        client,
+        iter_ndjson(request.stream()),
+        batch_size=client.get_batch_size(queue_depth=0, rate_limit_rps=rate_limit_rps),
+        rate_limit_rps=rate_limit_rps,
+        shadow_mode=shadow_mode,
+        include_original=include_original,
+    )
+    return NDJSONStreamingResponse(body)
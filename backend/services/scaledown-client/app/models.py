@@ -12,11 +12,12 @@ class CompressItem(BaseModel):
 class CompressBatchRequest(BaseModel):
     items: list[CompressItem]
     shadow_mode: bool = Field(default=False)
+    include_original: bool = Field(default=True)
 
 
 class CompressResult(BaseModel):
     id: str
-    original: str
+    original: str | None = None
     compressed: str
     ratio: float
     similarity: float
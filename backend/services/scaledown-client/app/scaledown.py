@@ -1,18 +1,33 @@
 from __future__ import annotations
 
 import asyncio
+import hashlib
+import random
+import re
 import time
 import uuid
 from collections import deque
-from collections.abc import Iterable
-from dataclasses import dataclass
+from collections.abc import Iterable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
 from enum import StrEnum
 
 import httpx
 import numpy as np
-from sentence_transformers import SentenceTransformer
 
+from shared.cache.cache import CacheLayer
 from shared.config.settings import Settings
+from shared.metrics.metrics import (
+    CACHE_HITS,
+    CACHE_MISSES,
+    COMPRESSION_DRIFT,
+    SHADOW_DROPPED,
+)
+from shared.metrics.rolling import RollingQuantile, RollingSum
+from shared.models.registry import ModelRegistry, get_registry
+from shared.ratelimit.ratelimit import RateLimiter
+
+from .shadow import ShadowMonitor
 
 
 class CircuitState(StrEnum):
@@ -21,32 +36,24 @@ class CircuitState(StrEnum):
     HALF_OPEN = "half_open"
 
 
-@dataclass
-class CallMetric:
-    latency_ms: float
-    tokens: int
-
-
 class SlidingMetrics:
     def __init__(self, capacity: int = 1000) -> None:
-        self._capacity = capacity
-        self._items: deque[CallMetric] = deque(maxlen=capacity)
+        self._latency = RollingSum(capacity)
+        self._tokens = RollingSum(capacity)
+        self._latency_quantiles = RollingQuantile(capacity)
 
     def add(self, latency_ms: float, tokens: int) -> None:
-        self._items.append(CallMetric(latency_ms=latency_ms, tokens=tokens))
+        self._latency.add(latency_ms)
+        self._tokens.add(tokens)
+        self._latency_quantiles.add(latency_ms)
 
     def tokens_per_second(self) -> float:
-        if not self._items:
+        if not self._latency.count:
             return 0.0
-        total_tokens = sum(i.tokens for i in self._items)
-        total_latency = sum(i.latency_ms for i in self._items) / 1000.0
-        return total_tokens / max(total_latency, 0.001)
+        return self._tokens.total / max(self._latency.total / 1000.0, 0.001)
 
     def p95_latency_ms(self) -> float:
-        if not self._items:
-            return 0.0
-        latencies = [i.latency_ms for i in self._items]
-        return float(np.percentile(latencies, 95))
+        return self._latency_quantiles.quantile(0.95)
 
 
 class AdaptiveBatcher:
@@ -117,42 +124,248 @@ class CircuitBreaker:
         return self._state
 
 
+class RetryBudget:
+    """Caps retries to a fraction of first attempts seen in a sliding time window."""
+
+    def __init__(
+        self, ratio: float = 0.2, min_retries: int = 10, window_seconds: float = 10.0
+    ) -> None:
+        self._ratio = ratio
+        self._min_retries = min_retries
+        self._window = window_seconds
+        self._requests: deque[float] = deque()
+        self._retries: deque[float] = deque()
+
+    def record_request(self) -> None:
+        now = time.monotonic()
+        self._expire(now)
+        self._requests.append(now)
+
+    def try_spend(self) -> bool:
+        now = time.monotonic()
+        self._expire(now)
+        if len(self._retries) >= self._min_retries + self._ratio * len(self._requests):
+            return False
+        self._retries.append(now)
+        return True
+
+    def _expire(self, now: float) -> None:
+        cutoff = now - self._window
+        while self._requests and self._requests[0] < cutoff:
+            self._requests.popleft()
+        while self._retries and self._retries[0] < cutoff:
+            self._retries.popleft()
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 8.0) -> float:
+    return random.uniform(0.0, min(cap, base * 2**attempt))
+
+
+def retry_after_seconds(response: httpx.Response, cap: float = 30.0) -> float | None:
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            delay = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(cap, max(0.0, delay))
+
+
+def _result_entries(response: httpx.Response) -> list[dict] | None:
+    """The ``results`` objects of an upstream response, or ``None`` if the body is malformed."""
+    try:
+        data = response.json()
+    except ValueError:
+        return None
+    results = data.get("results") if isinstance(data, dict) else None
+    if not isinstance(results, list) or not all(isinstance(entry, dict) for entry in results):
+        return None
+    return results
+
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
+
+def _split_sentences(text: str) -> list[str]:
+    return [sentence for sentence in _SENTENCE_BOUNDARY.split(text.strip()) if sentence]
+
+
+def _select_sentences(
+    sentences: list[str],
+    scores: np.ndarray,
+    total_chars: int,
+    target_ratio: float,
+    max_ratio: float,
+) -> list[str]:
+    """What to keep of each sentence (``""`` if dropped), best-scored first, until
+    ``target_ratio`` of ``total_chars`` is reached without going past ``max_ratio``.
+
+    Lower-ranked sentences that still fit are taken after a longer one is skipped; if the
+    kept text is still short of the target, the best remaining sentence is cut at a word
+    boundary to fill the budget.
+    """
+    kept = [""] * len(sentences)
+    budget = int(max_ratio * total_chars)
+    kept_chars = -1  # no joining space before the first sentence
+    order = np.argsort(-scores, kind="stable")
+    for index in order:
+        length = len(sentences[index]) + 1
+        if kept_chars > 0 and kept_chars + length > budget:
+            continue
+        kept[index] = sentences[index]
+        kept_chars += length
+        if kept_chars >= target_ratio * total_chars:
+            return kept
+    room = budget - kept_chars - 1
+    for index in order:
+        if kept[index]:
+            continue
+        head = sentences[index][: room + 1]
+        space = head.rfind(" ")
+        if space > 0:
+            kept[index] = head[:space].rstrip()
+            break
+    return kept
+
+
+def _extract(
+    text: str, doc: list[str], scores: np.ndarray, target_ratio: float, max_ratio: float
+) -> str:
+    kept = _select_sentences(doc, scores, len(text), target_ratio, max_ratio)
+    compressed = " ".join(sentence for sentence in kept if sentence)
+    return _fit(compressed, len(text), target_ratio, max_ratio)
+
+
+def _fit(compressed: str, total_chars: int, target_ratio: float, max_ratio: float) -> str:
+    """``compressed`` cut back to ``target_ratio`` of the original, at a word boundary, if it
+    is longer than ``max_ratio`` of it (a single sentence, or a leading sentence that is
+    already too long)."""
+    if len(compressed) <= max_ratio * total_chars:
+        return compressed
+    cut = compressed[: int(target_ratio * total_chars) + 1]
+    space = cut.rfind(" ")
+    return (cut[:space] if space > 0 else cut[:-1]).rstrip()
+
+
 class FallbackCompressor:
-    def __init__(self) -> None:
-        self._model: SentenceTransformer | None = None
+    MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+    def __init__(self, registry: ModelRegistry | None = None) -> None:
+        self._registry = registry or get_registry()
+        self._model = None
 
     def _ensure_model(self) -> None:
         if self._model is None:
-            self._model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-
-    def compress_with_t5(self, text: str) -> str:
-        # Placeholder for a local T5 compression model.
-        if len(text) <= 240:
-            return text
-        return text[:240] + "..."
-
-    def compress_extractive(self, text: str) -> str:
-        sentences = text.split(".")
-        return ".".join(sentences[:2]).strip() or text[:200]
+            self._model = self._registry.get(self.MODEL_NAME)
+
+    def compress_batch(
+        self, texts: Sequence[str], target_ratio: float = 0.8, max_ratio: float = 0.85
+    ) -> list[tuple[str, float]]:
+        """Extractive compression of a whole batch with one encode call for ranking.
+
+        Sentences are ranked by similarity to their document's centroid and kept, in their
+        original order, until ``target_ratio`` of the characters is reached without going
+        past ``max_ratio``; the best sentence that does not fit whole is cut at a word
+        boundary to make up any shortfall. Returns ``(compressed, similarity)`` pairs where
+        similarity comes from ``similarity_batch`` on the original and compressed texts.
+        """
+        docs = [_split_sentences(text) for text in texts]
+        counts = np.array([len(sentences) for sentences in docs], dtype=np.int64)
+        sentences = [sentence for doc in docs for sentence in doc]
+        if not sentences:
+            return [(text, 0.0) for text in texts]
+        try:
+            self._ensure_model()
+            embeddings = self._model.encode(
+                sentences, normalize_embeddings=True, convert_to_numpy=True
+            )
+        except Exception:
+            return [
+                self._lexical_extract(text, doc, target_ratio, max_ratio)
+                for text, doc in zip(texts, docs)
+            ]
+
+        offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        doc_index = np.repeat(np.arange(len(docs)), counts)
+        centroids = np.zeros((len(docs), embeddings.shape[1]), dtype=embeddings.dtype)
+        np.add.at(centroids, doc_index, embeddings)
+        centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+        scores = np.einsum("ij,ij->i", embeddings, centroids[doc_index])
+
+        compressed = [
+            _extract(text, doc, scores[start : start + count], target_ratio, max_ratio)
+            for text, doc, start, count in zip(texts, docs, offsets, counts)
+        ]
+        similarities = self.similarity_batch(list(texts), compressed)
+        return [
+            (kept, similarity) if count else (text, 0.0)
+            for text, kept, similarity, count in zip(texts, compressed, similarities, counts)
+        ]
+
+    def _lexical_extract(
+        self, text: str, doc: list[str], target_ratio: float, max_ratio: float
+    ) -> tuple[str, float]:
+        if not doc:
+            return text, 0.0
+        # Without the model, prefer leading sentences under the same length budget.
+        lead_first = -np.arange(len(doc), dtype=np.float64)
+        compressed = _extract(text, doc, lead_first, target_ratio, max_ratio)
+        return compressed, self._lexical_overlap(text, compressed)
 
     def similarity(self, original: str, compressed: str) -> float:
+        return self.similarity_batch([original], [compressed])[0]
+
+    def similarity_batch(self, originals: Sequence[str], compressed: Sequence[str]) -> list[float]:
+        if not originals:
+            return []
         try:
             self._ensure_model()
-            embeddings = self._model.encode([original, compressed], normalize_embeddings=True)
-            return float(np.dot(embeddings[0], embeddings[1]))
+            embeddings = self._model.encode(
+                [*originals, *compressed], normalize_embeddings=True, convert_to_numpy=True
+            )
+            left, right = embeddings[: len(originals)], embeddings[len(originals) :]
+            return np.einsum("ij,ij->i", left, right).astype(float).tolist()
         except Exception:
-            if not original or not compressed:
-                return 0.0
-            overlap = len(set(original.split()) & set(compressed.split()))
-            return overlap / max(len(set(original.split())), 1)
+            return [self._lexical_overlap(o, c) for o, c in zip(originals, compressed)]
+
+    @staticmethod
+    def _lexical_overlap(original: str, compressed: str) -> float:
+        if not original or not compressed:
+            return 0.0
+        overlap = len(set(original.split()) & set(compressed.split()))
+        return overlap / max(len(set(original.split())), 1)
 
 
 class ScaleDownClient:
-    def __init__(self, settings: Settings) -> None:
+    def __init__(
+        self,
+        settings: Settings,
+        cache: CacheLayer | None = None,
+        limiter: RateLimiter | None = None,
+        registry: ModelRegistry | None = None,
+    ) -> None:
         self._settings = settings
+        self._cache = cache
+        self._limiter = limiter
         self._batcher = AdaptiveBatcher()
         self._breaker = CircuitBreaker(failure_threshold=5, reset_timeout=30.0)
-        self._fallback = FallbackCompressor()
+        self._retry_budget = RetryBudget()
+        self._fallback = FallbackCompressor(registry)
+        # The embedding model is not thread-safe; a single worker keeps encodes serialized
+        # while still moving them off the event loop.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="similarity")
+        self._executor_jobs = 0
+        self._semaphore = asyncio.Semaphore(settings.scaledown.max_concurrent_batches)
+        self._shadow = ShadowMonitor(
+            self._shadow_compare,
+            service=settings.service_name,
+            sample_rate=settings.scaledown.shadow_sample_rate,
+            queue_size=settings.scaledown.shadow_queue_size,
+        )
         self._client = httpx.AsyncClient(
             base_url=settings.scaledown.base_url,
             timeout=settings.scaledown.timeout_seconds,
@@ -160,7 +373,9 @@ class ScaleDownClient:
         )
 
     async def close(self) -> None:
+        await self._shadow.close()
         await self._client.aclose()
+        self._executor.shutdown(wait=False)
 
     async def compress_batch(
         self,
@@ -173,52 +388,216 @@ class ScaleDownClient:
         if not batch:
             return []
 
+        keys = [self._cache_key(item["text"]) for item in batch]
+        unique: dict[str, dict] = {}
+        for key, item in zip(keys, batch):
+            unique.setdefault(key, item)
+
+        by_key = await self._cache_lookup(list(unique))
+        misses = {key: item for key, item in unique.items() if key not in by_key}
+        if misses:
+            # Callers may reuse ids, and results are matched back by id, so each distinct
+            # text goes upstream under its position instead; callers get theirs back below.
+            positional = [
+                {"id": str(index), "text": item["text"]}
+                for index, item in enumerate(misses.values())
+            ]
+            fresh = await self._compress_uncached(
+                positional, queue_depth, rate_limit_rps, shadow_mode
+            )
+            fresh_by_key = dict(zip(misses, fresh))
+            by_key.update(fresh_by_key)
+            await self._cache_store(
+                {key: result for key, result in fresh_by_key.items() if not result["used_fallback"]}
+            )
+
+        return [
+            {**by_key[key], "id": item["id"], "original": item["text"]}
+            for key, item in zip(keys, batch)
+        ]
+
+    async def _compress_uncached(
+        self, batch: list[dict], queue_depth: int, rate_limit_rps: float, shadow_mode: bool
+    ) -> list[dict]:
+        size = self.get_batch_size(queue_depth, rate_limit_rps)
+        chunks = self._chunk(batch, size)
+        chunk_results = await asyncio.gather(
+            *(self._compress_chunk(chunk, shadow_mode) for chunk in chunks)
+        )
+        return [result for results in chunk_results for result in results]
+
+    def _chunk(self, batch: list[dict], size: int) -> list[list[dict]]:
+        max_tokens = self._limiter.max_tokens if self._limiter else float("inf")
+        chunks: list[list[dict]] = []
+        current: list[dict] = []
+        current_tokens = 0
+        for item in batch:
+            tokens = len(item["text"].split())
+            if current and (len(current) >= size or current_tokens + tokens > max_tokens):
+                chunks.append(current)
+                current, current_tokens = [], 0
+            current.append(item)
+            current_tokens += tokens
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _cache_key(self, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"scaledown:compress:{self._settings.scaledown.model}:{digest}"
+
+    async def _cache_lookup(self, keys: list[str]) -> dict[str, dict]:
+        if self._cache is None:
+            return {}
+        try:
+            values = await self._cache.get_many(keys)
+        except Exception:
+            values = [None] * len(keys)
+        found = {key: value for key, value in zip(keys, values) if value is not None}
+        service = self._settings.service_name
+        CACHE_HITS.labels(service, "compression").inc(len(found))
+        CACHE_MISSES.labels(service, "compression").inc(len(keys) - len(found))
+        return found
+
+    async def _cache_store(self, entries: dict[str, dict]) -> None:
+        if self._cache is None or not entries:
+            return
+        values = {
+            key: {
+                "compressed": result["compressed"],
+                "ratio": result["ratio"],
+                "similarity": result["similarity"],
+                "used_fallback": False,
+            }
+            for key, result in entries.items()
+        }
+        try:
+            await self._cache.set_many(
+                values, ttl_seconds=self._settings.scaledown.cache_ttl_seconds
+            )
+        except Exception:
+            pass
+
+    async def _compress_chunk(self, chunk: list[dict], shadow_mode: bool) -> list[dict]:
+        async with self._semaphore:
+            try:
+                return await asyncio.wait_for(
+                    self._send_chunk(chunk, shadow_mode),
+                    timeout=self._settings.scaledown.batch_deadline_seconds,
+                )
+            except Exception:
+                # A deadline overrun or an unexpected error costs only this chunk: it is
+                # compressed locally while the other chunks keep their upstream results.
+                self._breaker.record_failure()
+                return await self._fallback_batch(chunk)
+
+    async def _send_chunk(self, chunk: list[dict], shadow_mode: bool) -> list[dict]:
         if not self._breaker.allow():
-            return await self._fallback_batch(batch)
+            return await self._fallback_batch(chunk)
 
-        idempotency_key = str(uuid.uuid4())
         url = self._settings.scaledown.batch_endpoint
-        payload = {"items": batch}
         max_retries = 3
+        pending = chunk
+        compressed: dict[str, str] = {}
+        server_failure = False
+        delay = 0.0
+        # Retries of the same items reuse the key so upstream can deduplicate them; a new
+        # key is only needed once a partial success changes what is being sent.
+        idempotency_key = str(uuid.uuid4())
+        self._retry_budget.record_request()
 
         for attempt in range(max_retries + 1):
+            if attempt:
+                if not self._retry_budget.try_spend() or not self._breaker.allow():
+                    break
+                await asyncio.sleep(delay)
+
+            tokens = sum(len(item["text"].split()) for item in pending)
+            if self._limiter is not None:
+                await self._limiter.acquire(requests=1, tokens=tokens)
             start = time.perf_counter()
             try:
                 response = await self._client.post(
                     url,
-                    json=payload,
+                    json={"items": pending},
                     headers={"Idempotency-Key": idempotency_key},
                 )
-                elapsed_ms = (time.perf_counter() - start) * 1000
-                tokens = sum(len(item["text"].split()) for item in batch)
-                self._batcher.record(elapsed_ms, tokens)
-
-                if response.status_code >= 500:
-                    raise httpx.HTTPError(f"Server error {response.status_code}")
-                data = response.json()
-                self._breaker.record_success()
-
-                results = self._format_results(batch, data)
-                if shadow_mode:
-                    await self._shadow_compare(batch, results)
-                return results
-            except Exception:
-                self._breaker.record_failure()
-                if attempt >= max_retries:
-                    return await self._fallback_batch(batch)
-                await asyncio.sleep(2**attempt)
-        return await self._fallback_batch(batch)
+            except httpx.TransportError:
+                server_failure = True
+                delay = backoff_delay(attempt)
+                continue
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self._batcher.record(elapsed_ms, tokens)
+
+            status = response.status_code
+            if status in (429, 503):
+                server_failure = status == 503
+                delay = retry_after_seconds(response) or backoff_delay(attempt)
+                continue
+            if status >= 500:
+                server_failure = True
+                delay = backoff_delay(attempt)
+                continue
+            if status >= 400:
+                # The request itself is rejected; retrying or blaming upstream health won't help.
+                server_failure = False
+                break
+
+            entries = _result_entries(response)
+            if entries is None:
+                # A 200 with a body we cannot read is as unhealthy as a 5xx.
+                server_failure = True
+                delay = backoff_delay(attempt)
+                continue
+            self._breaker.record_success()
+            server_failure = False
+            wanted = {item["id"] for item in pending}
+            for entry in entries:
+                item_id, text = entry.get("id"), entry.get("compressed")
+                if isinstance(item_id, str) and item_id in wanted and isinstance(text, str):
+                    compressed[item_id] = text
+            remaining = [item for item in pending if item["id"] not in compressed]
+            if len(remaining) < len(pending):
+                idempotency_key = str(uuid.uuid4())
+            pending = remaining
+            if not pending:
+                break
+            delay = backoff_delay(attempt)
+
+        if server_failure:
+            self._breaker.record_failure()
+
+        done = [item for item in chunk if item["id"] in compressed]
+        results = await self._format_results(done, compressed)
+        if shadow_mode and results:
+            self._shadow.submit(done, results)
+        if pending:
+            results.extend(await self._fallback_batch(pending))
+            by_id = {result["id"]: result for result in results}
+            results = [by_id[item["id"]] for item in chunk]
+        return results
 
     def get_batch_size(self, queue_depth: int, rate_limit_rps: float) -> int:
         return self._batcher.calculate_batch_size(queue_depth, rate_limit_rps)
 
+    async def _run_model(self, fn, *args):
+        self._executor_jobs += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self._executor_jobs -= 1
+
+    async def _similarities(self, originals: list[str], compressed: list[str]) -> list[float]:
+        return await self._run_model(self._fallback.similarity_batch, originals, compressed)
+
     async def _fallback_batch(self, batch: list[dict]) -> list[dict]:
+        compressed_batch = await self._run_model(
+            self._fallback.compress_batch,
+            [item["text"] for item in batch],
+            self._settings.scaledown.fallback_target_ratio,
+        )
         results = []
-        for item in batch:
-            compressed = self._fallback.compress_with_t5(item["text"])
-            if compressed == item["text"]:
-                compressed = self._fallback.compress_extractive(item["text"])
-            similarity = self._fallback.similarity(item["text"], compressed)
+        for item, (compressed, similarity) in zip(batch, compressed_batch):
             ratio = len(compressed) / max(len(item["text"]), 1)
             results.append(
                 {
@@ -232,13 +611,16 @@ class ScaleDownClient:
             )
         return results
 
-    def _format_results(self, batch: list[dict], data: dict) -> list[dict]:
+    async def _format_results(self, batch: list[dict], compressed: dict[str, str]) -> list[dict]:
+        if not batch:
+            return []
+        compressed_texts = [compressed[item["id"]] for item in batch]
+        similarities = await self._similarities(
+            [item["text"] for item in batch], compressed_texts
+        )
         results = []
-        compressed_items = {item["id"]: item for item in data.get("results", [])}
-        for item in batch:
-            compressed = compressed_items.get(item["id"], {}).get("compressed", "")
+        for item, compressed, similarity in zip(batch, compressed_texts, similarities):
             ratio = len(compressed) / max(len(item["text"]), 1)
-            similarity = self._fallback.similarity(item["text"], compressed)
             results.append(
                 {
                     "id": item["id"],
@@ -252,10 +634,15 @@ class ScaleDownClient:
         return results
 
     async def _shadow_compare(self, batch: list[dict], results: list[dict]) -> None:
-        for item, result in zip(batch, results):
-            original = item["text"]
-            compressed = result["compressed"]
-            drift = 1.0 - self._fallback.similarity(original, compressed)
-            if drift > 0.1:
-                # In production this should emit to a monitoring pipeline
-                pass
+        service = self._settings.service_name
+        upstream = COMPRESSION_DRIFT.labels(service, self._settings.scaledown.model)
+        for result in results:
+            upstream.observe(1.0 - result["similarity"])
+        if self._executor_jobs:
+            # The model executor is shared with requests; skip the local comparison rather
+            # than queue behind (or ahead of) request-path encodes.
+            SHADOW_DROPPED.labels(service).inc(len(batch))
+            return
+        local = COMPRESSION_DRIFT.labels(service, "local-fallback")
+        for result in await self._fallback_batch(batch):
+            local.observe(1.0 - result["similarity"])
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import asyncio
+import random
+from collections.abc import Awaitable, Callable
+
+from shared.metrics.metrics import SHADOW_DROPPED
+
+ShadowHandler = Callable[[list[dict], list[dict]], Awaitable[None]]
+
+
+class ShadowMonitor:
+    """Runs shadow comparisons for a sample of items on a bounded background queue.
+
+    Work is dropped rather than queued when the worker falls behind, so shadow mode never
+    adds latency or unbounded memory to the request path.
+    """
+
+    def __init__(
+        self, handler: ShadowHandler, service: str, sample_rate: float, queue_size: int
+    ) -> None:
+        self._handler = handler
+        self._service = service
+        self._sample_rate = sample_rate
+        self._queue: asyncio.Queue[tuple[list[dict], list[dict]]] = asyncio.Queue(
+            maxsize=queue_size
+        )
+        self._task: asyncio.Task | None = None
+
+    def submit(self, batch: list[dict], results: list[dict]) -> None:
+        sampled = [i for i in range(len(batch)) if random.random() < self._sample_rate]
+        if not sampled:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        try:
+            self._queue.put_nowait(([batch[i] for i in sampled], [results[i] for i in sampled]))
+        except asyncio.QueueFull:
+            SHADOW_DROPPED.labels(self._service).inc(len(sampled))
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self) -> None:
+        while True:
+            batch, results = await self._queue.get()
+            try:
+                await self._handler(batch, results)
+            except Exception:
+                # Shadow failures must never surface to callers; the next sample retries.
+                pass
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from collections import deque
+from collections.abc import AsyncIterator
+
+from pydantic import ValidationError
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from .models import CompressItem, CompressResult
+from .scaledown import ScaleDownClient
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # The body iterator reads the request stream itself, so it has to be the only
+        # consumer of receive(); StreamingResponse would race it with a disconnect listener.
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+class LineTooLong(ValueError):
+    def __init__(self, line_no: int, max_line_bytes: int) -> None:
+        super().__init__(f"line {line_no} exceeds {max_line_bytes} bytes")
+        self.line_no = line_no
+
+
+async def iter_ndjson(
+    chunks: AsyncIterator[bytes], max_line_bytes: int = 1_048_576
+) -> AsyncIterator[tuple[int, bytes]]:
+    buffer = b""
+    line_no = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_no += 1
+            if line.strip():
+                yield line_no, line
+        if len(buffer) > max_line_bytes:
+            raise LineTooLong(line_no + 1, max_line_bytes)
+    if buffer.strip():
+        yield line_no + 1, buffer
+
+
+def _encode(results: list[dict], include_original: bool) -> bytes:
+    lines = []
+    for result in results:
+        model = CompressResult(**result)
+        if not include_original:
+            model.original = None
+        lines.append(model.model_dump_json(exclude_none=True))
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _error(line_no: int, message: str) -> bytes:
+    return (json.dumps({"line": line_no, "error": message}) + "\n").encode("utf-8")
+
+
+async def stream_compress(
+    client: ScaleDownClient,
+    lines: AsyncIterator[tuple[int, bytes]],
+    batch_size: int,
+    rate_limit_rps: float,
+    shadow_mode: bool,
+    include_original: bool,
+    max_in_flight: int = 4,
+) -> AsyncIterator[bytes]:
+    in_flight: deque[asyncio.Task[list[dict]]] = deque()
+    batch: list[tuple[str, str]] = []
+
+    def submit() -> None:
+        in_flight.append(
+            asyncio.create_task(
+                client.compress_batch(
+                    items=list(batch),
+                    queue_depth=len(batch) * (len(in_flight) + 1),
+                    rate_limit_rps=rate_limit_rps,
+                    shadow_mode=shadow_mode,
+                )
+            )
+        )
+        batch.clear()
+
+    try:
+        try:
+            async for line_no, line in lines:
+                try:
+                    item = CompressItem.model_validate_json(line)
+                except ValidationError as exc:
+                    yield _error(line_no, str(exc))
+                    continue
+                batch.append((item.id, item.text))
+                if len(batch) >= batch_size:
+                    submit()
+                while in_flight and (in_flight[0].done() or len(in_flight) >= max_in_flight):
+                    yield _encode(await in_flight.popleft(), include_original)
+        except LineTooLong as exc:
+            # Flush what was accepted and report where the input was cut.
+            yield _error(exc.line_no, str(exc))
+        if batch:
+            submit()
+        while in_flight:
+            yield _encode(await in_flight.popleft(), include_original)
+    finally:
+        for task in in_flight:
+            task.cancel()
@@ -1 +1,11 @@
-__all__ = ["app_factory", "config", "logging", "metrics", "cache", "queue", "security"]
+__all__ = [
+    "app_factory",
+    "config",
+    "logging",
+    "metrics",
+    "models",
+    "cache",
+    "queue",
+    "ratelimit",
+    "security",
+]
@@ -1,8 +1,11 @@
 from __future__ import annotations
 
 import time
+from collections.abc import Callable
+from typing import Any
 
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 
 from shared.config.settings import Settings
@@ -25,12 +28,23 @@ class MetricsMiddleware(BaseHTTPMiddleware):
         return response
 
 
-def create_app(settings: Settings) -> FastAPI:
+def create_app(
+    settings: Settings, readiness: Callable[[], dict[str, Any]] | None = None
+) -> FastAPI:
     app = FastAPI(title=settings.service_name)
 
     @app.get("/health")
-    async def health() -> dict:
-        return {"status": "ok", "service": settings.service_name}
+    async def health() -> JSONResponse:
+        payload: dict[str, Any] = {"status": "ok", "service": settings.service_name}
+        status_code = 200
+        if readiness is not None:
+            details = readiness()
+            payload.update(details)
+            if not details.get("ready", True):
+                # 503 keeps load balancers and readiness probes away until models are loaded.
+                payload["status"] = "starting"
+                status_code = 503
+        return JSONResponse(payload, status_code=status_code)
 
     app.include_router(metrics_router())
     app.add_middleware(MetricsMiddleware, settings=settings)
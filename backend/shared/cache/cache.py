@@ -1,55 +1,312 @@
 from __future__ import annotations
 
+import asyncio
 import hashlib
 import json
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
 
 import aiofiles
-import aioredis
+
+from shared.metrics.metrics import CACHE_HITS, CACHE_MISSES
+
+logger = logging.getLogger(__name__)
+
+_CONNECT_TIMEOUT_SECONDS = 2.0
+
+Loader = Callable[[], Awaitable[dict[str, Any]]]
+
+
+@dataclass(slots=True)
+class _Entry:
+    value: dict[str, Any]
+    size: int
+    fresh_until: float
+    stale_until: float
 
 
 class CacheLayer:
-    def __init__(self, redis_url: str, disk_path: str) -> None:
+    """JSON cache in three tiers: an in-process LRU (L0), Redis, and files on local disk.
+
+    L0 keeps decoded values for at most ``l0_ttl_seconds`` (or the entry's own TTL if
+    shorter) and evicts least recently used entries once their encoded size exceeds
+    ``l0_max_bytes``; ``l0_max_bytes=0`` disables it. Values served from L0 are shared
+    between callers and must not be mutated.
+
+    Concurrent lookups of one key share a single Redis and disk read, and ``get_or_load``
+    runs at most one loader per key. With ``stale_seconds`` set, ``get_or_load`` keeps
+    serving an expired L0 entry for that long while one background load refreshes it.
+    ``get_many`` and ``set_many`` cost one Redis round trip per batch; disk reads and writes
+    run concurrently, at most ``disk_concurrency`` at a time. Values found only on disk are
+    written back to Redis with ``writeback_ttl_seconds``.
+    """
+
+    TIERS = ("l0", "redis", "disk")
+
+    def __init__(
+        self,
+        redis_url: str,
+        disk_path: str,
+        l0_max_bytes: int = 64 * 1024 * 1024,
+        l0_ttl_seconds: float = 60.0,
+        stale_seconds: float = 0.0,
+        service: str = "unknown-service",
+        disk_concurrency: int = 16,
+        writeback_ttl_seconds: int = 3600,
+        redis: Any = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
         self._redis_url = redis_url
         self._disk_path = Path(disk_path)
-        self._redis: aioredis.Redis | None = None
+        # An already-connected client may be passed in, e.g. a stand-in for tests.
+        self._redis = redis
+        self._l0: OrderedDict[str, _Entry] = OrderedDict()
+        self._l0_bytes = 0
+        self._l0_max_bytes = l0_max_bytes
+        self._l0_ttl = l0_ttl_seconds
+        self._stale = stale_seconds
+        self._service = service
+        self._clock = clock
+        self._disk_slots = asyncio.Semaphore(disk_concurrency)
+        self._writeback_ttl = writeback_ttl_seconds
+        self._lookups: dict[str, asyncio.Task] = {}
+        self._loads: dict[str, asyncio.Task] = {}
+        self._hits = dict.fromkeys(self.TIERS, 0)
+        self._misses = dict.fromkeys(self.TIERS, 0)
 
     async def connect(self) -> None:
-        self._redis = await aioredis.from_url(
-            self._redis_url, encoding="utf-8", decode_responses=True
-        )
+        """Connect to Redis. The cache is optional: if Redis is unreachable the failure is
+        logged and the layer stays disconnected, so every call raises and callers carry on
+        without it."""
         self._disk_path.mkdir(parents=True, exist_ok=True)
+        if self._redis is None:
+            from redis import asyncio as redis
+
+            client = redis.from_url(
+                self._redis_url,
+                encoding="utf-8",
+                decode_responses=True,
+                socket_connect_timeout=_CONNECT_TIMEOUT_SECONDS,
+            )
+            try:
+                await client.ping()
+            except Exception:
+                logger.warning("Redis unreachable; cache layer disabled", exc_info=True)
+                await client.aclose()
+                return
+            self._redis = client
+
+    @property
+    def connected(self) -> bool:
+        return self._redis is not None
 
     async def get(self, key: str) -> dict[str, Any] | None:
         if not self._redis:
             raise RuntimeError("Cache not connected")
-        val = await self._redis.get(key)
-        if val:
-            return json.loads(val)
-        disk_val = await self._read_disk(key)
-        if disk_val:
-            await self._redis.set(key, json.dumps(disk_val))
-        return disk_val
+        entry = self._l0_lookup(key)
+        if entry is not None and entry.fresh_until > self._clock():
+            return entry.value
+        lookup = _single_flight(self._lookups, key, lambda: self._lookup(key))
+        return await asyncio.shield(lookup)
+
+    async def get_or_load(
+        self, key: str, loader: Loader, ttl_seconds: int = 3600
+    ) -> dict[str, Any]:
+        """Return the cached value for ``key``, calling ``loader`` and caching its result on a
+        miss. Concurrent callers for the same key wait for one loader."""
+        if not self._redis:
+            raise RuntimeError("Cache not connected")
+        entry = self._l0_lookup(key)
+        if entry is not None and entry.fresh_until > self._clock():
+            return entry.value
+        load = _single_flight(self._loads, key, lambda: self._load(key, loader, ttl_seconds))
+        if entry is not None:
+            # Stale but within the grace period: serve it while the load refreshes it.
+            return entry.value
+        return await asyncio.shield(load)
 
     async def set(self, key: str, value: dict[str, Any], ttl_seconds: int = 3600) -> None:
         if not self._redis:
             raise RuntimeError("Cache not connected")
-        await self._redis.set(key, json.dumps(value), ex=ttl_seconds)
-        await self._write_disk(key, value)
+        raw = json.dumps(value)
+        await self._redis.set(key, raw, ex=ttl_seconds)
+        await self._write_disk(key, raw)
+        self._remember(key, value, len(raw), ttl_seconds)
+
+    async def get_many(self, keys: list[str]) -> list[dict[str, Any] | None]:
+        """Values for ``keys`` in the same order, with ``None`` for misses.
+
+        Keys not in L0 cost one MGET; Redis misses are read from disk concurrently, and any
+        found there are written back to Redis in one pipeline.
+        """
+        if not self._redis:
+            raise RuntimeError("Cache not connected")
+        if not keys:
+            return []
+        now = self._clock()
+        results: dict[str, dict[str, Any] | None] = {}
+        for key in dict.fromkeys(keys):
+            entry = self._l0_lookup(key)
+            if entry is not None and entry.fresh_until > now:
+                results[key] = entry.value
+        remote = [key for key in dict.fromkeys(keys) if key not in results]
+        if remote:
+            raws = dict(zip(remote, await self._redis.mget(remote)))
+            missing = [key for key, raw in raws.items() if not raw]
+            self._count("redis", hits=len(remote) - len(missing), misses=len(missing))
+            if missing:
+                raws_on_disk = await asyncio.gather(*(self._read_disk(key) for key in missing))
+                from_disk = dict(zip(missing, raws_on_disk))
+                found = {key: raw for key, raw in from_disk.items() if raw}
+                self._count("disk", hits=len(found), misses=len(missing) - len(found))
+                if found:
+                    async with self._redis.pipeline(transaction=False) as pipe:
+                        for key, raw in found.items():
+                            pipe.set(key, raw, ex=self._writeback_ttl)
+                        await pipe.execute()
+                raws.update(from_disk)
+            for key, raw in raws.items():
+                results[key] = self._promote(key, raw) if raw else None
+        return [results[key] for key in keys]
+
+    async def set_many(self, items: dict[str, dict[str, Any]], ttl_seconds: int = 3600) -> None:
+        """Write every item to Redis in one pipeline, then to disk concurrently."""
+        if not self._redis:
+            raise RuntimeError("Cache not connected")
+        if not items:
+            return
+        raws = {key: json.dumps(value) for key, value in items.items()}
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for key, raw in raws.items():
+                pipe.set(key, raw, ex=ttl_seconds)
+            await pipe.execute()
+        await asyncio.gather(*(self._write_disk(key, raw) for key, raw in raws.items()))
+        for key, value in items.items():
+            self._remember(key, value, len(raws[key]), ttl_seconds)
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        stats = {}
+        for tier in self.TIERS:
+            lookups = self._hits[tier] + self._misses[tier]
+            stats[tier] = {
+                "hits": self._hits[tier],
+                "misses": self._misses[tier],
+                "hit_ratio": self._hits[tier] / lookups if lookups else 0.0,
+            }
+        stats["l0"]["bytes"] = self._l0_bytes
+        stats["l0"]["entries"] = len(self._l0)
+        return stats
+
+    async def _lookup(self, key: str) -> dict[str, Any] | None:
+        return await self._decode(key, await self._redis.get(key))
+
+    async def _load(self, key: str, loader: Loader, ttl_seconds: int) -> dict[str, Any]:
+        value = await self._lookup(key)
+        if value is None:
+            value = await loader()
+            await self.set(key, value, ttl_seconds=ttl_seconds)
+        return value
+
+    async def _decode(self, key: str, raw: str | None) -> dict[str, Any] | None:
+        """Decode a Redis value, falling back to disk on a miss, and promote it into L0."""
+        self._count("redis", hits=int(bool(raw)), misses=int(not raw))
+        if not raw:
+            raw = await self._read_disk(key)
+            self._count("disk", hits=int(bool(raw)), misses=int(not raw))
+            if not raw:
+                return None
+            await self._redis.set(key, raw, ex=self._writeback_ttl)
+        return self._promote(key, raw)
+
+    def _promote(self, key: str, raw: str) -> dict[str, Any]:
+        value = json.loads(raw)
+        self._remember(key, value, len(raw), self._l0_ttl)
+        return value
+
+    def _l0_lookup(self, key: str) -> _Entry | None:
+        """The L0 entry for ``key`` if it is fresh or still within its stale grace period.
+
+        Only fresh entries count as L0 hits.
+        """
+        if self._l0_max_bytes <= 0:
+            return None
+        now = self._clock()
+        entry = self._l0.get(key)
+        if entry is not None and entry.stale_until <= now:
+            self._forget(key)
+            entry = None
+        fresh = entry is not None and entry.fresh_until > now
+        self._count("l0", hits=int(fresh), misses=int(not fresh))
+        if entry is not None:
+            self._l0.move_to_end(key)
+        return entry
+
+    def _remember(self, key: str, value: dict[str, Any], size: int, ttl_seconds: float) -> None:
+        if size > self._l0_max_bytes:
+            return
+        self._forget(key)
+        fresh_until = self._clock() + min(self._l0_ttl, ttl_seconds)
+        self._l0[key] = _Entry(value, size, fresh_until, fresh_until + self._stale)
+        self._l0_bytes += size
+        while self._l0_bytes > self._l0_max_bytes:
+            _, evicted = self._l0.popitem(last=False)
+            self._l0_bytes -= evicted.size
+
+    def _forget(self, key: str) -> None:
+        entry = self._l0.pop(key, None)
+        if entry is not None:
+            self._l0_bytes -= entry.size
+
+    def _count(self, tier: str, hits: int = 0, misses: int = 0) -> None:
+        if hits:
+            self._hits[tier] += hits
+            CACHE_HITS.labels(self._service, f"layer_{tier}").inc(hits)
+        if misses:
+            self._misses[tier] += misses
+            CACHE_MISSES.labels(self._service, f"layer_{tier}").inc(misses)
 
     def _hash_key(self, key: str) -> str:
         return hashlib.sha256(key.encode("utf-8")).hexdigest()
 
-    async def _read_disk(self, key: str) -> dict[str, Any] | None:
+    async def _read_disk(self, key: str) -> str | None:
         path = self._disk_path / self._hash_key(key)
-        if not path.exists():
-            return None
-        async with aiofiles.open(path, encoding="utf-8") as handle:
-            data = await handle.read()
-            return json.loads(data)
+        # At most ``disk_concurrency`` files are open at once across all callers.
+        async with self._disk_slots:
+            try:
+                async with aiofiles.open(path, encoding="utf-8") as handle:
+                    return await handle.read()
+            except FileNotFoundError:
+                return None
 
-    async def _write_disk(self, key: str, value: dict[str, Any]) -> None:
+    async def _write_disk(self, key: str, raw: str) -> None:
         path = self._disk_path / self._hash_key(key)
-        async with aiofiles.open(path, "w", encoding="utf-8") as handle:
-            await handle.write(json.dumps(value))
+        async with self._disk_slots:
+            async with aiofiles.open(path, "w", encoding="utf-8") as handle:
+                await handle.write(raw)
+
+
+def _single_flight(
+    inflight: dict[str, asyncio.Task], key: str, start: Callable[[], Awaitable[Any]]
+) -> asyncio.Task:
+    """The in-flight task for ``key``, started if there is none.
+
+    Callers await it through ``asyncio.shield`` so one cancelled caller does not cancel the
+    work the others are waiting for.
+    """
+    task = inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(start())
+        inflight[key] = task
+
+        def done(finished: asyncio.Task) -> None:
+            inflight.pop(key, None)
+            if not finished.cancelled():
+                finished.exception()  # retrieved here so background refreshes never warn
+
+        task.add_done_callback(done)
+    return asyncio.shield(task)
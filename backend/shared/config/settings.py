@@ -7,6 +7,9 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 class RedisSettings(BaseModel):
     url: str = Field(default="redis://redis:6379/0")
     l2_disk_cache_path: str = Field(default="/var/cache/scaledown/l2")
+    l0_max_bytes: int = Field(default=64 * 1024 * 1024)
+    l0_ttl_seconds: float = Field(default=60.0)
+    l0_stale_seconds: float = Field(default=0.0)
 
 
 class PostgresSettings(BaseModel):
@@ -23,7 +26,61 @@ class ScaleDownSettings(BaseModel):
     base_url: str = Field(default="https://api.scaledown.ai")
     api_key: str = Field(default="")
     batch_endpoint: str = Field(default="/v2/compress/batch")
+    model: str = Field(default="scaledown-v2")
     timeout_seconds: float = Field(default=30.0)
+    max_concurrent_batches: int = Field(default=8)
+    batch_deadline_seconds: float = Field(default=60.0)
+    cache_ttl_seconds: int = Field(default=86400)
+    shadow_sample_rate: float = Field(default=0.1)
+    shadow_queue_size: int = Field(default=256)
+    rate_limit_backend: str = Field(default="redis")
+    rate_limit_rps: float = Field(default=50.0)
+    rate_limit_tokens_per_second: float = Field(default=50000.0)
+    rate_limit_burst_seconds: float = Field(default=1.0)
+    coalesce_linger_ms: float = Field(default=5.0)
+    coalesce_max_batch_size: int = Field(default=128)
+    fallback_target_ratio: float = Field(default=0.8)
+
+
+class ModelSettings(BaseModel):
+    backend: str = Field(default="torch")
+    warm_up: bool = Field(default=True)
+
+
+class EmbeddingSettings(BaseModel):
+    max_batch_size: int = Field(default=64)
+    max_wait_ms: float = Field(default=5.0)
+    cache_l1_size: int = Field(default=50000)
+    cache_ttl_seconds: int = Field(default=604800)
+    alignment_path: str = Field(default="/var/lib/scaledown/alignment")
+    alignment_alpha: float = Field(default=1.0)
+    alignment_poll_seconds: float = Field(default=30.0)
+
+
+class RagSettings(BaseModel):
+    embedding_service_url: str = Field(default="http://embedding-service:8000")
+    timeout_seconds: float = Field(default=10.0)
+    index_path: str = Field(default="/var/lib/scaledown/rag-index")
+    vector_dim: int = Field(default=384)
+    nlist: int = Field(default=1024)
+    pq_subquantizers: int = Field(default=48)
+    nprobe: int = Field(default=16)
+    candidates: int = Field(default=100)
+    fusion_mode: str = Field(default="weighted")
+    rrf_k: float = Field(default=60.0)
+    answer_cache_ttl_seconds: float = Field(default=3600.0)
+    answer_cache_max_entries: int = Field(default=10000)
+    original_cache_size: int = Field(default=1024)
+    top_k: int = Field(default=5)
+
+
+class RecommendationSettings(BaseModel):
+    arms: list[str] = Field(default=["compression_v1", "compression_v2"])
+    bandit_store: str = Field(default="redis")
+    bandit_key: str = Field(default="bandit:recommendation")
+    sync_interval_seconds: float = Field(default=5.0)
+    feedback_topic: str = Field(default="recommendation.feedback")
+    feedback_flush_interval_seconds: float = Field(default=1.0)
 
 
 class ObservabilitySettings(BaseModel):
@@ -43,6 +100,10 @@ class Settings(BaseSettings):
     postgres: PostgresSettings = PostgresSettings()
     kafka: KafkaSettings = KafkaSettings()
     scaledown: ScaleDownSettings = ScaleDownSettings()
+    models: ModelSettings = ModelSettings()
+    embedding: EmbeddingSettings = EmbeddingSettings()
+    rag: RagSettings = RagSettings()
+    recommendation: RecommendationSettings = RecommendationSettings()
     observability: ObservabilitySettings = ObservabilitySettings()
 
 
@@ -14,6 +14,62 @@ REQUEST_LATENCY = Histogram(
     "HTTP request latency",
     ["service", "method", "path"],
 )
+CACHE_HITS = Counter(
+    "cache_hits_total",
+    "Cache lookups served from cache",
+    ["service", "cache"],
+)
+CACHE_MISSES = Counter(
+    "cache_misses_total",
+    "Cache lookups that missed",
+    ["service", "cache"],
+)
+COMPRESSION_DRIFT = Histogram(
+    "compression_drift",
+    "Shadow-mode semantic drift (1 - similarity) of compressed text",
+    ["service", "variant"],
+    buckets=(0.01, 0.02, 0.05, 0.1, 0.15, 0.2, 0.3, 0.5, 1.0),
+)
+SHADOW_DROPPED = Counter(
+    "shadow_items_dropped_total",
+    "Shadow-mode items dropped because the comparison queue was full or the model was busy",
+    ["service"],
+)
+
+COALESCED_BATCH_ITEMS = Histogram(
+    "coalesced_batch_items",
+    "Items per upstream batch assembled by the request coalescer",
+    ["service"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+COALESCED_BATCH_FILL = Histogram(
+    "coalesced_batch_fill_ratio",
+    "Coalesced batch size as a fraction of the target batch size",
+    ["service"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 1.0),
+)
+
+BANDIT_SYNC_FAILURES = Counter(
+    "bandit_sync_failures_total",
+    "Bandit count merges into the shared store that failed and will be retried",
+    ["service"],
+)
+FEEDBACK_EVENTS = Counter(
+    "feedback_events_total",
+    "Feedback events accepted for the bandit",
+    ["service", "source"],
+)
+FEEDBACK_DROPPED = Counter(
+    "feedback_events_dropped_total",
+    "Feedback events dropped before reaching the bandit",
+    ["service", "reason"],
+)
+FEEDBACK_LAG = Histogram(
+    "feedback_ingestion_lag_seconds",
+    "Age of the oldest feedback event in a batch when the batch is applied to the bandit",
+    ["service"],
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
 
 
 def metrics_router() -> APIRouter:
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import math
+
+import numpy as np
+
+
+class RollingSum:
+    """Sum of the last ``capacity`` values, kept in a ring buffer with O(1) updates."""
+
+    def __init__(self, capacity: int = 1000) -> None:
+        self._capacity = capacity
+        self._values = np.zeros(capacity, dtype=np.float64)
+        self._index = 0
+        self._count = 0
+        self._total = 0.0
+
+    def add(self, value: float) -> None:
+        slot = self._index
+        self._total += value - self._values[slot]
+        self._values[slot] = value
+        self._index = (slot + 1) % self._capacity
+        self._count = min(self._count + 1, self._capacity)
+        if self._index == 0:
+            # Resync once per lap so floating-point drift from the running total stays bounded.
+            self._total = float(self._values.sum())
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def total(self) -> float:
+        return self._total
+
+    def mean(self) -> float:
+        return self._total / self._count if self._count else 0.0
+
+
+class RollingQuantile:
+    """Quantiles over the last ``capacity`` values from a log-bucketed sketch.
+
+    Values land in geometric buckets with the given relative accuracy, so answers are
+    within that relative error of the exact quantile. Each add moves one count in and one
+    out; a query scans the fixed bucket array, independent of the window size.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 1000,
+        relative_accuracy: float = 0.01,
+        min_value: float = 1e-3,
+        max_value: float = 1e7,
+    ) -> None:
+        self._capacity = capacity
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._min = min_value
+        num_buckets = int(math.ceil(math.log(max_value / min_value) / self._log_gamma)) + 1
+        self._counts = np.zeros(num_buckets, dtype=np.int64)
+        self._slots = np.full(capacity, -1, dtype=np.int32)
+        self._index = 0
+        self._count = 0
+
+    def add(self, value: float) -> None:
+        bucket = self._bucket(value)
+        evicted = self._slots[self._index]
+        if evicted >= 0:
+            self._counts[evicted] -= 1
+        self._counts[bucket] += 1
+        self._slots[self._index] = bucket
+        self._index = (self._index + 1) % self._capacity
+        self._count = min(self._count + 1, self._capacity)
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    def quantile(self, q: float) -> float:
+        if not self._count:
+            return 0.0
+        rank = q * (self._count - 1)
+        bucket = int(np.searchsorted(np.cumsum(self._counts), rank, side="right"))
+        return self._value(bucket)
+
+    def _bucket(self, value: float) -> int:
+        if value <= self._min:
+            return 0
+        bucket = int(math.ceil(math.log(value / self._min) / self._log_gamma))
+        return min(bucket, len(self._counts) - 1)
+
+    def _value(self, bucket: int) -> float:
+        if bucket == 0:
+            return self._min
+        return 2 * self._min * self._gamma**bucket / (self._gamma + 1)
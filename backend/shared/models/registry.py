@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from collections.abc import Callable, Iterable
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "int8")
+
+
+class ModelRegistry:
+    """Process-wide, lazily loaded sentence-transformer models.
+
+    ``backend`` selects how weights are held on CPU: ``torch`` keeps the fp32 model as
+    published, ``int8`` applies dynamic int8 quantization to every Linear layer, which
+    shrinks memory and speeds up CPU inference at a small accuracy cost.
+
+    A model that fails to load is retried by the next ``get`` once ``retry_seconds`` have
+    passed; until then ``get`` fails fast instead of reloading on every call.
+    """
+
+    def __init__(
+        self,
+        backend: str = "torch",
+        device: str = "cpu",
+        retry_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown model backend {backend!r}; expected one of {BACKENDS}")
+        self._backend = backend
+        self._device = device
+        self._retry_seconds = retry_seconds
+        self._clock = clock
+        self._models: dict[str, Any] = {}
+        self._states: dict[str, str] = {}
+        self._failures: dict[str, tuple[float, Exception]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self) -> str:
+        return self._backend
+
+    def get(self, name: str) -> Any:
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        with self._lock:
+            model = self._models.get(name)
+            if model is None:
+                failure = self._failures.get(name)
+                if failure is not None and self._clock() - failure[0] < self._retry_seconds:
+                    raise RuntimeError(f"Model {name} failed to load; retry pending") from (
+                        failure[1]
+                    )
+                self._states[name] = "loading"
+                try:
+                    model = self._load(name)
+                except Exception as exc:
+                    self._states[name] = "failed"
+                    self._failures[name] = (self._clock(), exc)
+                    raise
+                self._models[name] = model
+                self._failures.pop(name, None)
+                self._states[name] = "ready"
+        return model
+
+    def warm_up(self, names: Iterable[str], attempts: int = 5) -> None:
+        """Load and run each model once, retrying a failed load up to ``attempts`` times."""
+        for name in names:
+            for attempt in range(1, attempts + 1):
+                try:
+                    self.get(name).encode(["warm up"], normalize_embeddings=True)
+                    break
+                except Exception:
+                    if attempt == attempts:
+                        raise
+                    logger.warning(
+                        "Warm-up of %s failed (attempt %d)", name, attempt, exc_info=True
+                    )
+                    time.sleep(self._retry_seconds)
+
+    def start_warm_up(self, names: Iterable[str]) -> asyncio.Future:
+        """Run ``warm_up`` on the default executor; a final failure is logged, not raised."""
+        names = list(names)
+        future = asyncio.get_running_loop().run_in_executor(None, self.warm_up, names)
+
+        def done(finished: asyncio.Future) -> None:
+            if not finished.cancelled() and finished.exception() is not None:
+                logger.error(
+                    "Warm-up of %s failed", ", ".join(names), exc_info=finished.exception()
+                )
+
+        future.add_done_callback(done)
+        return future
+
+    def status(self, required: Iterable[str], optional: Iterable[str] = ()) -> dict[str, Any]:
+        """Ready once every ``required`` model is loaded. ``optional`` models are reported,
+        and listed as ``degraded`` if their load failed, without holding readiness back."""
+        required = list(required)
+        optional = [name for name in optional if name not in required]
+        states = {name: self._states.get(name, "pending") for name in [*required, *optional]}
+        status = {
+            "ready": all(states[name] == "ready" for name in required),
+            "backend": self._backend,
+            "models": states,
+        }
+        degraded = [name for name in optional if states[name] == "failed"]
+        if degraded:
+            status["degraded"] = degraded
+        return status
+
+    def _load(self, name: str) -> Any:
+        from sentence_transformers import SentenceTransformer
+
+        model = SentenceTransformer(name, device=self._device)
+        if self._backend == "int8":
+            import torch
+
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        model.eval()
+        return model
+
+
+_registry: ModelRegistry | None = None
+_registry_lock = threading.Lock()
+
+
+def get_registry(backend: str | None = None) -> ModelRegistry:
+    """The process-wide registry, created with ``backend`` (default ``torch``) on first use.
+
+    Asking for a different backend afterwards is an error rather than silently returning
+    the existing registry.
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry(backend=backend or "torch")
+        elif backend is not None and backend != _registry.backend:
+            raise ValueError(
+                f"Model registry already uses backend {_registry.backend!r}, not {backend!r}"
+            )
+        return _registry
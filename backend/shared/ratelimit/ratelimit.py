@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Protocol
+
+logger = logging.getLogger(__name__)
+
+# Refills and debits the request and token buckets atomically. Returns "0" when both had
+# capacity (and were debited), otherwise the seconds to wait before trying again. Values are
+# returned as strings because Redis truncates Lua numbers to integers.
+_ACQUIRE_SCRIPT = """
+local now = redis.call('TIME')
+local now_s = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local levels = {}
+local wait = 0
+for i = 1, 2 do
+  local rate = tonumber(ARGV[i * 3 - 2])
+  local capacity = tonumber(ARGV[i * 3 - 1])
+  local cost = tonumber(ARGV[i * 3])
+  if rate > 0 then
+    local state = redis.call('HMGET', KEYS[i], 'level', 'ts')
+    local level = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now_s
+    level = math.min(capacity, level + math.max(0, now_s - ts) * rate)
+    levels[i] = level
+    if level < cost then
+      wait = math.max(wait, (cost - level) / rate)
+    end
+  end
+end
+if wait > 0 then
+  return tostring(wait)
+end
+for i = 1, 2 do
+  local rate = tonumber(ARGV[i * 3 - 2])
+  if rate > 0 then
+    local capacity = tonumber(ARGV[i * 3 - 1])
+    local cost = tonumber(ARGV[i * 3])
+    redis.call('HSET', KEYS[i], 'level', levels[i] - cost, 'ts', now_s)
+    redis.call('EXPIRE', KEYS[i], math.ceil(capacity / rate) + 1)
+  end
+end
+return '0'
+"""
+
+
+class RateLimiter(Protocol):
+    @property
+    def max_tokens(self) -> float: ...
+
+    async def acquire(self, requests: int = 1, tokens: int = 0) -> None: ...
+
+
+class _Bucket:
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_for(self, cost: float) -> float:
+        if self.rate <= 0 or self.level >= cost:
+            return 0.0
+        return (cost - self.level) / self.rate
+
+
+class TokenBucketLimiter:
+    """In-process limiter on both request rate and token rate.
+
+    A rate of zero disables that bucket. Capacity is ``rate * burst_seconds``; a single
+    acquire larger than the token capacity is clamped so it can still proceed.
+    """
+
+    def __init__(
+        self, requests_per_second: float, tokens_per_second: float, burst_seconds: float = 1.0
+    ) -> None:
+        self._requests = _Bucket(requests_per_second, max(1.0, requests_per_second * burst_seconds))
+        self._tokens = _Bucket(tokens_per_second, tokens_per_second * burst_seconds)
+        self._lock = asyncio.Lock()
+
+    @property
+    def max_tokens(self) -> float:
+        return self._tokens.capacity if self._tokens.rate > 0 else float("inf")
+
+    async def acquire(self, requests: int = 1, tokens: int = 0) -> None:
+        tokens = min(tokens, self.max_tokens)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._requests.refill(now)
+                self._tokens.refill(now)
+                wait = max(self._requests.wait_for(requests), self._tokens.wait_for(tokens))
+                if wait <= 0:
+                    self._requests.level -= requests
+                    if self._tokens.rate > 0:
+                        self._tokens.level -= tokens
+                    return
+                await asyncio.sleep(wait)
+
+
+class RedisTokenBucketLimiter:
+    """Limiter whose buckets live in Redis, shared by every worker and replica.
+
+    If Redis becomes unreachable the limiter degrades to a per-process bucket with the same
+    rates rather than blocking or failing upstream calls.
+    """
+
+    def __init__(
+        self,
+        redis_url: str,
+        key: str,
+        requests_per_second: float,
+        tokens_per_second: float,
+        burst_seconds: float = 1.0,
+    ) -> None:
+        self._redis_url = redis_url
+        self._keys = [f"{key}:requests", f"{key}:tokens"]
+        self._requests_per_second = requests_per_second
+        self._tokens_per_second = tokens_per_second
+        self._request_capacity = max(1.0, requests_per_second * burst_seconds)
+        self._token_capacity = tokens_per_second * burst_seconds
+        self._local = TokenBucketLimiter(requests_per_second, tokens_per_second, burst_seconds)
+        self._script: Any = None
+
+    async def connect(self) -> None:
+        """Connect to Redis, or keep using the per-process bucket if it is unreachable."""
+        from redis import asyncio as redis
+
+        client = redis.from_url(
+            self._redis_url, encoding="utf-8", decode_responses=True, socket_connect_timeout=2.0
+        )
+        try:
+            await client.ping()
+        except Exception:
+            logger.warning("Redis unreachable; rate limiting per process", exc_info=True)
+            await client.aclose()
+            return
+        self._script = client.register_script(_ACQUIRE_SCRIPT)
+
+    @property
+    def max_tokens(self) -> float:
+        return self._token_capacity if self._tokens_per_second > 0 else float("inf")
+
+    async def acquire(self, requests: int = 1, tokens: int = 0) -> None:
+        if self._script is None:
+            await self._local.acquire(requests, tokens)
+            return
+        tokens = min(tokens, self.max_tokens)
+        args = [
+            self._requests_per_second,
+            self._request_capacity,
+            requests,
+            self._tokens_per_second,
+            self._token_capacity,
+            tokens,
+        ]
+        while True:
+            try:
+                wait = float(await self._script(keys=self._keys, args=args))
+            except Exception:
+                await self._local.acquire(requests, tokens)
+                return
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
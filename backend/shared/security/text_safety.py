@@ -1,28 +1,101 @@
 from __future__ import annotations
 
 import re
+from collections.abc import Iterable
+from concurrent.futures import Executor
+from dataclasses import dataclass
 
-EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
-PHONE_RE = re.compile(r"\+?\d[\d\s\-\(\)]{7,}\d")
-CARD_RE = re.compile(r"\b(?:\d[ -]*?){13,16}\b")
+# Local parts may only start where the previous character cannot belong to one. Without the
+# lookbehind every position inside a long run of letters or digits restarts the scan to the
+# end of the run, which is quadratic on inputs such as 20k digits with no "@".
+_EMAIL = r"(?<![A-Za-z0-9._%+-])[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}"
+# 13-16 digits with at most one space or dash between them; each step consumes a digit, so a
+# match attempt is bounded by 16 steps and the leading \b rules out starts inside a number.
+_CARD = r"\b\d(?:[ -]?\d){12,15}\b"
+_PHONE = r"\+?\d[\d\s\-\(\)]{7,}\d"
+
+INJECTION_PATTERNS = (
+    "ignore previous instructions",
+    "system prompt",
+    "developer message",
+    "exfiltrate",
+    "override safety",
+)
+_INJECTION = "|".join(re.escape(pattern) for pattern in INJECTION_PATTERNS)
+
+EMAIL_RE = re.compile(_EMAIL)
+PHONE_RE = re.compile(_PHONE)
+CARD_RE = re.compile(_CARD)
+# Matched against lower-cased text: a case-sensitive alternation over ``str.lower()`` is several
+# times faster than the same alternation compiled with re.IGNORECASE.
+INJECTION_RE = re.compile(_INJECTION)
+
+# Every PII match contains a digit or an "@", so texts without one skip the PII scan.
+_PII_HINT_RE = re.compile(r"[\d@]")
+# One alternation for all PII kinds, tried in this order at each position: card before phone
+# so a card number is not reported as a phone.
+_PII_RE = re.compile(f"(?P<email>{_EMAIL})|(?P<card>{_CARD})|(?P<phone>{_PHONE})")
+_REPLACEMENTS = {
+    "email": "[REDACTED_EMAIL]",
+    "card": "[REDACTED_CARD]",
+    "phone": "[REDACTED_PHONE]",
+}
+
+
+@dataclass(frozen=True, slots=True)
+class ScanResult:
+    text: str
+    emails: int = 0
+    phones: int = 0
+    cards: int = 0
+    injection: bool = False
+
+    @property
+    def pii(self) -> bool:
+        return bool(self.emails or self.phones or self.cards)
+
+
+def scan_text(text: str) -> ScanResult:
+    """Redact PII and detect prompt injection in ``text``.
+
+    PII is found in one left-to-right pass of a single alternation; injection phrases in one
+    pass of another over the lower-cased text. Both are linear in the length of ``text``.
+    """
+    counts = {"email": 0, "card": 0, "phone": 0}
+
+    def replace(match: re.Match[str]) -> str:
+        kind = match.lastgroup
+        counts[kind] += 1
+        return _REPLACEMENTS[kind]
+
+    redacted = _PII_RE.sub(replace, text) if _PII_HINT_RE.search(text) else text
+    return ScanResult(
+        redacted,
+        counts["email"],
+        counts["phone"],
+        counts["card"],
+        detect_prompt_injection(redacted),
+    )
+
+
+def scan_many(
+    texts: Iterable[str], executor: Executor | None = None, chunk_size: int = 256
+) -> list[ScanResult]:
+    """``scan_text`` over many texts, in order.
+
+    Scanning is CPU-bound and holds the GIL, so pass a ``ProcessPoolExecutor`` to spread a
+    large batch over cores; texts are shipped to the workers ``chunk_size`` at a time. Without
+    an executor the texts are scanned in this process.
+    """
+    if executor is None:
+        return [scan_text(text) for text in texts]
+    return list(executor.map(scan_text, texts, chunksize=chunk_size))
 
 
 def redact_pii(text: str) -> tuple[str, bool]:
-    redacted = text
-    redacted, email_hits = EMAIL_RE.subn("[REDACTED_EMAIL]", redacted)
-    redacted, phone_hits = PHONE_RE.subn("[REDACTED_PHONE]", redacted)
-    redacted, card_hits = CARD_RE.subn("[REDACTED_CARD]", redacted)
-    changed = any([email_hits, phone_hits, card_hits])
-    return redacted, changed
+    result = scan_text(text)
+    return result.text, result.pii
 
 
 def detect_prompt_injection(text: str) -> bool:
-    patterns = [
-        "ignore previous instructions",
-        "system prompt",
-        "developer message",
-        "exfiltrate",
-        "override safety",
-    ]
-    lowered = text.lower()
-    return any(p in lowered for p in patterns)
+    return INJECTION_RE.search(text.lower()) is not None
@@ -0,0 +1,130 @@
+import importlib.util
+import io
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+MODULE_PATH = (
+    Path(__file__).parent.parent / "services" / "embedding" / "app" / "alignment.py"
+)
+spec = importlib.util.spec_from_file_location("alignment", MODULE_PATH)
+module = importlib.util.module_from_spec(spec)
+assert spec and spec.loader
+sys.modules[spec.name] = module
+spec.loader.exec_module(module)
+AlignmentModel = module.AlignmentModel
+RidgeAccumulator = module.RidgeAccumulator
+read_chunk = module.read_chunk
+
+
+def _data(rows: int = 300) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(3)
+    compressed = rng.normal(size=(rows, 12))
+    original = compressed @ rng.normal(size=(12, 20)) + 0.5 + 0.01 * rng.normal(size=(rows, 20))
+    return compressed, original
+
+
+def test_chunked_accumulation_matches_single_fit() -> None:
+    compressed, original = _data()
+    whole = RidgeAccumulator(12, 20)
+    whole.add(compressed, original)
+    chunked = RidgeAccumulator(12, 20)
+    for start in range(0, len(compressed), 64):
+        chunked.add(compressed[start : start + 64], original[start : start + 64])
+    for expected, actual in zip(whole.solve(1.0), chunked.solve(1.0)):
+        np.testing.assert_allclose(actual, expected, rtol=1e-8, atol=1e-10)
+
+
+def test_solution_matches_sklearn_ridge() -> None:
+    linear_model = pytest.importorskip("sklearn.linear_model")
+    compressed, original = _data()
+    accumulator = RidgeAccumulator(12, 20)
+    accumulator.add(compressed, original)
+    weights, bias = accumulator.solve(1.0)
+    reference = linear_model.Ridge(alpha=1.0).fit(compressed, original)
+    np.testing.assert_allclose(weights, reference.coef_.T, rtol=1e-6, atol=1e-8)
+    np.testing.assert_allclose(bias, reference.intercept_, rtol=1e-6, atol=1e-8)
+
+
+def test_commit_persists_versions_and_reloads(tmp_path: Path) -> None:
+    compressed, original = _data()
+    model = AlignmentModel(path=str(tmp_path))
+    with pytest.raises(RuntimeError):
+        model.transform(compressed[:1])
+    model.partial_fit(compressed[:150], original[:150])
+    assert model.commit().version == 1
+    model.partial_fit(compressed[150:], original[150:])
+    assert model.commit().version == 2
+
+    restored = AlignmentModel(path=str(tmp_path))
+    snapshot = restored.load_latest()
+    assert snapshot is not None and snapshot.version == 2 and snapshot.samples == 300
+    np.testing.assert_allclose(
+        restored.transform(compressed[:5]), model.transform(compressed[:5]), rtol=1e-6
+    )
+
+
+def test_read_chunk_rejects_anything_but_an_npz_archive() -> None:
+    compressed, original = _data(4)
+    archive = io.BytesIO()
+    np.savez(archive, compressed=compressed, original=original)
+    comp, orig = read_chunk(archive.getvalue())
+    np.testing.assert_array_equal(comp, compressed)
+    np.testing.assert_array_equal(orig, original)
+
+    bare = io.BytesIO()
+    np.save(bare, compressed)
+    missing = io.BytesIO()
+    np.savez(missing, compressed=compressed)
+    corrupt = archive.getvalue()[:40] + b"\0" * 64 + archive.getvalue()[104:]
+    for body in (bare.getvalue(), missing.getvalue(), corrupt, b"", b"not numpy"):
+        with pytest.raises(ValueError):
+            read_chunk(body)
+
+
+def test_replicas_sharing_a_path_merge_chunks_and_refresh(tmp_path: Path) -> None:
+    compressed, original = _data()
+    first = AlignmentModel(path=str(tmp_path))
+    second = AlignmentModel(path=str(tmp_path))
+    assert first.partial_fit(compressed[:100], original[:100]) == 100
+    assert second.partial_fit(compressed[100:], original[100:]) == 300
+
+    snapshot = second.commit()
+    assert snapshot.samples == 300 and first.pending_samples == 0
+    expected = AlignmentModel().fit(compressed, original)
+    np.testing.assert_allclose(snapshot.weights, expected.weights, rtol=1e-5, atol=1e-6)
+
+    assert first.version is None
+    assert first.refresh().version == snapshot.version
+    assert first.refresh() is None
+    first.partial_fit(compressed[:10], original[:10])
+    assert first.commit().samples == 310
+    with pytest.raises(ValueError):
+        second.partial_fit(compressed[:, :5], original[:5])
+
+
+def test_non_finite_training_data_is_rejected_before_it_reaches_the_statistics() -> None:
+    compressed, original = _data(4)
+    poisoned = compressed.copy()
+    poisoned[1, 2] = np.nan
+    for comp, orig in ((poisoned, original), (compressed, np.full_like(original, np.inf))):
+        archive = io.BytesIO()
+        np.savez(archive, compressed=comp, original=orig)
+        with pytest.raises(ValueError, match="NaN or infinite"):
+            read_chunk(archive.getvalue())
+
+    text = io.BytesIO()
+    np.savez(text, compressed=np.array([["a"]]), original=original)
+    with pytest.raises(ValueError, match="numeric"):
+        read_chunk(text.getvalue())
+
+    accumulator = RidgeAccumulator.of(compressed, original)
+    before = accumulator.arrays()
+    with pytest.raises(ValueError, match="finite"):
+        accumulator.add(poisoned, original)
+    with pytest.raises(ValueError, match="finite"):
+        accumulator.add(compressed * 1e200, original)
+    for name, array in accumulator.arrays().items():
+        np.testing.assert_array_equal(array, before[name])
@@ -0,0 +1,24 @@
+from fastapi.testclient import TestClient
+
+from shared.app_factory import create_app
+from shared.config.settings import Settings
+
+
+def test_health_is_unavailable_until_ready() -> None:
+    state = {"ready": False, "models": {"m": "loading"}}
+    client = TestClient(create_app(Settings(), readiness=lambda: dict(state)))
+
+    response = client.get("/health")
+    assert response.status_code == 503
+    assert response.json()["status"] == "starting"
+
+    state["ready"] = True
+    response = client.get("/health")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ok"
+
+
+def test_health_without_readiness_is_ok() -> None:
+    response = TestClient(create_app(Settings())).get("/health")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ok"
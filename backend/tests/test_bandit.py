@@ -0,0 +1,67 @@
+import asyncio
+import importlib
+import sys
+import types
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+APP_DIR = Path(__file__).parent.parent / "services" / "recommendation" / "app"
+
+# Import the recommendation app modules as a package without building the FastAPI app.
+package = types.ModuleType("recommendation_app")
+package.__path__ = [str(APP_DIR)]
+sys.modules.setdefault("recommendation_app", package)
+engine = importlib.import_module("recommendation_app.engine")
+store_module = importlib.import_module("recommendation_app.store")
+
+
+class FailingStore:
+    async def merge(self, deltas):
+        raise ConnectionError("redis down")
+
+
+def test_select_prefers_the_better_arm_per_segment() -> None:
+    arms = [f"arm-{i}" for i in range(2000)]
+    bandit = engine.ThompsonBandit(arms, prior=(1.0, 50.0), seed=0)
+    for _ in range(200):
+        bandit.update("arm-7", True, segment="sofa")
+        bandit.update("arm-9", True, segment="lamp")
+    assert bandit.select("sofa") == "arm-7"
+    assert bandit.select("lamp") == "arm-9"
+    assert bandit.counts()[7].tolist() == [200, 0]
+    assert bandit.counts("unknown").sum() == 0
+    assert bandit.segments == ["", "sofa", "lamp"]
+
+
+def test_workers_converge_through_the_store() -> None:
+    store = store_module.InMemoryBanditStore()
+    first = engine.ThompsonBandit(["a", "b"], seed=1)
+    second = engine.ThompsonBandit(["a", "b"], seed=2)
+
+    async def run() -> None:
+        first.update("a", True, segment="sofa")
+        first.update("b", False)
+        second.update("a", True, segment="sofa")
+        await first.sync(store)
+        await second.sync(store)
+        await first.sync(store)
+
+    asyncio.run(run())
+    for bandit in (first, second):
+        np.testing.assert_array_equal(bandit.counts(), [[2, 0], [0, 1]])
+        np.testing.assert_array_equal(bandit.counts("sofa"), [[2, 0], [0, 0]])
+
+
+def test_failed_sync_keeps_deltas_for_the_next_attempt() -> None:
+    store = store_module.InMemoryBanditStore()
+    bandit = engine.ThompsonBandit(["a", "b"], seed=0)
+    bandit.update("b", True, segment="desk")
+    with pytest.raises(ConnectionError):
+        asyncio.run(bandit.sync(FailingStore()))
+    np.testing.assert_array_equal(bandit.counts("desk"), [[0, 0], [1, 0]])
+    asyncio.run(bandit.sync(store))
+    asyncio.run(bandit.sync(store))
+    np.testing.assert_array_equal(bandit.counts("desk"), [[0, 0], [1, 0]])
+    assert asyncio.run(store.merge({})) == {("", "b"): (1, 0), ("desk", "b"): (1, 0)}
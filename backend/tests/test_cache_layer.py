@@ -0,0 +1,178 @@
+import asyncio
+import importlib.util
+import sys
+from pathlib import Path
+
+MODULE_PATH = Path(__file__).parent.parent / "shared" / "cache" / "cache.py"
+spec = importlib.util.spec_from_file_location("cache_layer", MODULE_PATH)
+module = importlib.util.module_from_spec(spec)
+assert spec and spec.loader
+sys.modules[spec.name] = module
+spec.loader.exec_module(module)
+CacheLayer = module.CacheLayer
+
+
+class FakeRedis:
+    def __init__(self) -> None:
+        self.data: dict[str, str] = {}
+        self.ttls: dict[str, int | None] = {}
+        self.calls = 0
+
+    async def get(self, key):
+        self.calls += 1
+        await asyncio.sleep(0)
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.calls += 1
+        self.data[key] = value
+        self.ttls[key] = ex
+
+    async def mget(self, keys):
+        self.calls += 1
+        return [self.data.get(key) for key in keys]
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis: FakeRedis) -> None:
+        self._redis = redis
+        self._commands: list[tuple[str, str, int | None]] = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        return None
+
+    def set(self, key, value, ex=None):
+        self._commands.append((key, value, ex))
+        return self
+
+    async def execute(self):
+        self._redis.calls += 1
+        for key, value, ex in self._commands:
+            self._redis.data[key] = value
+            self._redis.ttls[key] = ex
+        return [True] * len(self._commands)
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_layer(tmp_path, **kwargs):
+    redis = FakeRedis()
+    layer = CacheLayer("redis://unused", str(tmp_path), redis=redis, **kwargs)
+    asyncio.run(layer.connect())
+    return layer, redis
+
+
+def test_l0_serves_repeat_reads_without_redis(tmp_path) -> None:
+    layer, redis = make_layer(tmp_path)
+
+    async def run() -> None:
+        await layer.set("a", {"x": 1})
+        calls = redis.calls
+        assert await layer.get("a") == {"x": 1}
+        assert await layer.get_many(["a", "a"]) == [{"x": 1}, {"x": 1}]
+        assert redis.calls == calls
+        assert await layer.get("missing") is None
+
+    asyncio.run(run())
+    stats = layer.stats()
+    assert stats["l0"]["hits"] == 2 and stats["l0"]["misses"] == 1
+    assert stats["redis"]["misses"] == 1 and stats["disk"]["misses"] == 1
+
+
+def test_l0_evicts_by_encoded_size(tmp_path) -> None:
+    layer, _ = make_layer(tmp_path, l0_max_bytes=40)
+
+    async def run() -> None:
+        for key in ("a", "b", "c"):
+            await layer.set(key, {"v": "x" * 8})
+
+    asyncio.run(run())
+    assert layer.stats()["l0"]["entries"] == 2
+    assert layer.stats()["l0"]["bytes"] <= 40
+
+
+def test_concurrent_misses_run_one_loader(tmp_path) -> None:
+    layer, redis = make_layer(tmp_path)
+    loads = 0
+
+    async def loader():
+        nonlocal loads
+        loads += 1
+        await asyncio.sleep(0.01)
+        return {"value": loads}
+
+    async def run():
+        return await asyncio.gather(*(layer.get_or_load("hot", loader) for _ in range(20)))
+
+    assert asyncio.run(run()) == [{"value": 1}] * 20
+    assert loads == 1
+    assert "hot" in redis.data
+
+
+def test_stale_entries_are_served_while_one_refresh_runs(tmp_path) -> None:
+    clock = Clock()
+    layer, redis = make_layer(tmp_path, l0_ttl_seconds=10, stale_seconds=30, clock=clock)
+    versions = iter(range(1, 10))
+
+    async def loader():
+        return {"version": next(versions)}
+
+    async def run() -> None:
+        assert await layer.get_or_load("k", loader) == {"version": 1}
+        # Expired from the lower tiers too, so the refresh has to call the loader.
+        redis.data.clear()
+        for path in tmp_path.iterdir():
+            path.unlink()
+        clock.now = 15.0
+        stale = await asyncio.gather(layer.get_or_load("k", loader), layer.get_or_load("k", loader))
+        assert stale == [{"version": 1}, {"version": 1}]
+        await asyncio.sleep(0.01)
+        assert await layer.get_or_load("k", loader) == {"version": 2}
+        clock.now = 100.0
+        assert await layer.get("k") == {"version": 2}  # from Redis once L0 has expired
+
+    asyncio.run(run())
+
+
+def test_batches_use_one_round_trip_and_keep_key_order(tmp_path) -> None:
+    layer, redis = make_layer(tmp_path, l0_max_bytes=0)
+    other, _ = make_layer(tmp_path, l0_max_bytes=0)
+
+    async def run() -> None:
+        await layer.set_many({f"k{i}": {"i": i} for i in range(128)})
+        assert redis.calls == 1
+        redis.data.pop("k5")  # evicted from Redis, still on disk
+        redis.calls = 0
+        keys = ["k7", "nope", "k5", "k7"]
+        assert await layer.get_many(keys) == [{"i": 7}, None, {"i": 5}, {"i": 7}]
+        assert redis.calls == 2  # MGET, then one pipeline writing k5 back
+        assert "k5" in redis.data
+        assert await other.get_many(["k1", "k2"]) == [{"i": 1}, {"i": 2}]
+
+    asyncio.run(run())
+    assert layer.stats()["disk"] == {"hits": 1, "misses": 1, "hit_ratio": 0.5}
+
+
+def test_disk_write_backs_keep_a_ttl(tmp_path) -> None:
+    layer, redis = make_layer(tmp_path, l0_max_bytes=0, writeback_ttl_seconds=120)
+
+    async def run() -> None:
+        await layer.set_many({"a": {"i": 1}, "b": {"i": 2}}, ttl_seconds=60)
+        redis.data.clear()
+        assert await layer.get_many(["a"]) == [{"i": 1}]
+        assert await layer.get("b") == {"i": 2}
+
+    asyncio.run(run())
+    assert redis.ttls == {"a": 120, "b": 120}
@@ -0,0 +1,69 @@
+import asyncio
+import importlib
+import sys
+import types
+from pathlib import Path
+
+APP_DIR = Path(__file__).parent.parent / "services" / "scaledown-client" / "app"
+
+# Import the scaledown client modules as a package without building the FastAPI app.
+package = types.ModuleType("scaledown_app")
+package.__path__ = [str(APP_DIR)]
+sys.modules.setdefault("scaledown_app", package)
+coalescer = importlib.import_module("scaledown_app.coalescer")
+
+
+class OrderedClient:
+    """Answers in item order with the caller's ids, as ``ScaleDownClient.compress_batch`` does."""
+
+    def __init__(self, batch_size: int) -> None:
+        self.batch_size = batch_size
+        self.calls: list[list[tuple[str, str]]] = []
+
+    def get_batch_size(self, queue_depth, rate_limit_rps):
+        return self.batch_size
+
+    async def compress_batch(self, items, queue_depth, rate_limit_rps, shadow_mode):
+        self.calls.append(list(items))
+        return [{"id": item_id, "compressed": text.upper()} for item_id, text in items]
+
+
+def make_coalescer(batch_size: int, linger_ms: float = 5.0):
+    client = OrderedClient(batch_size)
+    return coalescer.BatchCoalescer(client, "test", linger_ms, 128, 0.0), client
+
+
+def test_small_requests_share_one_upstream_batch() -> None:
+    batcher, client = make_coalescer(batch_size=4, linger_ms=50.0)
+
+    async def run():
+        return await asyncio.gather(
+            batcher.submit([("1", "a")], shadow_mode=False),
+            batcher.submit([("1", "b"), ("2", "c")], shadow_mode=False),
+            batcher.submit([("9", "d")], shadow_mode=False),
+        )
+
+    first, second, third = asyncio.run(run())
+    assert len(client.calls) == 1 and len(client.calls[0]) == 4
+    assert first == [{"id": "1", "compressed": "A"}]
+    assert second == [{"id": "1", "compressed": "B"}, {"id": "2", "compressed": "C"}]
+    assert third == [{"id": "9", "compressed": "D"}]
+
+
+def test_linger_flushes_a_partial_batch() -> None:
+    batcher, client = make_coalescer(batch_size=8, linger_ms=1.0)
+    results = asyncio.run(batcher.submit([("x", "short")], shadow_mode=True))
+    assert results == [{"id": "x", "compressed": "SHORT"}]
+    assert client.calls == [[("x", "short")]]
+
+
+def test_requests_at_the_target_size_skip_the_queue() -> None:
+    batcher, client = make_coalescer(batch_size=2, linger_ms=1000.0)
+    items = [("dup", "first"), ("dup", "second"), ("other", "third")]
+    results = asyncio.run(batcher.submit(items, shadow_mode=False))
+    assert client.calls == [items]
+    assert results == [
+        {"id": "dup", "compressed": "FIRST"},
+        {"id": "dup", "compressed": "SECOND"},
+        {"id": "other", "compressed": "THIRD"},
+    ]
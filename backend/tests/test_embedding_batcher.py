@@ -0,0 +1,37 @@
+import asyncio
+import importlib.util
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+MODULE_PATH = (
+    Path(__file__).parent.parent / "services" / "embedding" / "app" / "batcher.py"
+)
+spec = importlib.util.spec_from_file_location("batcher", MODULE_PATH)
+module = importlib.util.module_from_spec(spec)
+assert spec and spec.loader
+sys.modules[spec.name] = module
+spec.loader.exec_module(module)
+DynamicBatcher = module.DynamicBatcher
+
+
+def test_concurrent_callers_share_batches_and_get_their_own_vectors() -> None:
+    calls: list[int] = []
+
+    def encode(texts: list[str]) -> np.ndarray:
+        calls.append(len(texts))
+        return np.array([[float(len(text))] for text in texts])
+
+    async def run() -> list[np.ndarray]:
+        batcher = DynamicBatcher(encode, ThreadPoolExecutor(1), max_batch_size=8, max_wait_ms=20)
+        results = await asyncio.gather(*(batcher.encode(["x" * n]) for n in range(1, 21)))
+        await batcher.close()
+        return results
+
+    results = asyncio.run(run())
+    assert [float(r[0, 0]) for r in results] == [float(n) for n in range(1, 21)]
+    assert sum(calls) == 20
+    assert max(calls) == 8
+    assert len(calls) < 20
@@ -0,0 +1,125 @@
+import asyncio
+import importlib.util
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from shared.metrics import metrics
+
+MODULE_PATH = Path(__file__).parent.parent / "services" / "embedding" / "app" / "cache.py"
+spec = importlib.util.spec_from_file_location("embedding_cache", MODULE_PATH)
+module = importlib.util.module_from_spec(spec)
+assert spec and spec.loader
+sys.modules[spec.name] = module
+spec.loader.exec_module(module)
+EmbeddingCache = module.EmbeddingCache
+
+
+class FakeLayer:
+    """The batch calls ``EmbeddingCache`` makes on ``CacheLayer``, over a dict."""
+
+    def __init__(self, connected: bool = True) -> None:
+        self.connected = connected
+        self.data: dict[str, dict] = {}
+        self.calls = 0
+
+    async def get_many(self, keys):
+        self.calls += 1
+        return [self.data.get(key) for key in keys]
+
+    async def set_many(self, items, ttl_seconds=3600):
+        self.calls += 1
+        self.data.update(items)
+
+
+class Model:
+    """Counts what it is asked to encode; each text maps to its length repeated."""
+
+    def __init__(self) -> None:
+        self.seen: list[list[str]] = []
+
+    async def __call__(self, texts):
+        self.seen.append(list(texts))
+        return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+
+def _count(name: str, tier: str) -> float:
+    return getattr(metrics, name).labels("embedding-test", tier)._value.get()
+
+
+def test_l1_then_l2_then_compute() -> None:
+    layer = FakeLayer()
+    model = Model()
+    cache = EmbeddingCache("embedding-test", l1_size=8, layer=layer, ttl_seconds=60)
+    l1_hits, l2_hits = _count("CACHE_HITS", "embedding_l1"), _count("CACHE_HITS", "embedding_l2")
+
+    first = asyncio.run(cache.encode("m", True, ["ab", "abc", "ab"], model))
+    np.testing.assert_array_equal(first[:, 0], [2, 3, 2])
+    assert model.seen == [["ab", "abc"]]
+    assert len(layer.data) == 2
+
+    # Served from L1 without touching the shared layer.
+    calls = layer.calls
+    again = asyncio.run(cache.encode("m", True, ["abc"], model))
+    np.testing.assert_array_equal(again, first[1:2])
+    assert layer.calls == calls and len(model.seen) == 1
+    assert _count("CACHE_HITS", "embedding_l1") == l1_hits + 1
+
+    # Another replica with a cold L1 finds the vectors in L2.
+    other = EmbeddingCache("embedding-test", l1_size=8, layer=layer, ttl_seconds=60)
+    from_l2 = asyncio.run(other.encode("m", True, ["ab", "abc"], model))
+    np.testing.assert_array_equal(from_l2, first[:2])
+    assert len(model.seen) == 1
+    assert _count("CACHE_HITS", "embedding_l2") == l2_hits + 2
+
+    # The normalization flag and model are part of the key.
+    asyncio.run(cache.encode("m", False, ["ab"], model))
+    asyncio.run(cache.encode("other", True, ["ab"], model))
+    assert model.seen[1:] == [["ab"], ["ab"]]
+
+
+def test_l2_hits_are_promoted_into_l1_and_l1_stays_bounded() -> None:
+    layer = FakeLayer()
+    model = Model()
+    warm = EmbeddingCache("embedding-test", l1_size=8, layer=layer, ttl_seconds=60)
+    asyncio.run(warm.encode("m", True, ["a", "bb", "ccc"], model))
+
+    cache = EmbeddingCache("embedding-test", l1_size=2, layer=layer, ttl_seconds=60)
+    asyncio.run(cache.encode("m", True, ["a"], model))
+    assert list(cache._l1) == [cache.key("m", True, "a")]
+    calls = layer.calls
+    asyncio.run(cache.encode("m", True, ["a"], model))
+    assert layer.calls == calls  # promoted: the second lookup stays in L1
+
+    asyncio.run(cache.encode("m", True, ["bb", "ccc"], model))
+    assert list(cache._l1) == [cache.key("m", True, "bb"), cache.key("m", True, "ccc")]
+    assert all(not vector.flags.writeable for vector in cache._l1.values())
+    assert len(model.seen) == 1
+
+
+def test_unconnected_layer_degrades_to_l1_only() -> None:
+    model = Model()
+    for layer in (FakeLayer(connected=False), None):
+        cache = EmbeddingCache("embedding-test", l1_size=8, layer=layer, ttl_seconds=60)
+        first = asyncio.run(cache.encode("m", True, ["ab", "abc"], model))
+        second = asyncio.run(cache.encode("m", True, ["ab", "abc"], model))
+        np.testing.assert_array_equal(first, second)
+        if layer is not None:
+            assert layer.calls == 0 and layer.data == {}
+    assert model.seen == [["ab", "abc"], ["ab", "abc"]]
+
+
+def test_shared_layer_errors_fall_back_to_computing() -> None:
+    class BrokenLayer(FakeLayer):
+        async def get_many(self, keys):
+            raise ConnectionError("redis went away")
+
+        async def set_many(self, items, ttl_seconds=3600):
+            raise ConnectionError("redis went away")
+
+    model = Model()
+    cache = EmbeddingCache("embedding-test", l1_size=8, layer=BrokenLayer(), ttl_seconds=60)
+    vectors = asyncio.run(cache.encode("m", True, ["ab"], model))
+    np.testing.assert_array_equal(vectors, [[2, 1]])
+    assert model.seen == [["ab"]]
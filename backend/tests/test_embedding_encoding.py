@@ -0,0 +1,100 @@
+import base64
+import importlib
+import sys
+import types
+from pathlib import Path
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+APP_DIR = Path(__file__).parent.parent / "services" / "embedding" / "app"
+
+# Import the embedding app as a package; startup (Redis, model warm-up) is never run.
+package = types.ModuleType("embedding_app")
+package.__path__ = [str(APP_DIR)]
+sys.modules.setdefault("embedding_app", package)
+encoding = importlib.import_module("embedding_app.encoding")
+main = importlib.import_module("embedding_app.main")
+
+VECTORS = {
+    "original": np.linspace(-1.0, 1.0, 12, dtype=np.float32).reshape(2, 6),
+    "compressed": np.arange(8, dtype=np.float32).reshape(2, 4) / 7,
+}
+
+
+def _decode_json(payload: dict) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(payload["data"]), dtype=payload["dtype"]).reshape(
+        payload["shape"]
+    )
+
+
+def _split_octet_stream(body: bytes, layout: str) -> dict[str, np.ndarray]:
+    arrays, offset = {}, 0
+    for block in layout.split(","):
+        name, shape = block.split("=")
+        dims = [int(dim) for dim in shape.split("x")]
+        count = int(np.prod(dims))
+        arrays[name] = np.frombuffer(body, dtype="<f4", count=count, offset=offset).reshape(dims)
+        offset += 4 * count
+    assert offset == len(body)
+    return arrays
+
+
+@pytest.mark.parametrize("single", [False, True])
+def test_base64_encodings_round_trip(single) -> None:
+    vectors = {name: array[0] if single else array for name, array in VECTORS.items()}
+    plain = encoding.render_json(vectors, "json")
+    assert plain["embedding_original"] == vectors["original"].tolist()
+
+    as_f32 = encoding.render_json(vectors, "base64_float32")
+    as_f16 = encoding.render_json(vectors, "base64_float16")
+    for name, array in vectors.items():
+        payload = as_f32[f"embedding_{name}"]
+        assert payload["dtype"] == "float32" and payload["shape"] == list(array.shape)
+        np.testing.assert_array_equal(_decode_json(payload), array)
+
+        payload = as_f16[f"embedding_{name}"]
+        assert payload["dtype"] == "float16" and payload["shape"] == list(array.shape)
+        assert len(base64.b64decode(payload["data"])) == 2 * array.size
+        np.testing.assert_allclose(_decode_json(payload), array, atol=1e-3)
+
+
+@pytest.mark.parametrize("single", [False, True])
+def test_octet_stream_layout_describes_each_block(single) -> None:
+    vectors = {name: array[0] if single else array for name, array in VECTORS.items()}
+    response = encoding.render_octet_stream(vectors)
+    layout = response.headers["X-Embedding-Layout"]
+    assert layout == ("original=6,compressed=4" if single else "original=2x6,compressed=2x4")
+    assert response.media_type == encoding.OCTET_STREAM
+    arrays = _split_octet_stream(response.body, layout)
+    assert list(arrays) == list(vectors)
+    for name, array in vectors.items():
+        np.testing.assert_array_equal(arrays[name], array)
+
+
+def test_endpoints_negotiate_the_encoding(monkeypatch) -> None:
+    async def fake_embed(texts, outputs):
+        return {name: VECTORS[name][: len(texts)] for name in outputs}
+
+    monkeypatch.setattr(main, "_embed", fake_embed)
+    client = TestClient(main.app)
+    outputs = ["original", "compressed"]
+
+    single = client.post(
+        "/embed",
+        json={"text": "oak sofa", "outputs": outputs},
+        headers={"Accept": "application/octet-stream"},
+    )
+    assert single.headers["content-type"] == "application/octet-stream"
+    assert single.headers["X-Embedding-Layout"] == "original=6,compressed=4"
+    arrays = _split_octet_stream(single.content, single.headers["X-Embedding-Layout"])
+    np.testing.assert_array_equal(arrays["compressed"], VECTORS["compressed"][0])
+
+    batch = client.post(
+        "/embed/batch",
+        json={"texts": ["oak sofa", "lamp"], "outputs": outputs, "encoding": "base64_float16"},
+    )
+    payload = batch.json()["embedding_original"]
+    assert payload["shape"] == [2, 6]
+    np.testing.assert_allclose(_decode_json(payload), VECTORS["original"], atol=1e-3)
@@ -0,0 +1,86 @@
+import asyncio
+import importlib
+import sys
+import types
+from pathlib import Path
+
+import numpy as np
+
+APP_DIR = Path(__file__).parent.parent / "services" / "recommendation" / "app"
+
+# Import the recommendation app modules as a package without building the FastAPI app.
+package = types.ModuleType("recommendation_app")
+package.__path__ = [str(APP_DIR)]
+sys.modules.setdefault("recommendation_app", package)
+engine = importlib.import_module("recommendation_app.engine")
+feedback = importlib.import_module("recommendation_app.feedback")
+models = importlib.import_module("recommendation_app.models")
+queue_module = importlib.import_module("shared.queue.queue")
+metrics = importlib.import_module("shared.metrics.metrics")
+
+
+class FakeQueue:
+    def __init__(self, values):
+        self._values = values
+
+    async def consume(self, topic):
+        for value in self._values:
+            yield queue_module.Message(key=None, value=value)
+
+
+def test_batches_reach_the_bandit_only_on_flush() -> None:
+    bandit = engine.ThompsonBandit(["a", "b"], seed=0)
+    aggregator = feedback.FeedbackAggregator(bandit, "test", clock=lambda: 100.0)
+    events = [
+        models.Feedback(arm="a", reward=True, segment="sofa", timestamp=95.0),
+        models.Feedback(arm="a", reward=False, segment="sofa"),
+        models.Feedback(arm="b", reward=True),
+        models.Feedback(arm="retired", reward=True),
+    ]
+    assert aggregator.add_many(events) == 3
+    assert not aggregator.add("retired", False)
+    assert aggregator.pending() == 3
+    assert bandit.counts().sum() == 0
+
+    assert aggregator.flush() == 3
+    assert aggregator.flush() == 0
+    np.testing.assert_array_equal(bandit.counts(), [[1, 1], [1, 0]])
+    np.testing.assert_array_equal(bandit.counts("sofa"), [[1, 1], [0, 0]])
+
+
+def test_consumer_buffers_queue_messages_and_skips_bad_ones() -> None:
+    bandit = engine.ThompsonBandit(["a", "b"], seed=0)
+    aggregator = feedback.FeedbackAggregator(bandit, "test")
+    messages = [
+        {"arm": "b", "reward": True, "segment": "lamp"},
+        {"arm": "b"},
+        {"arm": "unknown", "reward": True},
+        {"arm": "a", "reward": False, "timestamp": 1.0},
+    ]
+    asyncio.run(aggregator.consume(FakeQueue(messages), "feedback"))
+    aggregator.flush()
+    np.testing.assert_array_equal(bandit.counts(), [[0, 1], [1, 0]])
+    np.testing.assert_array_equal(bandit.counts("lamp"), [[0, 0], [1, 0]])
+
+
+def test_consumer_parses_rewards_strictly_and_survives_bad_messages() -> None:
+    bandit = engine.ThompsonBandit(["a", "b"], seed=0)
+    aggregator = feedback.FeedbackAggregator(bandit, "strict-test")
+    dropped = metrics.FEEDBACK_DROPPED.labels("strict-test", "invalid")
+    messages = [
+        {"arm": "a", "reward": "false"},
+        {"arm": "a", "reward": "TRUE", "timestamp": "12.5"},
+        {"arm": "b", "reward": 0},
+        {"arm": "b", "reward": "maybe"},
+        {"arm": "b", "reward": 2},
+        {"arm": "b", "reward": True, "timestamp": "yesterday"},
+        {"arm": "b", "reward": True, "timestamp": float("nan")},
+        {"arm": "b", "reward": True, "segment": ["lamp"]},
+        "not a mapping",
+        {"arm": "b", "reward": True},
+    ]
+    before = dropped._value.get()
+    asyncio.run(aggregator.consume(FakeQueue(messages), "feedback"))
+    aggregator.flush()
+    np.testing.assert_array_equal(bandit.counts(), [[1, 1], [1, 1]])
+    assert dropped._value.get() == before + 6
@@ -0,0 +1,94 @@
+import asyncio
+import logging
+
+import pytest
+
+from shared.models import registry as registry_module
+from shared.models.registry import ModelRegistry
+
+
+class FakeModel:
+    def encode(self, texts, normalize_embeddings=True):
+        return [[1.0] for _ in texts]
+
+
+class FlakyRegistry(ModelRegistry):
+    """Fails the first ``failures`` loads of every model, then succeeds."""
+
+    def __init__(self, failures: int, **kwargs) -> None:
+        self.now = 0.0
+        super().__init__(retry_seconds=10.0, clock=lambda: self.now, **kwargs)
+        self.failures = failures
+        self.loads = 0
+
+    def _load(self, name):
+        self.loads += 1
+        if self.loads <= self.failures:
+            raise OSError("weights unavailable")
+        return FakeModel()
+
+
+def test_status_requires_only_the_required_models() -> None:
+    registry = FlakyRegistry(failures=0)
+    assert registry.status([], optional=["a"]) == {
+        "ready": True,
+        "backend": "torch",
+        "models": {"a": "pending"},
+    }
+    assert not registry.status(["a"])["ready"]
+    registry.get("a")
+    assert registry.status(["a"])["ready"]
+
+
+def test_failed_optional_model_is_degraded_not_unready() -> None:
+    registry = FlakyRegistry(failures=1)
+    with pytest.raises(OSError):
+        registry.get("a")
+    status = registry.status(["b"], optional=["a"])
+    assert status["degraded"] == ["a"] and status["models"]["a"] == "failed"
+    registry.get("b")
+    assert registry.status(["b"], optional=["a"])["ready"]
+
+
+def test_failed_load_is_retried_after_the_cooldown() -> None:
+    registry = FlakyRegistry(failures=1)
+    with pytest.raises(OSError):
+        registry.get("a")
+    with pytest.raises(RuntimeError, match="retry pending"):
+        registry.get("a")
+    assert registry.loads == 1
+
+    registry.now = 10.0
+    assert isinstance(registry.get("a"), FakeModel)
+    assert registry.status(["a"])["ready"]
+
+
+def test_warm_up_retries_then_logs_a_final_failure(monkeypatch, caplog) -> None:
+    registry = FlakyRegistry(failures=2)
+    failing = FlakyRegistry(failures=10)
+
+    def sleep(seconds):
+        registry.now += seconds
+        failing.now += seconds
+
+    monkeypatch.setattr(registry_module.time, "sleep", sleep)
+    registry.warm_up(["a"], attempts=3)
+    assert registry.loads == 3 and registry.status(["a"])["ready"]
+
+    async def run() -> None:
+        future = failing.start_warm_up(["b"])
+        await asyncio.gather(future, return_exceptions=True)
+
+    with caplog.at_level(logging.ERROR, logger=registry_module.__name__):
+        asyncio.run(run())
+    assert failing.loads == 5
+    assert any("Warm-up of b failed" in record.message for record in caplog.records)
+
+
+def test_get_registry_rejects_a_different_backend(monkeypatch) -> None:
+    monkeypatch.setattr(registry_module, "_registry", None)
+    registry = registry_module.get_registry("int8")
+    assert registry_module.get_registry() is registry
+    assert registry_module.get_registry("int8") is registry
+    with pytest.raises(ValueError, match="int8"):
+        registry_module.get_registry("torch")
@@ -0,0 +1,49 @@
+import asyncio
+import importlib
+import sys
+import types
+from pathlib import Path
+
+import numpy as np
+
+APP_DIR = Path(__file__).parent.parent / "services" / "rag" / "app"
+package = types.ModuleType("rag_app")
+package.__path__ = [str(APP_DIR)]
+sys.modules.setdefault("rag_app", package)
+OriginalFetcher = importlib.import_module("rag_app.originals").OriginalFetcher
+expand_mask = importlib.import_module("rag_app.engine").expand_mask
+
+
+class FakeStore:
+    def __init__(self) -> None:
+        self.calls: list[list[str]] = []
+
+    async def fetch_many(self, ids: list[str]) -> dict[str, str]:
+        self.calls.append(ids)
+        await asyncio.sleep(0.01)
+        return {key: f"original {key}" for key in ids if key != "unknown"}
+
+
+def test_bulk_fetch_dedupes_in_flight_and_caches() -> None:
+    async def scenario() -> None:
+        store = FakeStore()
+        fetcher = OriginalFetcher(store, "test", cache_size=2)
+        first, second = await asyncio.gather(
+            fetcher.get_many(["a", "b", "unknown"]), fetcher.get_many(["b", "a"])
+        )
+        assert first == {"a": "original a", "b": "original b"}
+        assert second == {"a": "original a", "b": "original b"}
+        assert store.calls == [["a", "b", "unknown"]]
+
+        assert await fetcher.get_many(["a", "c"]) == {"a": "original a", "c": "original c"}
+        assert store.calls[-1] == ["c"]
+        await fetcher.get_many(["b"])
+        assert store.calls[-1] == ["b"]
+
+    asyncio.run(scenario())
+
+
+def test_expand_mask_is_per_source_and_stricter_for_technical_queries() -> None:
+    scores = np.array([0.80, 0.88, 0.95, np.nan])
+    assert expand_mask("is it comfy", scores).tolist() == [True, False, False, True]
+    assert expand_mask("sofa dimensions", scores).tolist() == [True, True, False, True]
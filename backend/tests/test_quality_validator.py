@@ -1,4 +1,5 @@
 import importlib.util
+import sys
 from pathlib import Path
 
 MODULE_PATH = (
@@ -11,6 +12,7 @@ MODULE_PATH = (
 spec = importlib.util.spec_from_file_location("validator", MODULE_PATH)
 module = importlib.util.module_from_spec(spec)
 assert spec and spec.loader
+sys.modules[spec.name] = module
 spec.loader.exec_module(module)
 validate = module.validate
 
@@ -0,0 +1,175 @@
+import importlib
+import json
+import sys
+import threading
+import types
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Load the rag app modules as a package without running app/__init__.py (which builds the app).
+APP_DIR = Path(__file__).parent.parent / "services" / "rag" / "app"
+package = types.ModuleType("rag_app")
+package.__path__ = [str(APP_DIR)]
+sys.modules.setdefault("rag_app", package)
+IVFPQIndex = importlib.import_module("rag_app.index").IVFPQIndex
+BM25Index = importlib.import_module("rag_app.bm25").BM25Index
+MetadataStore = importlib.import_module("rag_app.filters").MetadataStore
+HybridRetriever = importlib.import_module("rag_app.retriever").HybridRetriever
+HybridScorer = importlib.import_module("rag_app.engine").HybridScorer
+
+WORDS = "sofa oak walnut waterproof fabric cushion frame warranty leather recliner".split()
+
+
+def _vectors(rows: int, dim: int = 32, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(20, dim))
+    vectors = centers[rng.integers(0, 20, rows)] + 0.3 * rng.normal(size=(rows, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def test_ivfpq_recall_and_mask() -> None:
+    vectors = _vectors(4000)
+    index = IVFPQIndex(32, nlist=32, m=8, nprobe=8, train_size=2000)
+    for start in range(0, len(vectors), 500):
+        index.add(np.arange(start, start + 500), vectors[start : start + 500])
+    assert index.trained
+    recall = 0.0
+    for query in vectors[:50]:
+        truth = np.argsort(-(vectors @ query))[:10]
+        found, _ = index.search(query, 10)
+        recall += len(np.intersect1d(truth, found)) / 10
+    assert recall / 50 > 0.6
+
+    mask = np.ones(len(vectors), dtype=bool)
+    mask[::2] = False
+    found, _ = index.search(vectors[0], 10, mask)
+    assert len(found) and np.all(found % 2 == 1)
+
+
+def test_bm25_ranks_rarer_terms_higher_and_honours_mask() -> None:
+    index = BM25Index()
+    for docno, text in enumerate(["oak sofa", "oak table", "oak chair", "walnut sofa"]):
+        index.add(docno, text)
+    docs, scores = index.search("walnut oak", 4)
+    assert docs[0] == 3 and list(scores) == sorted(scores, reverse=True)
+    docs, _ = index.search("walnut", 4, mask=np.array([True, True, True, False]))
+    assert len(docs) == 0
+
+
+def test_metadata_filters() -> None:
+    store = MetadataStore()
+    for meta in [{"brand": "a", "price": 10}, {"brand": "b", "price": 50}, {"price": 90}]:
+        store.append(meta)
+    assert store.mask({"brand": ["a", "b"]}).tolist() == [True, True, False]
+    assert store.mask({"price": {"gte": 50}}).tolist() == [False, True, True]
+    assert store.mask({"color": "red"}).tolist() == [False, False, False]
+    with pytest.raises(ValueError):
+        store.check([{"price": "cheap"}])
+
+
+def test_range_bounds_are_coerced_or_rejected_with_value_error() -> None:
+    store = MetadataStore()
+    for price in (10, 50, 90):
+        store.append({"price": price})
+    assert store.mask({"price": {"lt": "60"}}).tolist() == [True, True, False]
+    assert store.mask({"price": ["90", 10]}).tolist() == [True, False, True]
+    for condition in ({"lt": "cheap"}, {"gte": None}, {"lt": True}, ["cheap"], {"lt": [1]}):
+        with pytest.raises(ValueError, match="price"):
+            store.mask({"price": condition})
+
+
+def test_boolean_metadata_stays_distinct_from_strings() -> None:
+    store = MetadataStore()
+    for meta in [{"flag": True}, {"flag": "true"}, {"flag": False}, {"flag": "false"}]:
+        store.append(meta)
+    assert store.mask({"flag": True}).tolist() == [True, False, False, False]
+    assert store.mask({"flag": "true"}).tolist() == [False, True, False, False]
+
+    schema, arrays = store.state()
+    restored = MetadataStore()
+    restored.load_state(json.loads(json.dumps(schema)), arrays)
+    assert [restored.row(docno)["flag"] for docno in range(4)] == [True, "true", False, "false"]
+
+
+def test_weighted_fusion_matches_full_sort_and_reuses_buffers() -> None:
+    rng = np.random.default_rng(4)
+    vector, bm25, meta = rng.random(500), rng.random(500) * 12, rng.integers(0, 2, 500)
+    scorer = HybridScorer(capacity=512)
+    buffers = scorer._signals
+
+    best, scores = scorer.top_k(vector, bm25, meta, 10)
+    normalized = [(x - x.min()) / (x.max() - x.min()) for x in (vector, bm25, meta)]
+    expected = 0.5 * normalized[0] + 0.3 * normalized[1] + 0.2 * normalized[2]
+    assert best.tolist() == np.argsort(-expected, kind="stable")[:10].tolist()
+    np.testing.assert_allclose(scores, expected[best], rtol=1e-5)
+
+    best, _ = scorer.top_k(vector, bm25, meta, 3, weights=(0.0, 1.0, 0.0))
+    assert best.tolist() == np.argsort(-bm25)[:3].tolist()
+    assert scorer._signals is buffers
+
+
+def test_rrf_fusion_uses_shared_ranks_for_ties() -> None:
+    scorer = HybridScorer(mode="rrf", rrf_k=60.0)
+    vector = np.array([0.9, 0.8, 0.7])
+    bm25 = np.array([0.0, 5.0, 0.0])
+    best, scores = scorer.top_k(vector, bm25, np.zeros(3), 3)
+    # Candidates 0 and 2 tie for BM25 rank 2; all three tie for metadata rank 1.
+    expected = {
+        0: 0.5 / 61 + 0.3 / 62 + 0.2 / 61,
+        1: 0.5 / 62 + 0.3 / 61 + 0.2 / 61,
+        2: 0.5 / 63 + 0.3 / 62 + 0.2 / 61,
+    }
+    assert best.tolist() == [0, 1, 2]
+    assert scores.tolist() == pytest.approx([expected[i] for i in best.tolist()])
+
+
+def test_retriever_delete_and_snapshot_roundtrip(tmp_path) -> None:
+    rng = np.random.default_rng(1)
+    vectors = _vectors(600)
+    texts = [" ".join(rng.choice(WORDS, 5)) for _ in range(600)]
+    metadata = [{"category": ["chair", "sofa"][i % 2]} for i in range(600)]
+    retriever = HybridRetriever(32, nlist=8, m=8, train_size=300, path=str(tmp_path))
+    retriever.add([f"d{i}" for i in range(600)], texts, vectors, metadata)
+
+    assert retriever.search(texts[7], vectors[7], 1)[0]["doc_id"] == "d7"
+    hits = retriever.search(texts[7], vectors[7], 5, filters={"category": "sofa"})
+    assert all(hit["metadata"]["category"] == "sofa" for hit in hits)
+    assert retriever.delete(["d7", "missing"]) == 1
+    assert "d7" not in {hit["doc_id"] for hit in retriever.search(texts[7], vectors[7], 5)}
+
+    retriever.delete([f"d{i}" for i in range(200)])
+    assert retriever.snapshot() == 1
+    restored = HybridRetriever(32, m=8, path=str(tmp_path))
+    assert restored.load_latest() == 1
+    assert len(restored) == 400
+    assert restored.search(texts[300], vectors[300], 1)[0]["doc_id"] == "d300"
+    restored.add(["d300"], ["walnut"], vectors[:1], [{}])
+    assert len(restored) == 400
+
+
+def test_searches_share_the_lock_but_ingest_waits() -> None:
+    vectors = _vectors(200)
+    texts = [f"{WORDS[i % len(WORDS)]} doc {i}" for i in range(200)]
+    retriever = HybridRetriever(32, nlist=4, m=8, train_size=1000)
+    retriever.add([f"d{i}" for i in range(200)], texts, vectors, [{}] * 200)
+
+    added = threading.Event()
+
+    def ingest() -> None:
+        retriever.add(["new"], ["walnut"], vectors[:1], [{}])
+        added.set()
+
+    with ThreadPoolExecutor(max_workers=4) as pool, retriever._lock.read():
+        searches = [pool.submit(retriever.search, texts[i], vectors[i], 1) for i in range(3)]
+        assert [future.result(timeout=5)[0]["doc_id"] for future in searches] == [
+            "d0",
+            "d1",
+            "d2",
+        ]
+        pool.submit(ingest)
+        assert not added.wait(0.05)
+    assert added.wait(5)
+    assert len(retriever) == 201
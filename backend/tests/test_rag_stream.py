@@ -0,0 +1,95 @@
+import importlib
+import json
+import sys
+import types
+from pathlib import Path
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+APP_DIR = Path(__file__).parent.parent / "services" / "rag" / "app"
+
+# Import the RAG app as a package; startup (index load, Postgres) is never run.
+package = types.ModuleType("rag_app")
+package.__path__ = [str(APP_DIR)]
+sys.modules.setdefault("rag_app", package)
+main = importlib.import_module("rag_app.main")
+sse = importlib.import_module("rag_app.sse")
+SemanticCache = importlib.import_module("rag_app.semantic_cache").SemanticCache
+
+SOURCES = [
+    {"doc_id": "d1", "text": "oak sofa", "score": 0.9, "metadata": {"validation_score": 0.99}},
+    {"doc_id": "d2", "text": "oak chair", "score": 0.5, "metadata": {"product_id": "p2"}},
+]
+
+
+class FakeRetriever:
+    def __init__(self) -> None:
+        self.searches = 0
+
+    def search(self, query, vector, top_k, **kwargs):
+        self.searches += 1
+        return [dict(source) for source in SOURCES]
+
+
+class FakeOriginals:
+    async def get_many(self, product_ids):
+        return {product_id: f"original {product_id}" for product_id in product_ids}
+
+
+def _frames(body: str) -> list[tuple[str, object]]:
+    assert body.endswith("\n\n")
+    frames = []
+    for frame in body[:-2].split("\n\n"):
+        event, data = frame.split("\n")
+        assert event.startswith("event: ") and data.startswith("data: ")
+        frames.append((event[len("event: ") :], json.loads(data[len("data: ") :])))
+    return frames
+
+
+def test_sse_event_framing() -> None:
+    frame = sse.sse_event("token", {"text": "line one\nline two"})
+    assert frame == b'event: token\ndata: {"text":"line one\\nline two"}\n\n'
+
+
+def test_query_stream_sends_sources_then_tokens_then_done(monkeypatch) -> None:
+    async def fake_embed(texts):
+        return np.ones((len(texts), main.settings.rag.vector_dim), dtype=np.float32)
+
+    retriever = FakeRetriever()
+    monkeypatch.setattr(main, "_embed", fake_embed)
+    monkeypatch.setattr(main, "retriever", retriever)
+    monkeypatch.setattr(main, "originals", FakeOriginals())
+    monkeypatch.setattr(
+        main,
+        "answer_cache",
+        SemanticCache("rag-test", main.settings.rag.vector_dim, threshold=0.9, ttl_seconds=60),
+    )
+    client = TestClient(main.app)
+
+    response = client.post("/query/stream", json={"query": "oak furniture for a den"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["cache-control"] == "no-cache"
+    frames = _frames(response.text)
+    events = [event for event, _ in frames]
+    assert events[0] == "sources" and events[-1] == "done"
+    assert set(events[1:-1]) == {"token"} and len(events) > 3
+    sources = frames[0][1]
+    assert [source["doc_id"] for source in sources] == ["d1", "d2"]
+    assert "original" not in sources[0] and sources[1]["original"] == "original p2"
+    streamed = "".join(data["text"] for event, data in frames if event == "token")
+    assert streamed == "RAG response for: oak furniture for a den"
+    assert frames[-1][1] == {"tokens_used": 5}
+
+    # The same answer matches the non-streaming endpoint, now served from the cache.
+    answer = client.post("/query", json={"query": "oak furniture for a den"}).json()
+    assert answer["answer"] == streamed and retriever.searches == 1
+    cached = _frames(client.post("/query/stream", json={"query": "oak furniture for a den"}).text)
+    assert [event for event, _ in cached] == ["sources", "token", "done"]
+    assert cached[1][1] == {"text": streamed}
+
+    hidden = client.post(
+        "/query/stream", json={"query": "oak furniture for a den", "include_sources": False}
+    )
+    assert _frames(hidden.text)[0] == ("sources", [])
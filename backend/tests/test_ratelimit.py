@@ -0,0 +1,39 @@
+import asyncio
+import importlib.util
+import sys
+import time
+from pathlib import Path
+
+MODULE_PATH = Path(__file__).parent.parent / "shared" / "ratelimit" / "ratelimit.py"
+spec = importlib.util.spec_from_file_location("ratelimit", MODULE_PATH)
+module = importlib.util.module_from_spec(spec)
+assert spec and spec.loader
+sys.modules[spec.name] = module
+spec.loader.exec_module(module)
+TokenBucketLimiter = module.TokenBucketLimiter
+
+
+def test_request_bucket_throttles_after_burst() -> None:
+    limiter = TokenBucketLimiter(requests_per_second=20.0, tokens_per_second=0.0)
+
+    async def run() -> float:
+        start = time.monotonic()
+        for _ in range(25):
+            await limiter.acquire()
+        return time.monotonic() - start
+
+    assert asyncio.run(run()) >= 0.2
+
+
+def test_token_bucket_clamps_oversized_requests() -> None:
+    limiter = TokenBucketLimiter(requests_per_second=0.0, tokens_per_second=100.0)
+    assert limiter.max_tokens == 100.0
+
+    async def run() -> float:
+        start = time.monotonic()
+        await limiter.acquire(tokens=10_000)
+        await limiter.acquire(tokens=50)
+        return time.monotonic() - start
+
+    elapsed = asyncio.run(run())
+    assert 0.4 <= elapsed < 2.0
@@ -0,0 +1,36 @@
+import importlib.util
+import sys
+from pathlib import Path
+
+import numpy as np
+
+MODULE_PATH = Path(__file__).parent.parent / "shared" / "metrics" / "rolling.py"
+spec = importlib.util.spec_from_file_location("rolling", MODULE_PATH)
+module = importlib.util.module_from_spec(spec)
+assert spec and spec.loader
+sys.modules[spec.name] = module
+spec.loader.exec_module(module)
+RollingQuantile = module.RollingQuantile
+RollingSum = module.RollingSum
+
+
+def test_rolling_sum_tracks_only_the_window() -> None:
+    window = RollingSum(capacity=4)
+    for value in range(1, 11):
+        window.add(float(value))
+    assert window.count == 4
+    assert window.total == 7 + 8 + 9 + 10
+
+
+def test_rolling_quantile_within_relative_accuracy() -> None:
+    rng = np.random.default_rng(7)
+    values = rng.lognormal(mean=6.0, sigma=0.8, size=5000)
+    sketch = RollingQuantile(capacity=1000, relative_accuracy=0.01)
+    for value in values:
+        sketch.add(float(value))
+    expected = float(np.percentile(values[-1000:], 95))
+    assert abs(sketch.quantile(0.95) - expected) / expected < 0.03
+
+
+def test_rolling_quantile_empty_is_zero() -> None:
+    assert RollingQuantile().quantile(0.95) == 0.0
@@ -0,0 +1,400 @@
+import asyncio
+import importlib
+import json
+import sys
+import types
+from pathlib import Path
+
+import httpx
+import numpy as np
+import pytest
+
+from shared.config.settings import Settings
+
+APP_DIR = Path(__file__).parent.parent / "services" / "scaledown-client" / "app"
+
+# Import the scaledown client modules as a package without building the FastAPI app.
+package = types.ModuleType("scaledown_app")
+package.__path__ = [str(APP_DIR)]
+sys.modules.setdefault("scaledown_app", package)
+scaledown = importlib.import_module("scaledown_app.scaledown")
+shadow = importlib.import_module("scaledown_app.shadow")
+streaming = importlib.import_module("scaledown_app.streaming")
+metrics = importlib.import_module("shared.metrics.metrics")
+
+
+class NoModels:
+    """Registry whose models never load, so similarity falls back to lexical overlap."""
+
+    def get(self, name):
+        raise RuntimeError("no models in tests")
+
+
+class HashingModel:
+    """Bag-of-words vectors: deterministic, and closer for texts that share words."""
+
+    def encode(self, texts, normalize_embeddings=True, convert_to_numpy=True):
+        vectors = np.zeros((len(texts), 32), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, sum(map(ord, word)) % 32] += 1.0
+        norms = np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors / norms
+
+
+class HashingModels:
+    def get(self, name):
+        return HashingModel()
+
+
+def dropped(service: str) -> float:
+    return metrics.SHADOW_DROPPED.labels(service)._value.get()
+
+
+class DictCache:
+    """Just the batch calls ``ScaleDownClient`` makes on ``CacheLayer``."""
+
+    def __init__(self) -> None:
+        self.data: dict[str, dict] = {}
+
+    async def get_many(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    async def set_many(self, items, ttl_seconds=3600):
+        self.data.update(items)
+
+
+def upper_case(request: httpx.Request) -> httpx.Response:
+    """Upstream stand-in that answers each item by id."""
+    items = json.loads(request.content)["items"]
+    results = [{"id": item["id"], "compressed": item["text"].upper()} for item in items]
+    return httpx.Response(200, json={"results": results})
+
+
+def make_client(handler, cache=None, settings=None) -> scaledown.ScaleDownClient:
+    client = scaledown.ScaleDownClient(settings or Settings(), cache=cache, registry=NoModels())
+    client._client = httpx.AsyncClient(
+        base_url="http://scaledown.test", transport=httpx.MockTransport(handler)
+    )
+    return client
+
+
+def test_idempotency_key_is_reused_until_pending_items_change(monkeypatch) -> None:
+    monkeypatch.setattr(scaledown, "backoff_delay", lambda attempt: 0.0)
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.headers["Idempotency-Key"])
+        if len(seen) == 1:
+            return httpx.Response(200, json={"results": [{"id": "a", "compressed": "A"}]})
+        if len(seen) == 2:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"results": [{"id": "b", "compressed": "B"}]})
+
+    client = make_client(handler)
+    chunk = [{"id": "a", "text": "alpha text"}, {"id": "b", "text": "beta text"}]
+    results = asyncio.run(client._send_chunk(chunk, shadow_mode=False))
+
+    assert [result["compressed"] for result in results] == ["A", "B"]
+    assert seen[0] != seen[1]  # only "b" was left to send
+    assert seen[1] == seen[2]  # the 503 retry resent the same items
+
+
+def test_shadow_monitor_samples_items_and_drops_when_full() -> None:
+    handled = []
+    release = asyncio.Event()
+
+    async def handler(batch, results):
+        await release.wait()
+        handled.append([item["id"] for item in batch])
+
+    async def run() -> None:
+        monitor = shadow.ShadowMonitor(handler, "shadow-test", sample_rate=1.0, queue_size=1)
+        skipped = shadow.ShadowMonitor(handler, "shadow-test", sample_rate=0.0, queue_size=1)
+        batch = [{"id": "a"}, {"id": "b"}]
+        skipped.submit(batch, batch)
+        monitor.submit(batch, batch)
+        monitor.submit(batch, batch)  # the worker has not taken the first batch yet
+        release.set()
+        await asyncio.sleep(0.01)
+        await monitor.close()
+        await skipped.close()
+
+    before = dropped("shadow-test")
+    asyncio.run(run())
+    assert handled == [["a", "b"]]
+    assert dropped("shadow-test") == before + 2
+
+
+def test_shadow_skips_local_fallback_while_requests_use_the_model() -> None:
+    client = make_client(lambda request: httpx.Response(500))
+    service = client._settings.service_name
+    item = {"id": "a", "text": "Alpha sentence here. Beta sentence there."}
+    result = {"similarity": 0.9}
+
+    before = dropped(service)
+    client._executor_jobs = 1
+    asyncio.run(client._shadow_compare([item], [result]))
+    assert dropped(service) == before + 1
+
+    client._executor_jobs = 0
+    asyncio.run(client._shadow_compare([item], [result]))
+    assert dropped(service) == before + 1
+
+
+DOCS = [
+    "The sofa has a kiln-dried oak frame. It seats three people. Cushions are feather filled. "
+    "The fabric resists stains. Delivery takes two weeks.",
+    "A single long sentence describing a lamp with a brass base and a linen shade",
+    "",
+    "Short one. Another short one. A third sentence that is somewhat longer than the others.",
+]
+
+
+def test_fallback_keeps_ratio_bounds_and_sentence_order() -> None:
+    for registry in (HashingModels(), NoModels()):
+        compressor = scaledown.FallbackCompressor(registry)
+        results = compressor.compress_batch(DOCS, target_ratio=0.6, max_ratio=0.7)
+        assert len(results) == len(DOCS)
+        for text, (compressed, similarity) in zip(DOCS, results):
+            if not text:
+                assert (compressed, similarity) == ("", 0.0)
+                continue
+            assert 0 < len(compressed) <= 0.7 * len(text)
+            # Kept sentences, and any sentence cut short, stay in document order.
+            words = iter(text.split())
+            assert all(word in words for word in compressed.split())
+            assert 0.0 < similarity <= 1.0 + 1e-6
+
+
+def test_fallback_fills_multi_sentence_documents_to_the_validated_ratio() -> None:
+    docs = [
+        DOCS[0],
+        DOCS[3],
+        "This opening sentence is far longer than all of the others that follow it here. "
+        "Tiny. Also tiny. Small too.",
+        "One. Two. Three. Four. Five. Six. Seven. Eight. Nine. Ten. Eleven. Twelve.",
+    ]
+    for registry in (HashingModels(), NoModels()):
+        compressor = scaledown.FallbackCompressor(registry)
+        for text, (compressed, _) in zip(docs, compressor.compress_batch(docs)):
+            # The quality validator accepts 0.75-0.85; the defaults aim at 0.8.
+            assert 0.75 <= len(compressed) / len(text) <= 0.85, compressed
+
+
+def test_fallback_similarity_compares_original_and_compressed_text() -> None:
+    compressor = scaledown.FallbackCompressor(HashingModels())
+    [(compressed, similarity)] = compressor.compress_batch([DOCS[0]], target_ratio=0.5)
+    assert similarity == compressor.similarity(DOCS[0], compressed)
+
+
+def test_fallback_truncates_single_sentences_at_a_word_boundary() -> None:
+    compressor = scaledown.FallbackCompressor(HashingModels())
+    text = DOCS[1]
+    [(compressed, similarity)] = compressor.compress_batch([text], target_ratio=0.5)
+    assert text.startswith(compressed)
+    assert len(compressed) <= 0.5 * len(text)
+    assert text[len(compressed)] == " "
+    assert similarity < 1.0
+
+
+class EchoClient:
+    def __init__(self, error: Exception | None = None) -> None:
+        self._error = error
+
+    async def compress_batch(self, items, queue_depth, rate_limit_rps, shadow_mode):
+        if self._error is not None:
+            raise self._error
+        return [
+            {
+                "id": item_id,
+                "original": text,
+                "compressed": text[:3],
+                "ratio": 0.5,
+                "similarity": 1.0,
+                "used_fallback": False,
+            }
+            for item_id, text in items
+        ]
+
+
+async def _collect(client, body: bytes, max_line_bytes: int) -> list[dict]:
+    async def chunks():
+        for start in range(0, len(body), 16):
+            yield body[start : start + 16]
+
+    lines = streaming.iter_ndjson(chunks(), max_line_bytes=max_line_bytes)
+    output = []
+    async for chunk in streaming.stream_compress(client, lines, 2, 0.0, False, False):
+        output.extend(json.loads(line) for line in chunk.decode().splitlines())
+    return output
+
+
+def test_stream_reports_oversized_lines_after_flushing_accepted_items() -> None:
+    body = b'{"id": "a", "text": "alpha"}\n{"id": "b", "text": "' + b"x" * 200 + b'"}\n'
+    output = asyncio.run(_collect(EchoClient(), body, max_line_bytes=64))
+    assert output[0]["line"] == 2 and "exceeds 64 bytes" in output[0]["error"]
+    assert [entry.get("id") for entry in output[1:]] == ["a"]
+
+
+def test_stream_does_not_mistake_compression_errors_for_oversized_lines() -> None:
+    body = b'{"id": "a", "text": "alpha"}\n{"id": "b", "text": "beta"}\n'
+    with pytest.raises(ValueError, match="upstream broke"):
+        asyncio.run(_collect(EchoClient(ValueError("upstream broke")), body, 1024))
+
+
+def test_stream_keeps_outputs_apart_for_duplicate_ids() -> None:
+    cache = DictCache()
+    client = make_client(upper_case, cache=cache)
+    body = (
+        b'{"id": "dup", "text": "first text"}\n{"id": "dup", "text": "second text"}\n'
+        b'{"id": "dup", "text": "first text"}\n'
+    )
+    output = asyncio.run(_collect(client, body, 1024))
+    assert [(entry["id"], entry["compressed"]) for entry in output] == [
+        ("dup", "FIRST TEXT"),
+        ("dup", "SECOND TEXT"),
+        ("dup", "FIRST TEXT"),
+    ]
+    assert cache.data[client._cache_key("first text")]["compressed"] == "FIRST TEXT"
+    assert cache.data[client._cache_key("second text")]["compressed"] == "SECOND TEXT"
+
+
+@pytest.mark.parametrize("body", [{"results": None}, [], {"results": ["x"]}, {"results": [[]]}])
+def test_malformed_bodies_fall_back_and_count_against_the_breaker(monkeypatch, body) -> None:
+    monkeypatch.setattr(scaledown, "backoff_delay", lambda attempt: 0.0)
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(200, json=body)
+
+    client = make_client(handler)
+    chunk = [{"id": "a", "text": "Alpha sentence one. Alpha sentence two."}]
+    [result] = asyncio.run(client._compress_chunk(chunk, shadow_mode=False))
+    assert result["id"] == "a" and result["used_fallback"]
+    assert len(calls) == 4  # retried like a 5xx
+    assert client._breaker._failures == 1
+
+
+def test_unexpected_chunk_errors_fall_back_for_that_chunk_only(monkeypatch) -> None:
+    client = make_client(upper_case)
+
+    async def broken(chunk, shadow_mode):
+        raise KeyError("bug")
+
+    monkeypatch.setattr(client, "_send_chunk", broken)
+    chunk = [{"id": "a", "text": "Alpha sentence one. Alpha sentence two."}]
+    [result] = asyncio.run(client._compress_chunk(chunk, shadow_mode=False))
+    assert result["used_fallback"] and client._breaker._failures == 1
+
+
+def _items(*texts: str) -> list[tuple[str, str]]:
+    return [(f"item-{index}", text) for index, text in enumerate(texts)]
+
+
+@pytest.mark.parametrize("failure", ["5xx", "timeout", "deadline"])
+def test_only_the_failed_sub_batch_falls_back(monkeypatch, failure) -> None:
+    monkeypatch.setattr(scaledown, "backoff_delay", lambda attempt: 0.0)
+    sent = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        texts = [item["text"] for item in json.loads(request.content)["items"]]
+        sent.append(texts)
+        if any(text.startswith("broken") for text in texts):
+            if failure == "5xx":
+                return httpx.Response(500)
+            if failure == "timeout":
+                raise httpx.ReadTimeout("upstream timed out", request=request)
+            await asyncio.sleep(1.0)
+        return upper_case(request)
+
+    settings = Settings()
+    settings.scaledown.batch_deadline_seconds = 0.2
+    client = make_client(handler, settings=settings)
+    monkeypatch.setattr(client, "get_batch_size", lambda queue_depth, rate_limit_rps: 2)
+    texts = [
+        "alpha text",
+        "beta text",
+        "broken one. It has two sentences.",
+        "broken two. It also has two.",
+        "gamma text",
+    ]
+    results = asyncio.run(client.compress_batch(_items(*texts), 0, 10.0, False))
+
+    assert [result["id"] for result in results] == [f"item-{index}" for index in range(5)]
+    assert [result["original"] for result in results] == texts
+    assert [result["used_fallback"] for result in results] == [False, False, True, True, False]
+    assert [result["compressed"] for result in results[:2]] == ["ALPHA TEXT", "BETA TEXT"]
+    assert results[4]["compressed"] == "GAMMA TEXT"
+    assert all(len(texts) <= 2 for texts in sent)
+    assert ["alpha text", "beta text"] in sent and ["gamma text"] in sent
+    assert client._breaker._failures == 1
+
+
+def test_result_cache_dedupes_texts_and_serves_repeats() -> None:
+    sent = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        sent.append([item["text"] for item in json.loads(request.content)["items"]])
+        return upper_case(request)
+
+    cache = DictCache()
+    client = make_client(handler, cache=cache)
+    service = client._settings.service_name
+    hits = metrics.CACHE_HITS.labels(service, "compression")
+    misses = metrics.CACHE_MISSES.labels(service, "compression")
+    hits_before, misses_before = hits._value.get(), misses._value.get()
+
+    first = asyncio.run(client.compress_batch(_items("same", "other", "same"), 0, 10.0, False))
+    assert sent == [["same", "other"]]
+    assert [result["compressed"] for result in first] == ["SAME", "OTHER", "SAME"]
+    assert (hits._value.get(), misses._value.get()) == (hits_before, misses_before + 2)
+
+    second = asyncio.run(client.compress_batch(_items("other", "new"), 0, 10.0, False))
+    assert sent[1:] == [["new"]]
+    assert [result["compressed"] for result in second] == ["OTHER", "NEW"]
+    assert [result["id"] for result in second] == ["item-0", "item-1"]
+    assert (hits._value.get(), misses._value.get()) == (hits_before + 1, misses_before + 3)
+
+
+def test_result_cache_keys_are_versioned_by_model() -> None:
+    cache = DictCache()
+    client = make_client(upper_case, cache=cache)
+    asyncio.run(client.compress_batch(_items("some text"), 0, 10.0, False))
+
+    settings = Settings()
+    settings.scaledown.model = "scaledown-v3"
+    upgraded = make_client(upper_case, cache=cache, settings=settings)
+    assert upgraded._cache_key("some text") != client._cache_key("some text")
+    assert "scaledown-v3" in upgraded._cache_key("some text")
+    sent = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        sent.append(request)
+        return upper_case(request)
+
+    upgraded._client = httpx.AsyncClient(
+        base_url="http://scaledown.test", transport=httpx.MockTransport(handler)
+    )
+    asyncio.run(upgraded.compress_batch(_items("some text"), 0, 10.0, False))
+    assert len(sent) == 1  # the old model's entry is not reused
+    assert len(cache.data) == 2
+
+
+def test_fallback_results_are_not_cached(monkeypatch) -> None:
+    monkeypatch.setattr(scaledown, "backoff_delay", lambda attempt: 0.0)
+    cache = DictCache()
+    client = make_client(lambda request: httpx.Response(500), cache=cache)
+    text = "First sentence of the text. Second sentence of the text."
+    [result] = asyncio.run(client.compress_batch(_items(text), 0, 10.0, False))
+    assert result["used_fallback"]
+    assert cache.data == {}
+
+    client._client = httpx.AsyncClient(
+        base_url="http://scaledown.test", transport=httpx.MockTransport(upper_case)
+    )
+    client._breaker = scaledown.CircuitBreaker(failure_threshold=5, reset_timeout=30.0)
+    [result] = asyncio.run(client.compress_batch(_items(text), 0, 10.0, False))
+    assert not result["used_fallback"] and result["compressed"] == text.upper()
+    assert cache.data[client._cache_key(text)]["compressed"] == text.upper()
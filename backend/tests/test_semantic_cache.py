@@ -0,0 +1,61 @@
+import importlib
+import sys
+import types
+from pathlib import Path
+
+import numpy as np
+
+APP_DIR = Path(__file__).parent.parent / "services" / "rag" / "app"
+package = types.ModuleType("rag_app")
+package.__path__ = [str(APP_DIR)]
+sys.modules.setdefault("rag_app", package)
+SemanticCache = importlib.import_module("rag_app.semantic_cache").SemanticCache
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _cache(clock: FakeClock, max_entries: int = 4) -> SemanticCache:
+    return SemanticCache(
+        "test", dim=3, threshold=0.92, ttl_seconds=60, max_entries=max_entries, clock=clock
+    )
+
+
+def test_exact_and_near_neighbour_hits_respect_scope_and_threshold() -> None:
+    cache = _cache(FakeClock())
+    key = cache.key("Is this sofa  waterproof", "scope-a")
+    cache.put(key, "scope-a", np.array([1.0, 0.0, 0.0]), "answer", ["sofa-1"])
+
+    assert cache.get_exact(cache.key("is this sofa waterproof", "scope-a")) == "answer"
+    assert cache.get_exact(cache.key("is this sofa waterproof", "scope-b")) is None
+    assert cache.get_similar(np.array([0.98, 0.1, 0.0]), "scope-a") == "answer"
+    assert cache.get_similar(np.array([0.98, 0.1, 0.0]), "scope-b") is None
+    assert cache.get_similar(np.array([0.7, 0.7, 0.0]), "scope-a") is None
+    stats = cache.stats()
+    assert (stats["exact_hits"], stats["semantic_hits"], stats["misses"]) == (1, 1, 2)
+
+
+def test_ttl_invalidation_and_eviction() -> None:
+    clock = FakeClock()
+    cache = _cache(clock, max_entries=2)
+    cache.put("a", "s", np.array([1.0, 0.0, 0.0]), "A", ["p1", "p2"])
+    clock.now = 1
+    cache.put("b", "s", np.array([0.0, 1.0, 0.0]), "B", ["p2"])
+
+    assert cache.invalidate(["p1"]) == 1
+    assert cache.get_exact("a") is None and cache.get_exact("b") == "B"
+
+    clock.now = 2
+    cache.put("c", "s", np.array([0.0, 0.0, 1.0]), "C")
+    clock.now = 3
+    cache.put("d", "s", np.array([1.0, 1.0, 0.0]), "D")
+    assert cache.get_exact("b") is None and cache.stats()["entries"] == 2
+
+    clock.now = 100
+    assert cache.get_exact("c") is None
+    assert cache.get_similar(np.array([1.0, 1.0, 0.0]), "s") is None